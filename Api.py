@@ -1,35 +1,68 @@
-from flask import Flask, request, jsonify
-from sqlalchemy import select
-from flask_jwt_extended import create_access_token, get_jwt_identity, JWTManager
-from functools import wraps
+import os
+
+from flask import Flask, Blueprint, request, jsonify, Response, send_from_directory
+from sqlalchemy import select, or_, case, func
+from sqlalchemy.orm import selectinload, aliased
+from flask_jwt_extended import create_access_token, JWTManager
 from models import *
-from datetime import datetime
-from pytz import timezone
+import banco
+from banco import remover_sessoes
+from autorizacao import admin_required
+from senhas import gerar_hash, precisa_rehash, FilaDeHashCheia
+from paginacao import listar, ler_inteiro, ler_campos, ParametroInvalido
+import relatorios
+import busca
+import metricas
+import serializacao
+import eventos
+import lote
+import admissao
+import arquivo
+from cache_versionado import versionado
+from importacao import ler_lote, importar_clientes, importar_veiculos, importar_ordens_servico, LoteInvalido
+from datetime import datetime, time, timedelta
 ##
-app = Flask(__name__)
-app.config['JWT_SECRET_KEY'] = '12345@Z'
-JWT = JWTManager(app)
-
-
-BRASILIA = timezone('America/Sao_Paulo')
-
-def admin_required(fn):
-    @wraps(fn)
-    def wrapped(*args, **kwargs):
-        current_user = get_jwt_identity()
-        try:
-            sql = select(Usuario).where(Usuario.id == current_user)
-            print("Usuário autenticado ID:", current_user)
-            usuario = db_session.execute(sql).scalar()
-            if usuario and usuario.papel == "admin":
-                return fn(*args, **kwargs)
-            print("Token gerado para ID:", usuario.id)
-
-            return jsonify({"msg": "acesso negado, privilegio de administrador"}), 403
-        finally:
-            db_session.close()
-    return wrapped
-@app.route('/login', methods=['POST'])
+api = Blueprint("api", __name__)
+
+CONFIG_PADRAO = {
+    "JWT_SECRET_KEY": os.environ.get("JWT_SECRET_KEY", "12345@Z"),
+    # subsistemas opcionais: o create_app só importa e instala os ligados
+    "PERFIL": os.environ.get("PERFIL", "0") == "1",
+    "COMPRESSAO": os.environ.get("COMPRESSAO", "1") != "0",
+    "TAREFAS_THREADS": int(os.environ.get("TAREFAS_THREADS", 2)),
+}
+
+
+def create_app(config=None):
+    """Monta o app Flask. No servidor.py cada worker chama depois do fork.
+
+    As engines do banco são criadas aqui (banco.iniciar), não na importação.
+    """
+    app = Flask(__name__)
+    app.config.update(CONFIG_PADRAO)
+    app.config.update(config or {})
+    banco.iniciar()
+    JWTManager(app)
+    app.teardown_appcontext(remover_sessoes)
+    metricas.instrumentar(app)
+    # depois das métricas, para que as recusas (503) também sejam medidas
+    admissao.instalar(app)
+    if app.config["PERFIL"]:
+        import perfil
+        # por último: o perfil cobre só o trabalho da requisição admitida
+        perfil.instalar(app)
+    if app.config["COMPRESSAO"]:
+        import compressao
+        # os after_request rodam na ordem inversa: a compressão entra no tempo do perfil e das métricas
+        compressao.instalar(app)
+    if app.config["TAREFAS_THREADS"]:
+        import tarefas
+        tarefas.iniciar(app.config["TAREFAS_THREADS"])
+    app.register_blueprint(api)
+    return app
+
+
+@api.route('/login', methods=['POST'])
 def login():
     dados = request.get_json()
     email = dados.get('email')
@@ -40,13 +73,24 @@ def login():
 
     usuario = db_session.query(Usuario).filter_by(email=email).first()
 
-    if usuario and usuario.check_password(senha):
-        payload = {
-            "id": usuario.id,
+    try:
+        senha_valida = usuario is not None and usuario.check_password(senha)
+    except FilaDeHashCheia:
+        return jsonify({"msg": "Servidor ocupado, tente novamente"}), 503, {"Retry-After": "1"}
+
+    if senha_valida:
+        if precisa_rehash(usuario.password):
+            try:
+                usuario.set_password(senha)
+                usuario.save()
+            except Exception as e:
+                db_session.rollback()
+                print(f"Erro ao atualizar hash da senha: {e}")
+        claims = {
             "cpf": usuario.cpf,
             "role": usuario.papel
         }
-        access_token = create_access_token(identity=payload)
+        access_token = create_access_token(identity=str(usuario.id), additional_claims=claims)
         return jsonify({
             'nome': usuario.nome,
             'email': usuario.email,
@@ -56,12 +100,100 @@ def login():
     return jsonify({"msg": "Credenciais inválidas"}), 401
 
 
-@app.route('/')
+@api.route('/')
 def index():
     return jsonify("Hello, World!")
 
 
-@app.route('/cadastro_usuario', methods=['POST'])
+@api.route('/metrics')
+def metrics():
+    return Response(metricas.exportar() + admissao.exportar(), content_type=metricas.TIPO_CONTEUDO)
+
+
+@api.route('/perfis', methods=['GET'])
+@admin_required
+def listar_perfis():
+    import perfil
+
+    try:
+        limite = min(int(request.args.get("limite", 50)), 500)
+    except ValueError:
+        return jsonify({"mensagem": "Parâmetro 'limite' deve ser um número inteiro."}), 400
+    return jsonify(perfil.listar(limite)), 200
+
+
+@api.route('/perfis/<perfil_id>', methods=['GET'])
+@admin_required
+def baixar_perfil(perfil_id):
+    import perfil
+
+    nome = perfil.arquivo(perfil_id)
+    if nome is None:
+        return jsonify({"mensagem": "Perfil não encontrado"}), 404
+    return send_from_directory(perfil.DIRETORIO, nome, as_attachment=True)
+
+
+def _tarefa_aceita(mensagem, tarefa):
+    resposta = jsonify({"message": mensagem, "id_tarefa": tarefa.id_tarefa})
+    resposta.headers["Location"] = f"/tarefas/{tarefa.id_tarefa}"
+    return resposta, 202
+
+
+@api.route('/tarefas', methods=['POST'])
+@admin_required
+def criar_tarefa():
+    import tarefas
+
+    dados = request.get_json(silent=True) or {}
+    tipo = dados.get("tipo")
+    if tipo not in tarefas.MANUTENCAO:
+        return jsonify({"mensagem": f"'tipo' deve ser um de: {', '.join(tarefas.MANUTENCAO)}."}), 400
+    try:
+        tarefa = tarefas.enfileirar(tipo, dados.get("parametros") or {})
+    except tarefas.ParametrosInvalidos as e:
+        return jsonify({"mensagem": str(e)}), 400
+    return _tarefa_aceita("Tarefa enfileirada", tarefa)
+
+
+@api.route('/tarefas', methods=['GET'])
+@admin_required
+def listar_tarefas():
+    try:
+        limite = min(int(request.args.get("limite", 50)), 500)
+    except ValueError:
+        return jsonify({"mensagem": "Parâmetro 'limite' deve ser um número inteiro."}), 400
+    consulta = select(Tarefa).order_by(Tarefa.id_tarefa.desc()).limit(limite)
+    if request.args.get("estado"):
+        consulta = consulta.where(Tarefa.estado == request.args["estado"])
+    return jsonify([tarefa.serialize() for tarefa in db_session.execute(consulta).scalars()]), 200
+
+
+@api.route('/tarefas/<int:id_tarefa>', methods=['GET'])
+@admin_required
+def obter_tarefa(id_tarefa):
+    # sem cache: o progresso muda fora das sessões versionadas
+    tarefa = db_session.get(Tarefa, id_tarefa)
+    if tarefa is None:
+        return jsonify({"mensagem": "Tarefa não encontrada"}), 404
+    return jsonify(tarefa.serialize()), 200
+
+
+@api.route('/tarefas/<int:id_tarefa>/cancelar', methods=['POST'])
+@admin_required
+def cancelar_tarefa(id_tarefa):
+    import tarefas
+
+    estado = tarefas.cancelar(id_tarefa)
+    if estado is None:
+        return jsonify({"mensagem": "Tarefa não encontrada"}), 404
+    if estado == "executando":
+        return jsonify({"mensagem": "Cancelamento pedido; a tarefa para ao fim do lote corrente"}), 202
+    if estado == "cancelada":
+        return jsonify({"mensagem": "Tarefa cancelada"}), 200
+    return jsonify({"mensagem": f"Tarefa já encerrada ({estado})"}), 409
+
+
+@api.route('/cadastro_usuario', methods=['POST'])
 def cadastro_usuario():
     try:
         dados_usuarios = request.get_json()
@@ -75,41 +207,52 @@ def cadastro_usuario():
             nome=dados_usuarios['nome'],
             cpf=dados_usuarios['cpf'],
             email=dados_usuarios['email'],
-            password=generate_password_hash(dados_usuarios['password']),
+            password=gerar_hash(dados_usuarios['password']),
             papel=dados_usuarios['papel'],
         )
 
         novo_usuario.save()
         return jsonify({"mensagem": "Usuário cadastrado com sucesso"}), 201
 
+    except FilaDeHashCheia:
+        return jsonify({"mensagem": "Servidor ocupado, tente novamente"}), 503, {"Retry-After": "1"}
     except Exception as e:
         db_session.rollback()
         print(f"Erro inesperado: {e}")
         return jsonify({"mensagem": f"Erro interno: {str(e)}"}), 500
 
 
-@app.route('/listarUsuario', methods=['GET'])
+@api.route('/listarUsuario', methods=['GET'])
+@versionado("usuarios")
 def listar_usuario():
     try:
-        lista_usuarios = db_session.execute(select(Usuario)).scalars().all()
-        resultado = [usuarios.serialize() for usuarios in lista_usuarios]
-        return jsonify(resultado), 200
+        serializador = ler_campos(request.args, serializacao.USUARIO)
+        return listar(read_session, serializador.selecionar(), Usuario.id, serializador)
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
     except Exception as e:
         print(f"Erro ao listar usuario: {e}")
         return jsonify({"mensagem": "Erro ao obter clientes"}), 500
 
 
-@app.route('/BuscaClientes/id/<int:cliente_id>/servicos', methods=['GET'])
+@api.route('/BuscaClientes/id/<int:cliente_id>/servicos', methods=['GET'])
+@versionado("veiculos", "ordem_servico")
 def get_servicos_cliente(cliente_id):
+    ordem = arquivo.ordens(arquivo.incluir(request.args))
     try:
-        servicos = OrdemServico.query.join(Veiculo).filter(
-            Veiculo.cliente_id == cliente_id
-       ).all()
-        return jsonify([servico.serialize() for servico in servicos])
+        serializador = ler_campos(request.args, serializacao.ORDEM_SERVICO)
+        servicos = read_session.execute(
+            serializador.selecionar(ordem)
+            .where(ordem.veiculo_id.in_(select(Veiculo.id_veiculo).where(Veiculo.cliente_id == cliente_id)))
+            .order_by(ordem.veiculo_id, ordem.id_servico)
+        ).all()
+        return serializacao.resposta(serializador, servicos)
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/alterarStatusCliente/<int:id_cliente>', methods=['PATCH'])
+@api.route('/alterarStatusCliente/<int:id_cliente>', methods=['PATCH'])
 def alterar_status_cliente(id_cliente):
     try:
         cliente = db_session.query(Cliente).filter(Cliente.id_cliente == id_cliente).first()
@@ -119,14 +262,14 @@ def alterar_status_cliente(id_cliente):
 
         cliente.ativo = not cliente.ativo
 
-        db_session.commit()
+        cliente.save()
         return jsonify({"mensagem": "Status do cliente alterado com sucesso", "ativo": cliente.ativo}), 200
 
     except Exception as e:
         print(f"Erro ao alterar status do cliente: {e}")
         return jsonify({"mensagem": "Erro interno do servidor"}), 500
 
-@app.route('/adicionarClientes', methods=['POST'])
+@api.route('/adicionarClientes', methods=['POST'])
 def adicionar_cliente():
     try:
         dados_cliente = request.get_json()
@@ -140,17 +283,18 @@ def adicionar_cliente():
         cpf = dados_cliente['cpf']
         telefone = dados_cliente['telefone']
 
-        cpf_existente = db_session.execute(select(Cliente).where(Cliente.cpf == cpf)).scalar()
-        if cpf_existente:
-            return jsonify({"mensagem": "CPF já cadastrado"}), 409
+        email = dados_cliente['email']
 
-        telefone_existente = db_session.execute(select(Cliente).where(Cliente.telefone == telefone)).scalar()
-        if telefone_existente:
+        existentes = db_session.execute(
+            select(Cliente.cpf, Cliente.telefone, Cliente.email).where(
+                or_(Cliente.cpf == cpf, Cliente.telefone == telefone, Cliente.email == email)
+            )
+        ).all()
+        if any(c.cpf == cpf for c in existentes):
+            return jsonify({"mensagem": "CPF já cadastrado"}), 409
+        if any(c.telefone == telefone for c in existentes):
             return jsonify({"mensagem": "Telefone já cadastrado"}), 409
-
-        email = dados_cliente['email']
-        email_existente = db_session.execute(select(Cliente).where(Cliente.email == email)).scalar()
-        if email_existente:
+        if any(c.email == email for c in existentes):
             return jsonify({"mensagem": "E-mail já cadastrado"}), 409
 
         novo_cliente = Cliente(
@@ -162,7 +306,7 @@ def adicionar_cliente():
         )
 
         novo_cliente.save()
-        return jsonify({"mensagem": "Cliente cadastrado com sucesso"}), 201
+        return jsonify({"mensagem": "Cliente cadastrado com sucesso", "id_cliente": novo_cliente.id_cliente}), 201
 
     except (TypeError, KeyError) as e:
         print(f"Erro ao adicionar cliente: {e}")
@@ -172,17 +316,36 @@ def adicionar_cliente():
         print(f"Erro inesperado: {e}")
         return jsonify({"mensagem": "Erro interno do servidor"}), 500
 
-@app.route('/listarClientes', methods=['GET'])
+def _importar(importar, entidade):
+    try:
+        linhas = ler_lote()
+        return jsonify(importar(linhas)), 200
+    except LoteInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
+    except Exception as e:
+        db_session.rollback()
+        print(f"Erro ao importar {entidade}: {e}")
+        return jsonify({"mensagem": "Erro interno do servidor"}), 500
+
+
+@api.route('/importarClientes', methods=['POST'])
+def importar_lote_clientes():
+    return _importar(importar_clientes, "clientes")
+
+
+@api.route('/listarClientes', methods=['GET'])
+@versionado("clientes")
 def listar_clientes():
     try:
-        lista_clientes = db_session.query(Cliente).all()
-        resultado = [cliente.serialize() for cliente in lista_clientes]
-        return jsonify(resultado), 200
+        serializador = ler_campos(request.args, serializacao.CLIENTE)
+        return listar(read_session, serializador.selecionar(), Cliente.id_cliente, serializador)
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
     except Exception as e:
         print(f"Erro ao listar clientes: {e}")
         return jsonify({"mensagem": "Erro ao obter clientes"}), 500
 
-@app.route("/editarClients/<int:cliente_id>", methods=['PUT'])
+@api.route("/editarClients/<int:cliente_id>", methods=['PUT'])
 def editar_clientes(cliente_id):
     cliente = db_session.execute(
         select(Cliente).where(Cliente.id_cliente == cliente_id)
@@ -209,7 +372,7 @@ def editar_clientes(cliente_id):
 
 
 
-@app.route("/ocultarClient/<int:cliente_id>", methods=['PUT'])
+@api.route("/ocultarClient/<int:cliente_id>", methods=['PUT'])
 def ocultar_cliente(cliente_id):
     cliente = db_session.execute(select(Cliente).where(Cliente.id_cliente == cliente_id)).scalar()
 
@@ -230,7 +393,7 @@ def ocultar_cliente(cliente_id):
 
 
 
-@app.route("/reativarCliente/<int:cliente_id>", methods=["PUT"])
+@api.route("/reativarCliente/<int:cliente_id>", methods=["PUT"])
 def reativar_cliente(cliente_id):
     cliente = db_session.execute(select(Cliente).where(Cliente.id_cliente == cliente_id)).scalar()
 
@@ -244,31 +407,32 @@ def reativar_cliente(cliente_id):
     return jsonify({"mensagem": "Cliente reativado com sucesso"}), 200
 
 
-@app.route("/deletarCliente/<int:cliente_id>", methods=['DELETE'])
+@api.route("/deletarCliente/<int:cliente_id>", methods=['DELETE'])
 def deletar_cliente(cliente_id):
+    import tarefas
+
     try:
         cliente = db_session.query(Cliente).get(cliente_id)
         if not cliente:
             return jsonify({"message": "Cliente não encontrado"}), 404
 
-
-        db_session.delete(cliente)
-        db_session.commit()
-        return jsonify({"message": "Cliente excluído com sucesso"}), 200
+        # as ordens e os veículos saem em lotes, por uma tarefa em segundo plano
+        tarefa = tarefas.enfileirar("remover_cliente", {"cliente_id": cliente_id})
+        return _tarefa_aceita("Exclusão do cliente enfileirada", tarefa)
     except Exception as e:
         return jsonify({"message": f"Erro ao excluir Cliente: {str(e)}"}), 500
 
 
 
 
-@app.route('/adicionarVeiculo', methods=['POST'])
+@api.route('/adicionarVeiculo', methods=['POST'])
 def adicionar_veiculo():
     try:
 
         dados_veiculo = request.get_json()
         campos_obrigatorios = ["cliente_id", "marca", "modelo", "placa", "ano_fabricacao"]
         for campo in campos_obrigatorios:
-            if campo not in dados_veiculo or not dados_veiculo[campo].strip():
+            if campo not in dados_veiculo or not str(dados_veiculo[campo]).strip():
                 return jsonify({"mensagem": f"Campo '{campo}' é obrigatório e não pode estar vazio."}), 400
         novo_veiculo = Veiculo(
             cliente_id=dados_veiculo['cliente_id'],
@@ -278,7 +442,7 @@ def adicionar_veiculo():
             ano_fabricacao=dados_veiculo['ano_fabricacao']
         )
         novo_veiculo.save()
-        return jsonify({"mensagem": "Veículo cadastrado com sucesso"}), 201
+        return jsonify({"mensagem": "Veículo cadastrado com sucesso", "id_veiculo": novo_veiculo.id_veiculo}), 201
     except (TypeError, KeyError) as e:
         print(f"Erro ao adicionar veículo: {e}")
         return jsonify({"mensagem": "Dados inválidos ou incompletos"}), 400
@@ -288,18 +452,25 @@ def adicionar_veiculo():
 
 
 
-@app.route('/listarVeiculos', methods=['GET'])
+@api.route('/importarVeiculos', methods=['POST'])
+def importar_lote_veiculos():
+    return _importar(importar_veiculos, "veículos")
+
+
+@api.route('/listarVeiculos', methods=['GET'])
+@versionado("veiculos")
 def listar_veiculos():
     try:
-        lista_veiculos = db_session.query(Veiculo).all()
-        resultado = [veiculo.serialize() for veiculo in lista_veiculos]
-        return jsonify(resultado), 200
+        serializador = ler_campos(request.args, serializacao.VEICULO)
+        return listar(read_session, serializador.selecionar(), Veiculo.id_veiculo, serializador)
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
     except Exception as e:
         print(f"Erro ao listar veículos: {e}")
         return jsonify({"mensagem": "Erro ao obter veículos"}), 500
 
 
-@app.route("/editarVeiculos/<int:id_veiculo>", methods=['PUT'])
+@api.route("/editarVeiculos/<int:id_veiculo>", methods=['PUT'])
 def editar_veiculos(id_veiculo):
     veiculos = db_session.execute(select(Veiculo).where(Veiculo.id_veiculo == id_veiculo)).scalar()
 
@@ -320,21 +491,23 @@ def editar_veiculos(id_veiculo):
     veiculos.save()
     return jsonify({"mensagem": "veiculo editado com sucesso"})
 
-@app.route("/deletarVeiculos/<int:id_veiculo>", methods=['DELETE'])
+@api.route("/deletarVeiculos/<int:id_veiculo>", methods=['DELETE'])
 def deletar_veiculo(id_veiculo):
+    import tarefas
+
     try:
         veiculo = db_session.query(Veiculo).get(id_veiculo)
         if veiculo is None:
             return jsonify({"message": "veiculo não encontrado"}), 404
 
-        db_session.delete(veiculo)
-        db_session.commit()
-        return jsonify({"message": "veiculo excluído com sucesso"}), 200
+        tarefa = tarefas.enfileirar("remover_veiculo", {"veiculo_id": id_veiculo})
+        return _tarefa_aceita("Exclusão do veiculo enfileirada", tarefa)
     except Exception as e:
         return jsonify({"message": f"Erro ao excluir veiculo: {str(e)}"}), 500
 
 
-@app.route("/buscar_cpf_por_email", methods=["GET"])
+@api.route("/buscar_cpf_por_email", methods=["GET"])
+@versionado("usuarios")
 def buscar_cpf_por_email():
     try:
         email_usuario = request.args.get("email")
@@ -342,7 +515,7 @@ def buscar_cpf_por_email():
         if not email_usuario:
             return jsonify({"mensagem": "Email não fornecido"}), 400
 
-        usuario = db_session.execute(
+        usuario = read_session.execute(
             select(Usuario).where(Usuario.email == email_usuario)
         ).scalar()
 
@@ -354,24 +527,29 @@ def buscar_cpf_por_email():
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
 
-@app.route("/dados_cliente/<cpf>", methods=["GET"])
+@api.route("/dados_cliente/<cpf>", methods=["GET"])
+@versionado("clientes", "veiculos", "ordem_servico")
 def dados_cliente(cpf):
+    ordem_servico = arquivo.ordens(arquivo.incluir(request.args))
     try:
-        cliente = db_session.execute(
-            select(Cliente).where(Cliente.cpf == cpf)
-        ).scalar()
-
-        if not cliente:
+        linha = read_session.execute(
+            select(Cliente, Veiculo)
+            .outerjoin(Veiculo, Veiculo.cliente_id == Cliente.id_cliente)
+            .where(Cliente.cpf == cpf)
+            .order_by(Veiculo.id_veiculo)
+            .limit(1)
+        ).first()
+
+        if not linha:
             return jsonify({"mensagem": "Cliente não encontrado"}), 404
 
-        veiculo = db_session.execute(
-            select(Veiculo).where(Veiculo.cliente_id == cliente.id_cliente)
-        ).scalar()
-
+        cliente, veiculo = linha
+        # consulta separada, por veículo: um JOIN com as arquivadas (UNION ALL) varreria tudo
         ordem = None
-        if veiculo:
-            ordem = db_session.execute(
-                select(OrdemServico).where(OrdemServico.veiculo_id == veiculo.id_veiculo)
+        if veiculo is not None:
+            ordem = read_session.execute(
+                select(ordem_servico).where(ordem_servico.veiculo_id == veiculo.id_veiculo)
+                .order_by(ordem_servico.id_servico).limit(1)
             ).scalar()
 
         return jsonify({
@@ -393,46 +571,212 @@ def dados_cliente(cpf):
         return jsonify({"erro": str(e)}), 500
 
 
-@app.route('/veiculo_cliente/<cpf>', methods=['GET'])
-def buscar_veiculo_por_cpf(cpf):
+@api.route("/resumo_cliente/<cpf>", methods=["GET"])
+@versionado("clientes", "veiculos", "ordem_servico")
+def resumo_cliente(cpf):
+    try:
+        recentes = min(int(request.args.get("recentes", 5)), 50)
+    except ValueError:
+        return jsonify({"mensagem": "Parâmetro 'recentes' deve ser um número inteiro."}), 400
+
     try:
-        cliente = db_session.query(Cliente).filter_by(cpf=cpf).first()
+        cliente = read_session.execute(
+            select(Cliente).where(Cliente.cpf == cpf).options(selectinload(Cliente.veiculos))
+        ).scalar()
+
         if not cliente:
             return jsonify({"mensagem": "Cliente não encontrado"}), 404
 
-        veiculos = db_session.query(Veiculo).filter_by(cliente_id=cliente.id_cliente).all()
+        do_cliente = arquivo.ordens_onde(
+            lambda ordens: ordens.c.veiculo_id.in_(
+                select(Veiculo.id_veiculo).where(Veiculo.cliente_id == cliente.id_cliente)
+            ),
+            arquivo.incluir(request.args),
+        )
+
+        agregados = {
+            linha.veiculo_id: linha
+            for linha in read_session.execute(
+                select(
+                    do_cliente.veiculo_id,
+                    func.count().label("total_ordens"),
+                    func.sum(case((do_cliente.data_fechamento.is_(None), 1), else_=0)).label("ordens_abertas"),
+                    func.max(do_cliente.data_abertura).label("ultima_visita"),
+                    func.coalesce(func.sum(do_cliente.valor_estimado), 0).label("valor_total_estimado"),
+                ).group_by(do_cliente.veiculo_id)
+            )
+        }
+
+        posicao = func.row_number().over(
+            partition_by=do_cliente.veiculo_id,
+            order_by=(do_cliente.data_abertura.desc(), do_cliente.id_servico.desc()),
+        ).label("posicao")
+        numeradas = select(do_cliente, posicao).subquery()
+        ordem_recente = aliased(OrdemServico, numeradas)
+        ordens = {}
+        for ordem in read_session.execute(
+            select(ordem_recente).where(numeradas.c.posicao <= recentes)
+            .order_by(numeradas.c.veiculo_id, numeradas.c.posicao)
+        ).scalars():
+            ordens.setdefault(ordem.veiculo_id, []).append(ordem.serialize())
+
+        veiculos = []
+        for veiculo in sorted(cliente.veiculos, key=lambda v: v.id_veiculo):
+            agregado = agregados.get(veiculo.id_veiculo)
+            ultima_visita = agregado.ultima_visita if agregado else None
+            veiculos.append({
+                **veiculo.serialize(),
+                "total_ordens": agregado.total_ordens if agregado else 0,
+                "ordens_abertas": agregado.ordens_abertas if agregado else 0,
+                "ultima_visita": ultima_visita.strftime(FORMATO_DATA) if ultima_visita else None,
+                "valor_total_estimado": agregado.valor_total_estimado if agregado else 0,
+                "ordens_recentes": ordens.get(veiculo.id_veiculo, []),
+            })
+
+        return jsonify({**cliente.serialize(), "veiculos": veiculos}), 200
+
+    except Exception as e:
+        print(f"Erro na rota resumo_cliente: {e}")
+        return jsonify({"mensagem": "Erro interno do servidor"}), 500
+
+
+@api.route("/buscar", methods=["GET"])
+@versionado("clientes", "veiculos")
+def buscar():
+    try:
+        limite = int(request.args.get("limite", busca.LIMITE_PADRAO))
+    except ValueError:
+        return jsonify({"mensagem": "Parâmetro 'limite' deve ser um número inteiro."}), 400
 
-        if not veiculos:
+    try:
+        resultados = busca.buscar(request.args.get("q", ""), limite, request.args.get("tipo"))
+        return jsonify(resultados), 200
+    except busca.BuscaInvalida as e:
+        return jsonify({"mensagem": str(e)}), 400
+    except Exception as e:
+        print(f"Erro na busca: {e}")
+        return jsonify({"mensagem": "Erro interno do servidor"}), 500
+
+
+@api.route('/veiculo_cliente/<cpf>', methods=['GET'])
+@versionado("clientes", "veiculos")
+def buscar_veiculo_por_cpf(cpf):
+    try:
+        serializador = ler_campos(request.args, serializacao.VEICULO)
+        linha = read_session.execute(
+            select(*serializador.colunas())
+            .select_from(Cliente)
+            .outerjoin(Veiculo, Veiculo.cliente_id == Cliente.id_cliente)
+            .where(Cliente.cpf == cpf)
+            .order_by(Veiculo.id_veiculo)
+            .limit(1)
+        ).first()
+        if not linha:
+            return jsonify({"mensagem": "Cliente não encontrado"}), 404
+
+        if linha.id_veiculo is None:
             return jsonify({"mensagem": "Nenhum veículo encontrado"}), 404
 
-        return jsonify(veiculos[0].serialize()), 200
+        return serializacao.resposta_objeto(serializador, linha), 200
 
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
     except Exception as e:
         print(f"Erro ao buscar veículo por CPF: {e}")
         return jsonify({"mensagem": "Erro interno do servidor"}), 500
 
 
-@app.route('/adicionarOrdemServico', methods=['POST'])
+def nova_ordem_servico(dados_ordem):
+    agora_brasilia = datetime.now(BRASILIA).replace(tzinfo=None)
+
+    return OrdemServico(
+        veiculo_id=int(dados_ordem['veiculo_id']),
+        data_abertura=agora_brasilia,
+        descricao_servico=dados_ordem['descricao_servico'],
+        status=dados_ordem['status'],
+        valor_estimado=float(dados_ordem['valor_estimado']),
+        data_fechamento=(
+            agora_brasilia if codigo_status(dados_ordem['status']) == StatusOrdem.FINALIZADA
+            else None
+        )
+    )
+
+
+def editar_ordem_servico(ordens_servico, dados_ordem):
+    data_str = dados_ordem.get('data_abertura')
+
+    if data_str:
+        try:
+            dt = datetime.fromisoformat(data_str)
+            if dt.tzinfo is None:
+                dt = BRASILIA.localize(dt)
+            else:
+                dt = dt.astimezone(BRASILIA)
+            ordens_servico.data_abertura = dt.replace(tzinfo=None)
+        except Exception:
+            data_apenas = data_str.split("T")[0]
+            dt = datetime.strptime(data_apenas, "%Y-%m-%d")
+            dt = BRASILIA.localize(dt).replace(tzinfo=None)
+            ordens_servico.data_abertura = dt
+
+    ordens_servico.descricao_servico = dados_ordem['descricao_servico']
+    ordens_servico.status = dados_ordem['status']
+    ordens_servico.valor_estimado = float(dados_ordem['valor_estimado'])
+
+    if ordens_servico.finalizada:
+        if not ordens_servico.data_fechamento:
+            agora_brasilia = datetime.now(BRASILIA).replace(tzinfo=None)
+            ordens_servico.data_fechamento = agora_brasilia
+    else:
+        ordens_servico.data_fechamento = None
+
+
+def _codigos_status(texto):
+    # aceita nomes (StatusOrdem ou os textos livres de sempre), códigos e "abertas"
+    codigos = set()
+    for parte in texto.split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if parte.isdigit() and int(parte) in StatusOrdem._value2member_map_:
+            codigos.add(StatusOrdem(int(parte)))
+        elif parte.lower() in ("abertas", "em_aberto"):
+            codigos.update(STATUS_EM_ABERTO)
+        elif parte.upper() in StatusOrdem.__members__:
+            codigos.add(StatusOrdem[parte.upper()])
+        elif codigo_status(parte, None) is not None:
+            codigos.add(codigo_status(parte))
+        else:
+            raise ParametroInvalido(f"Status desconhecido: '{parte}'.")
+    return sorted(int(c) for c in codigos)
+
+
+def filtros_ordem_servico(args, ordem=OrdemServico):
+    filtros = []
+    if args.get("status"):
+        filtros.append(ordem.status_codigo.in_(_codigos_status(args["status"])))
+    veiculo_id = ler_inteiro(args, "veiculo_id", 1)
+    if veiculo_id is not None:
+        filtros.append(ordem.veiculo_id == veiculo_id)
+    try:
+        inicio, fim = relatorios.ler_periodo(args)
+    except ValueError as e:
+        raise ParametroInvalido(str(e))
+    if inicio:
+        filtros.append(ordem.data_abertura >= datetime.combine(inicio, time.min))
+    if fim:
+        filtros.append(ordem.data_abertura < datetime.combine(fim + timedelta(days=1), time.min))
+    return filtros
+
+
+@api.route('/adicionarOrdemServico', methods=['POST'])
 def adicionar_ordem_servico():
     try:
         dados_ordem = request.get_json()
 
-        agora_brasilia = datetime.now(BRASILIA).replace(tzinfo=None)
-
-        nova_ordem = OrdemServico(
-            veiculo_id=int(dados_ordem['veiculo_id']),
-            data_abertura=agora_brasilia,
-            descricao_servico=dados_ordem['descricao_servico'],
-            status=dados_ordem['status'],
-            valor_estimado=float(dados_ordem['valor_estimado']),
-            data_fechamento=(
-                agora_brasilia if dados_ordem['status'].lower() in ["concluído", "finalizado", "terminado"]
-                else None
-            )
-        )
-
+        nova_ordem = nova_ordem_servico(dados_ordem)
         nova_ordem.save()
-        return jsonify({"mensagem": "Ordem de serviço cadastrada com sucesso"}), 201
+        return jsonify({"mensagem": "Ordem de serviço cadastrada com sucesso", "id_servico": nova_ordem.id_servico}), 201
 
     except (TypeError, KeyError, ValueError) as e:
         print(f"Erro ao adicionar ordem de serviço: {e}")
@@ -442,18 +786,27 @@ def adicionar_ordem_servico():
         return jsonify({"mensagem": "Erro interno do servidor"}), 500
 
 
-@app.route('/listarOrdemServicos', methods=['GET'])
+@api.route('/importarOrdensServico', methods=['POST'])
+def importar_lote_ordens_servico():
+    return _importar(importar_ordens_servico, "ordens de serviço")
+
+
+@api.route('/listarOrdemServicos', methods=['GET'])
+@versionado("ordem_servico")
 def listar_ordem_servicos():
+    ordem = arquivo.ordens(arquivo.incluir(request.args))
     try:
-        lista_ordens = db_session.query(OrdemServico).all()
-        resultado = [ordem.serialize() for ordem in lista_ordens]
-        return jsonify(resultado), 200
+        serializador = ler_campos(request.args, serializacao.ORDEM_SERVICO)
+        stmt = serializador.selecionar(ordem).where(*filtros_ordem_servico(request.args, ordem))
+        return listar(read_session, stmt, ordem.id_servico, serializador)
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
     except Exception as e:
         print(f"Erro ao listar ordens de serviço: {e}")
         return jsonify({"mensagem": "Erro ao obter ordens de serviço"}), 500
 
 
-@app.route("/editarServico/<int:id_servico>", methods=['PUT'])
+@api.route("/editarServico/<int:id_servico>", methods=['PUT'])
 def editar_servico(id_servico):
     ordens_servico = db_session.execute(
         select(OrdemServico).where(OrdemServico.id_servico == id_servico)
@@ -465,33 +818,7 @@ def editar_servico(id_servico):
     dados_ordem = request.get_json()
 
     try:
-        data_str = dados_ordem.get('data_abertura')
-
-        if data_str:
-            try:
-                dt = datetime.fromisoformat(data_str)
-                if dt.tzinfo is None:
-                    dt = BRASILIA.localize(dt)
-                else:
-                    dt = dt.astimezone(BRASILIA)
-                ordens_servico.data_abertura = dt.replace(tzinfo=None)
-            except Exception:
-                data_apenas = data_str.split("T")[0]
-                dt = datetime.strptime(data_apenas, "%Y-%m-%d")
-                dt = BRASILIA.localize(dt).replace(tzinfo=None)
-                ordens_servico.data_abertura = dt
-
-        ordens_servico.descricao_servico = dados_ordem['descricao_servico']
-        ordens_servico.status = dados_ordem['status']
-        ordens_servico.valor_estimado = float(dados_ordem['valor_estimado'])
-
-        status_lower = ordens_servico.status.lower()
-        if status_lower in ["concluído", "finalizado", "terminado"]:
-            if not ordens_servico.data_fechamento:
-                agora_brasilia = datetime.now(BRASILIA).replace(tzinfo=None)
-                ordens_servico.data_fechamento = agora_brasilia
-        else:
-            ordens_servico.data_fechamento = None
+        editar_ordem_servico(ordens_servico, dados_ordem)
 
         ordens_servico.save()
         return jsonify({"mensagem": "Serviço editado com sucesso"}), 200
@@ -503,30 +830,124 @@ def editar_servico(id_servico):
         print(f"Erro inesperado: {err}")
         return jsonify({"mensagem": "Erro interno do servidor"}), 500
 
-@app.route("/ordens_por_veiculo/<int:veiculo_id>", methods=["GET"])
+@api.route("/ordens_por_veiculo/<int:veiculo_id>", methods=["GET"])
+@versionado("ordem_servico")
 def ordens_por_veiculo(veiculo_id):
+    ordem = arquivo.ordens(arquivo.incluir(request.args))
     try:
-        ordens = db_session.query(OrdemServico).filter_by(veiculo_id=veiculo_id).all()
-        return jsonify([o.serialize() for o in ordens]), 200
+        serializador = ler_campos(request.args, serializacao.ORDEM_SERVICO)
+        ordens = read_session.execute(
+            serializador.selecionar(ordem).where(ordem.veiculo_id == veiculo_id)
+            .order_by(ordem.id_servico)
+        ).all()
+        return serializacao.resposta(serializador, ordens), 200
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
     except Exception as e:
         print(f"Erro ao buscar ordens por veículo: {e}")
         return jsonify({"mensagem": "Erro interno"}), 500
 
 
-@app.route("/deletarServico/<int:id_servico>", methods=['DELETE'])
+@api.route("/exportarOrdensServico", methods=["GET"])
+@admin_required
+def exportar_ordens_servico():
+    import exportacao
+
+    formato = request.args.get("formato", "csv")
+    gzip = request.args.get("gzip", "").lower() in ("1", "true", "sim")
+    if formato not in exportacao.FORMATOS:
+        return jsonify({"mensagem": "Parâmetro 'formato' deve ser 'csv' ou 'ndjson'."}), 400
+    ordem = arquivo.ordens(arquivo.incluir(request.args))
+    try:
+        filtros = filtros_ordem_servico(request.args, ordem)
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
+
+    por_data = bool(request.args.get("inicio") or request.args.get("fim"))
+    tipo = "application/gzip" if gzip else exportacao.FORMATOS[formato][0]
+    return Response(exportacao.exportar(formato, filtros, por_data, gzip, ordem), content_type=tipo, headers={
+        "Content-Disposition": f'attachment; filename="{exportacao.nome_arquivo(formato, gzip)}"',
+    })
+
+
+@api.route("/eventos/ordens", methods=["GET"])
+def eventos_ordens():
+    # no WSGI cada assinante prende uma thread; o asgi.py serve a mesma rota com corrotinas
+    try:
+        veiculo_id = ler_inteiro(request.args, "veiculo_id", 1)
+        cliente_id = ler_inteiro(request.args, "cliente_id", 1)
+    except ParametroInvalido as e:
+        return jsonify({"mensagem": str(e)}), 400
+    ultimo = request.headers.get("Last-Event-ID") or request.args.get("ultimo")
+    partes = eventos.transmitir(banco.read_engine, ultimo, eventos.filtro(veiculo_id, cliente_id))
+    return Response(partes, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@api.route("/relatorios/receita", methods=["GET"])
+@versionado("ordem_servico")
+def relatorio_receita():
+    try:
+        inicio, fim = relatorios.ler_periodo(request.args)
+        agrupar = request.args.get("agrupar", "dia")
+        if agrupar not in ("dia", "mes"):
+            return jsonify({"mensagem": "Parâmetro 'agrupar' deve ser 'dia' ou 'mes'."}), 400
+        return jsonify(relatorios.receita(inicio, fim, agrupar)), 200
+    except ValueError as e:
+        return jsonify({"mensagem": str(e)}), 400
+    except Exception as e:
+        print(f"Erro no relatório de receita: {e}")
+        return jsonify({"mensagem": "Erro interno do servidor"}), 500
+
+
+@api.route("/relatorios/status", methods=["GET"])
+@versionado("ordem_servico")
+def relatorio_status():
+    try:
+        inicio, fim = relatorios.ler_periodo(request.args)
+        return jsonify(relatorios.por_status(inicio, fim)), 200
+    except ValueError as e:
+        return jsonify({"mensagem": str(e)}), 400
+    except Exception as e:
+        print(f"Erro no relatório por status: {e}")
+        return jsonify({"mensagem": "Erro interno do servidor"}), 500
+
+
+@api.route("/relatorios/veiculo/<int:veiculo_id>", methods=["GET"])
+@versionado("ordem_servico")
+def relatorio_veiculo(veiculo_id):
+    try:
+        return jsonify(relatorios.por_veiculo(veiculo_id)), 200
+    except Exception as e:
+        print(f"Erro no relatório do veículo: {e}")
+        return jsonify({"mensagem": "Erro interno do servidor"}), 500
+
+
+@api.route("/deletarServico/<int:id_servico>", methods=['DELETE'])
 def deletar_servico(id_servico):
     try:
         servico = db_session.query(OrdemServico).get(id_servico)
         if servico is None:
             return jsonify({"message": "Usuário não encontrado"}), 404
 
-        db_session.delete(servico)
-        db_session.commit()
+        servico.delete()
         return jsonify({"message": "Usuário excluído com sucesso"}), 200
     except Exception as e:
         return jsonify({"message": f"Erro ao excluir usuário: {str(e)}"}), 500
 
 
 
+@api.route("/batch", methods=["POST"])
+def batch():
+    try:
+        status, corpo = lote.executar(request.get_json(silent=True))
+        return jsonify(corpo), status
+    except lote.OperacaoInvalida as e:
+        return jsonify({"mensagem": str(e)}), 400
+    except Exception as e:
+        print(f"Erro ao executar lote: {e}")
+        return jsonify({"mensagem": "Erro interno do servidor"}), 500
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
+    create_app().run(debug=True, host="0.0.0.0", port=5000)
\ No newline at end of file
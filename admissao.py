@@ -0,0 +1,159 @@
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+from flask import jsonify, request
+
+ATIVO = os.environ.get("ADMISSAO", "1") != "0"
+
+# rotas caras: varrem tabelas inteiras, agregam ou gravam em massa
+PESADAS = {
+    "listar_usuario", "listar_clientes", "listar_veiculos", "listar_ordem_servicos", "exportar_ordens_servico",
+    "relatorio_receita", "relatorio_status", "relatorio_veiculo", "resumo_cliente", "dados_cliente", "buscar",
+    "importar_lote_clientes", "importar_lote_veiculos", "importar_lote_ordens_servico",
+}
+# assinaturas de eventos (SSE) ficam abertas: têm classe própria, sem fila,
+# para não ocupar as vagas das requisições comuns
+ASSINATURAS = {"eventos_ordens"}
+# o monitoramento responde mesmo com o servidor saturado
+ISENTAS = {"metrics", "static"}
+LEITURA = {"GET", "HEAD", "OPTIONS"}
+
+
+def _config(classe, limite, fila, espera):
+    prefixo = f"ADMISSAO_{classe.upper()}"
+    return (
+        int(os.environ.get(f"{prefixo}_LIMITE", limite)),
+        int(os.environ.get(f"{prefixo}_FILA", fila)),
+        float(os.environ.get(f"{prefixo}_ESPERA", espera)),
+    )
+
+
+class Portao:
+    """Limite de requisições simultâneas de uma classe, com fila limitada e prazo de espera."""
+
+    def __init__(self, classe, limite, fila, espera):
+        self.classe = classe
+        self.limite = limite
+        self.fila = fila
+        self.espera = espera
+        self.ativas = 0
+        self.esperando = 0
+        self.admitidas = 0
+        self.segundos_espera = 0.0
+        self.rejeitadas = Counter()
+        self._condicao = threading.Condition()
+
+    def entrar(self):
+        """None se admitida; senão o motivo da recusa ("fila_cheia" ou "prazo")."""
+        with self._condicao:
+            if self.ativas < self.limite:
+                self.ativas += 1
+                self.admitidas += 1
+                return None
+            if self.esperando >= self.fila:
+                self.rejeitadas["fila_cheia"] += 1
+                return "fila_cheia"
+            self.esperando += 1
+            inicio = time.monotonic()
+            try:
+                admitida = self._condicao.wait_for(lambda: self.ativas < self.limite, self.espera)
+            finally:
+                self.esperando -= 1
+                self.segundos_espera += time.monotonic() - inicio
+            if not admitida:
+                self.rejeitadas["prazo"] += 1
+                return "prazo"
+            self.ativas += 1
+            self.admitidas += 1
+            return None
+
+    def sair(self):
+        with self._condicao:
+            self.ativas -= 1
+            self._condicao.notify()
+
+    def tentar_de_novo(self):
+        return max(1, math.ceil(self.espera))
+
+
+PORTOES = {
+    "pesada": Portao("pesada", *_config("pesada", 4, 16, 2)),
+    "leve": Portao("leve", *_config("leve", 16, 64, 1)),
+    "escrita": Portao("escrita", *_config("escrita", 8, 32, 5)),
+    "assinatura": Portao("assinatura", *_config("assinatura", 32, 0, 0)),
+}
+
+
+def _nome(endpoint):
+    # sem o prefixo do blueprint ("api.listar_clientes" -> "listar_clientes")
+    return (endpoint or "").rpartition(".")[2]
+
+
+def classe(endpoint, metodo):
+    if _nome(endpoint) in ASSINATURAS:
+        return "assinatura"
+    if _nome(endpoint) in PESADAS:
+        return "pesada"
+    return "leve" if metodo in LEITURA else "escrita"
+
+
+def exportar():
+    saida = []
+    for nome, ajuda, tipo, valor in (
+        ("admissao_limite", "Requisições simultâneas permitidas por classe.", "gauge", lambda p: p.limite),
+        ("admissao_ativas", "Requisições em execução por classe.", "gauge", lambda p: p.ativas),
+        ("admissao_fila", "Requisições aguardando vaga por classe.", "gauge", lambda p: p.esperando),
+        ("admissao_admitidas_total", "Requisições admitidas por classe.", "counter", lambda p: p.admitidas),
+        ("admissao_espera_segundos_total", "Tempo total de espera na fila.", "counter",
+         lambda p: round(p.segundos_espera, 6)),
+    ):
+        saida += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+        saida += [f'{nome}{{classe="{p.classe}"}} {valor(p)}' for p in PORTOES.values()]
+    saida += ["# HELP admissao_rejeitadas_total Requisições recusadas com 503, por motivo.",
+              "# TYPE admissao_rejeitadas_total counter"]
+    for portao in PORTOES.values():
+        for motivo in ("fila_cheia", "prazo"):
+            saida.append(f'admissao_rejeitadas_total{{classe="{portao.classe}",motivo="{motivo}"}} '
+                         f'{portao.rejeitadas[motivo]}')
+    return "\n".join(saida) + "\n"
+
+
+# ---- integração com o Flask
+
+def instalar(app):
+    if not ATIVO:
+        return
+
+    @app.before_request
+    def _admitir():
+        if _nome(request.endpoint) in ISENTAS:
+            return None
+        portao = PORTOES[classe(request.endpoint, request.method)]
+        motivo = portao.entrar()
+        if motivo is not None:
+            resposta = jsonify({"mensagem": "Servidor ocupado, tente novamente"})
+            resposta.status_code = 503
+            resposta.headers["Retry-After"] = str(portao.tentar_de_novo())
+            return resposta
+        # no environ, e não no g: as operações do /batch abrem contextos de requisição aninhados
+        request.environ["admissao.portao"] = portao
+        return None
+
+    @app.after_request
+    def _liberar_no_fim(resposta):
+        # respostas em streaming (exportação) seguram a vaga até o último byte;
+        # as demais a devolvem no teardown, mesmo que ninguém chame close()
+        if resposta.is_streamed:
+            portao = request.environ.pop("admissao.portao", None)
+            if portao is not None:
+                resposta.call_on_close(portao.sair)
+        return resposta
+
+    @app.teardown_request
+    def _liberar(_excecao=None):
+        portao = request.environ.pop("admissao.portao", None)
+        if portao is not None:
+            portao.sair()
@@ -0,0 +1,179 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Table, Column, MetaData, Index, select, insert, delete, func, text, union_all
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import aliased
+
+import banco
+import cache_versionado
+from models import OrdemServico, BRASILIA
+
+# ordens fechadas há mais de DIAS saem da tabela quente para o banco anexado
+# como "arquivo" (banco.ARQUIVO_DB). As consultas padrão só leem a tabela
+# quente; com include_archived=1 leem as duas (UNION ALL). Ordens arquivadas
+# não são mais editadas nem removidas pela API.
+ATIVO = make_url(banco.DATABASE_URL).get_backend_name() == "sqlite"
+DIAS = int(os.environ.get("ARQUIVO_DIAS", 0))
+TAMANHO_LOTE = int(os.environ.get("ARQUIVO_LOTE", 1000))
+PAUSA = float(os.environ.get("ARQUIVO_PAUSA_MS", 50)) / 1000
+INTERVALO = float(os.environ.get("ARQUIVO_INTERVALO", 3600))
+
+_QUENTE = OrdemServico.__table__
+_metadata = MetaData()
+# mesmas colunas da tabela quente; sem chaves estrangeiras (o SQLite não as
+# aceita entre bancos) e com os índices das consultas por veículo e período
+ORDENS = Table(
+    "ordem_servico", _metadata,
+    *(Column(coluna.name, coluna.type, primary_key=coluna.primary_key) for coluna in _QUENTE.c),
+    schema="arquivo",
+)
+Index("ix_arquivo_ordem_servico_veiculo_id", ORDENS.c.veiculo_id)
+Index("ix_arquivo_ordem_servico_data_abertura", ORDENS.c.data_abertura)
+Index("ix_arquivo_ordem_servico_status_codigo", ORDENS.c.status_codigo)
+
+
+def garantir_esquema(conexao):
+    """Cria a tabela do arquivo (ou as colunas novas do modelo) se faltarem."""
+    if not ATIVO:
+        return
+    _metadata.create_all(conexao)
+    existentes = {linha[1] for linha in conexao.execute(text("PRAGMA arquivo.table_info(ordem_servico)"))}
+    for coluna in ORDENS.c:
+        if coluna.name not in existentes:
+            tipo = coluna.type.compile(dialect=conexao.dialect)
+            conexao.execute(text(f"ALTER TABLE arquivo.ordem_servico ADD COLUMN {coluna.name} {tipo}"))
+    reservar_ids(conexao)
+
+
+def reservar_ids(conexao):
+    """Leva a sequência da tabela quente até o maior id arquivado.
+
+    A tabela quente é AUTOINCREMENT, mas um arquivo copiado de outro banco (ou
+    um banco migrado) pode ter ids acima da sequência; sem isto, o SQLite os
+    entregaria de novo a ordens novas.
+    """
+    if not ATIVO or not conexao.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")).first():
+        return
+    maior = conexao.execute(select(func.max(ORDENS.c.id_servico))).scalar()
+    if maior is None:
+        return
+    atualizadas = conexao.execute(
+        text("UPDATE sqlite_sequence SET seq = :maior WHERE name = 'ordem_servico' AND seq < :maior"),
+        {"maior": maior},
+    ).rowcount
+    if not atualizadas and not conexao.execute(
+        text("SELECT 1 FROM sqlite_sequence WHERE name = 'ordem_servico'")
+    ).first():
+        conexao.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('ordem_servico', :maior)"),
+                        {"maior": maior})
+
+
+def uniao(*nomes):
+    """Subquery com as colunas pedidas das ordens quentes e arquivadas."""
+    nomes = nomes or tuple(_QUENTE.c.keys())
+    quentes = select(*(_QUENTE.c[nome] for nome in nomes))
+    if not ATIVO:
+        return quentes.subquery("ordens")
+    return union_all(quentes, select(*(ORDENS.c[nome] for nome in nomes))).subquery("ordens")
+
+
+_COM_ARQUIVADAS = aliased(OrdemServico, uniao()) if ATIVO else OrdemServico
+
+
+def ordens(incluir_arquivadas=False):
+    # a entidade usada nas consultas: a tabela quente ou a união com o arquivo;
+    # atributos, colunas e serialize() são os mesmos do OrdemServico
+    return _COM_ARQUIVADAS if incluir_arquivadas else OrdemServico
+
+
+def ordens_onde(condicao, incluir_arquivadas=False):
+    """Como ordens(), já filtrada por `condicao(tabela)` em cada lado da união.
+
+    Para consultas com JOIN ou GROUP BY por fora, em que o SQLite não leva o
+    filtro para dentro do UNION ALL e varreria o arquivo inteiro.
+    """
+    consulta = select(_QUENTE).where(condicao(_QUENTE))
+    if incluir_arquivadas and ATIVO:
+        consulta = union_all(consulta, select(ORDENS).where(condicao(ORDENS)))
+    return aliased(OrdemServico, consulta.subquery("ordens"))
+
+
+def incluir(args):
+    return args.get("include_archived", "").lower() in ("1", "true", "sim")
+
+
+def arquivar(antes_de, lote=TAMANHO_LOTE, pausa=PAUSA):
+    """Move as ordens fechadas antes de `antes_de` para o arquivo; devolve quantas moveu.
+
+    Cada lote é copiado e removido da tabela quente na mesma transação (os dois
+    bancos estão anexados à mesma conexão): a ordem nunca aparece nos dois, nem
+    some. A cópia é um INSERT simples: um id já arquivado é um erro, não uma
+    sobrescrita.
+    """
+    if not ATIVO:
+        return 0
+    with banco.engine.begin() as conexao:
+        garantir_esquema(conexao)
+
+    movidas = 0
+    ultimo = 0
+    while True:
+        with banco.engine.connect() as conexao:
+            ids = conexao.execute(
+                select(_QUENTE.c.id_servico)
+                .where(_QUENTE.c.id_servico > ultimo, _QUENTE.c.data_fechamento < antes_de)
+                .order_by(_QUENTE.c.id_servico)
+                .limit(lote)
+            ).scalars().all()
+        if not ids:
+            break
+        ultimo = ids[-1]
+
+        # o filtro é refeito dentro da transação: uma ordem reaberta depois da
+        # leitura dos ids fica na tabela quente
+        movendo = (_QUENTE.c.id_servico.in_(ids), _QUENTE.c.data_fechamento < antes_de)
+        with banco.engine.begin() as conexao:
+            conexao.execute(
+                insert(ORDENS).from_select(list(_QUENTE.c.keys()), select(_QUENTE).where(*movendo))
+            )
+            movidas += conexao.execute(delete(_QUENTE).where(*movendo)).rowcount
+        # fora da ORM os ganchos não veem a remoção; as listagens padrão mudaram
+        cache_versionado.incrementar("ordem_servico")
+        time.sleep(pausa)
+    return movidas
+
+
+def limite(dias):
+    # data_fechamento é gravada no horário de Brasília, sem fuso
+    return datetime.now(BRASILIA).replace(tzinfo=None) - timedelta(days=dias)
+
+
+def executar_continuamente(dias, intervalo=INTERVALO):
+    # laço do processo arquivador do servidor.py; um erro não derruba o laço
+    while True:
+        try:
+            movidas = arquivar(limite(dias))
+            if movidas:
+                print(f"arquivo: {movidas} ordens arquivadas", file=sys.stderr)
+        except Exception as e:
+            print(f"arquivo: erro ao arquivar: {e}", file=sys.stderr)
+        time.sleep(intervalo)
+
+
+if __name__ == "__main__":
+    from models import init_db
+
+    parser = argparse.ArgumentParser(description="Move ordens de serviço fechadas antigas para o banco de arquivo.")
+    parser.add_argument("--dias", type=int, default=DIAS or 365, help="arquiva as fechadas há mais de N dias")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+    parser.add_argument("--continuo", action="store_true", help=f"repete a cada {INTERVALO:g}s")
+    args = parser.parse_args()
+
+    init_db()
+    if args.continuo:
+        executar_continuamente(args.dias)
+    print(f"{arquivar(limite(args.dias), args.lote)} ordens arquivadas")
@@ -0,0 +1,376 @@
+# Modo de serviço assíncrono (ASGI).
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+#
+# As rotas de leitura mais consultadas e as de ordem de serviço rodam sobre
+# sessões assíncronas do SQLAlchemy (aiosqlite); todas as demais rotas do
+# Api.py continuam disponíveis pelo app Flask montado como WSGI. Requer os
+# pacotes starlette, aiosqlite e a2wsgi.
+#
+# /eventos/ordens (Server-Sent Events) também existe no Flask, mas lá cada
+# assinante prende uma thread; aqui é só uma corrotina. O log dos eventos fica
+# no banco, então vale com qualquer número de workers e processos.
+import asyncio
+import re
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route, Mount
+
+import arquivo
+import cache_versionado
+import compressao
+import eventos
+import metricas
+import serializacao
+from Api import create_app, nova_ordem_servico, editar_ordem_servico, filtros_ordem_servico
+from banco import DATABASE_URL, DATABASE_READ_URL, POOL, configurar_sqlite, db_session
+from models import Usuario, Cliente, Veiculo, OrdemServico, init_db
+from paginacao import ler_parametros, ler_inteiro, ler_campos, ParametroInvalido, LIMITE_PADRAO, LIMITE_MAXIMO, TAMANHO_LOTE
+
+
+def _url_assincrona(url):
+    url = make_url(url)
+    if url.drivername in ("sqlite", "sqlite+pysqlite"):
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+
+def _criar_engine(url, somente_leitura=False):
+    engine = create_async_engine(_url_assincrona(url), **POOL)
+    if engine.dialect.name == "sqlite":
+        configurar_sqlite(engine.sync_engine, somente_leitura)
+    return engine
+
+
+# criadas na partida (_ciclo_de_vida), como as do banco.py no create_app()
+engine = None
+read_engine = None
+
+# mesma classe de sessão do db_session, para que os ganchos de flush/commit
+# (resumos, índice de busca, versões das tabelas) valham também aqui
+Sessao = async_sessionmaker(sync_session_class=db_session.session_factory.class_, expire_on_commit=False)
+SessaoLeitura = async_sessionmaker(expire_on_commit=False)
+
+# o SQLite aceita um escritor por vez; enfileirar aqui evita que as escritas
+# concorrentes esperem no busy_timeout segurando o lock entre awaits
+_escrita = asyncio.Lock()
+
+
+def _json(dados, status=200, cabecalhos=None):
+    # mesmo formato do jsonify do Flask fora do modo debug
+    corpo = serializacao.codificar(dados)
+    return Response(corpo, status_code=status, media_type="application/json", headers=cabecalhos)
+
+
+def _caminho_completo(request):
+    return f"{request.url.path}?{request.url.query}"
+
+
+async def _versionado(request, tabelas, produzir):
+    chave, etag = cache_versionado.assinatura(_caminho_completo(request), tabelas)
+    etag_http = f'W/"{etag}"'
+
+    if etag_http in request.headers.get("if-none-match", "") or f'"{etag}"' in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag_http})
+
+    guardado = cache_versionado.respostas.obter(chave)
+    if guardado is not None:
+        corpo, cabecalhos = guardado
+        return Response(corpo, media_type="application/json", headers={**dict(cabecalhos), "ETag": etag_http})
+
+    resposta = await produzir()
+    if resposta.status_code == 200 and not isinstance(resposta, StreamingResponse):
+        cabecalhos = [(k, resposta.headers[k]) for k in cache_versionado.CABECALHOS_GUARDADOS if k in resposta.headers]
+        cache_versionado.respostas.guardar(chave, resposta.body, cabecalhos)
+    if resposta.status_code == 200:
+        resposta.headers["ETag"] = etag_http
+    return resposta
+
+
+def _serializado(serializador, linhas, cabecalhos=None):
+    return Response(serializador.json(linhas), media_type="application/json", headers=cabecalhos)
+
+
+def _listagem(serializador, chave, tabela, mensagem_erro, filtros=lambda _args, _entidade: (), arquivadas=False):
+    # arquivadas: a rota aceita include_archived (só as de ordens de serviço)
+    async def rota(request):
+        entidade = serializador.modelo
+        if arquivadas:
+            entidade = arquivo.ordens(arquivo.incluir(request.query_params))
+        coluna_chave = getattr(entidade, chave.key)
+        try:
+            limite, cursor, stream = ler_parametros(request.query_params)
+            projecao = ler_campos(request.query_params, serializador)
+            stmt = projecao.selecionar(entidade).where(*filtros(request.query_params, entidade))
+        except ParametroInvalido as e:
+            return _json({"mensagem": str(e)}, 400)
+
+        if cursor is not None:
+            stmt = stmt.where(coluna_chave > cursor)
+        stmt = stmt.order_by(coluna_chave)
+
+        async def produzir():
+            try:
+                if stream:
+                    return StreamingResponse(_stream(stmt.limit(limite) if limite else stmt, projecao),
+                                             media_type="application/json")
+                tamanho = min(limite or LIMITE_PADRAO, LIMITE_MAXIMO)
+                async with SessaoLeitura() as sessao:
+                    linhas = (await sessao.execute(stmt.limit(tamanho + 1))).all()
+                cabecalhos = {}
+                if len(linhas) > tamanho:
+                    linhas = linhas[:tamanho]
+                    proximo = linhas[-1][projecao.indice(chave.key)]
+                    cabecalhos["X-Next-Cursor"] = str(proximo)
+                    cabecalhos["Link"] = f'<{request.url.include_query_params(limit=tamanho, after=proximo)}>; rel="next"'
+                return _serializado(projecao, linhas, cabecalhos)
+            except Exception as e:
+                print(f"{mensagem_erro}: {e}")
+                return _json({"mensagem": mensagem_erro}, 500)
+
+        return await _versionado(request, (tabela,), produzir)
+
+    return rota
+
+
+async def _stream(stmt, serializador):
+    async with SessaoLeitura() as sessao:
+        resultado = await sessao.stream(stmt.execution_options(yield_per=TAMANHO_LOTE))
+        yield b"["
+        primeiro = True
+        async for linhas in resultado.partitions():
+            corpo = serializador.json(linhas)[1:-2]
+            if corpo:
+                yield corpo if primeiro else b"," + corpo
+                primeiro = False
+        yield b"]\n"
+
+
+async def ordens_por_veiculo(request):
+    veiculo_id = request.path_params["veiculo_id"]
+    ordem = arquivo.ordens(arquivo.incluir(request.query_params))
+    try:
+        serializador = ler_campos(request.query_params, serializacao.ORDEM_SERVICO)
+    except ParametroInvalido as e:
+        return _json({"mensagem": str(e)}, 400)
+
+    async def produzir():
+        try:
+            async with SessaoLeitura() as sessao:
+                ordens = (await sessao.execute(
+                    serializador.selecionar(ordem).where(ordem.veiculo_id == veiculo_id)
+                    .order_by(ordem.id_servico)
+                )).all()
+            return _serializado(serializador, ordens)
+        except Exception as e:
+            print(f"Erro ao buscar ordens por veículo: {e}")
+            return _json({"mensagem": "Erro interno"}, 500)
+
+    return await _versionado(request, ("ordem_servico",), produzir)
+
+
+async def servicos_do_cliente(request):
+    cliente_id = request.path_params["cliente_id"]
+    ordem = arquivo.ordens(arquivo.incluir(request.query_params))
+    try:
+        serializador = ler_campos(request.query_params, serializacao.ORDEM_SERVICO)
+    except ParametroInvalido as e:
+        return _json({"mensagem": str(e)}, 400)
+
+    async def produzir():
+        try:
+            async with SessaoLeitura() as sessao:
+                servicos = (await sessao.execute(
+                    serializador.selecionar(ordem)
+                    .where(ordem.veiculo_id.in_(select(Veiculo.id_veiculo).where(Veiculo.cliente_id == cliente_id)))
+                    .order_by(ordem.veiculo_id, ordem.id_servico)
+                )).all()
+            return _serializado(serializador, servicos)
+        except Exception as e:
+            return _json({"error": str(e)}, 500)
+
+    return await _versionado(request, ("veiculos", "ordem_servico"), produzir)
+
+
+async def veiculo_cliente(request):
+    cpf = request.path_params["cpf"]
+    try:
+        serializador = ler_campos(request.query_params, serializacao.VEICULO)
+    except ParametroInvalido as e:
+        return _json({"mensagem": str(e)}, 400)
+
+    async def produzir():
+        try:
+            async with SessaoLeitura() as sessao:
+                linha = (await sessao.execute(
+                    select(*serializador.colunas())
+                    .select_from(Cliente)
+                    .outerjoin(Veiculo, Veiculo.cliente_id == Cliente.id_cliente)
+                    .where(Cliente.cpf == cpf)
+                    .order_by(Veiculo.id_veiculo)
+                    .limit(1)
+                )).first()
+            if not linha:
+                return _json({"mensagem": "Cliente não encontrado"}, 404)
+            if linha.id_veiculo is None:
+                return _json({"mensagem": "Nenhum veículo encontrado"}, 404)
+            return Response(serializador.json_objeto(linha), media_type="application/json")
+        except Exception as e:
+            print(f"Erro ao buscar veículo por CPF: {e}")
+            return _json({"mensagem": "Erro interno do servidor"}, 500)
+
+    return await _versionado(request, ("clientes", "veiculos"), produzir)
+
+
+async def adicionar_ordem_servico(request):
+    try:
+        dados_ordem = await request.json()
+        nova_ordem = nova_ordem_servico(dados_ordem)
+        async with _escrita, Sessao() as sessao:
+            sessao.add(nova_ordem)
+            await sessao.commit()
+        return _json({"mensagem": "Ordem de serviço cadastrada com sucesso", "id_servico": nova_ordem.id_servico}, 201)
+    except (TypeError, KeyError, ValueError) as e:
+        print(f"Erro ao adicionar ordem de serviço: {e}")
+        return _json({"mensagem": "Dados inválidos ou incompletos"}, 400)
+    except Exception as e:
+        print(f"Erro ao adicionar ordem de serviço: {e}")
+        return _json({"mensagem": "Erro interno do servidor"}, 500)
+
+
+async def editar_servico(request):
+    id_servico = request.path_params["id_servico"]
+    # o corpo é lido antes de pegar o lock: um cliente lento não segura os outros escritores
+    try:
+        dados_ordem = await request.json()
+    except ValueError as err:
+        print(f"Erro ao editar serviço: {err}")
+        return _json({"mensagem": "Erro nos dados enviados"}, 400)
+
+    async with _escrita, Sessao() as sessao:
+        ordens_servico = (await sessao.execute(
+            select(OrdemServico).where(OrdemServico.id_servico == id_servico)
+        )).scalar()
+
+        if ordens_servico is None:
+            return _json({"mensagem": "Serviço não encontrado"}, 404)
+
+        try:
+            editar_ordem_servico(ordens_servico, dados_ordem)
+            await sessao.commit()
+            return _json({"mensagem": "Serviço editado com sucesso"})
+        except (KeyError, ValueError, TypeError) as err:
+            print(f"Erro ao editar serviço: {err}")
+            return _json({"mensagem": "Erro nos dados enviados"}, 400)
+        except Exception as err:
+            print(f"Erro inesperado: {err}")
+            return _json({"mensagem": "Erro interno do servidor"}, 500)
+
+
+async def eventos_ordens(request):
+    # uma corrotina por assinante, nenhuma thread: entre as consultas ao log o
+    # assinante só espera o aviso de um commit local ou o intervalo de consulta
+    try:
+        veiculo_id = ler_inteiro(request.query_params, "veiculo_id", 1)
+        cliente_id = ler_inteiro(request.query_params, "cliente_id", 1)
+    except ParametroInvalido as e:
+        return _json({"mensagem": str(e)}, 400)
+    ultimo = request.headers.get("last-event-id") or request.query_params.get("ultimo")
+    partes = eventos.transmitir_assincrono(read_engine, ultimo, eventos.filtro(veiculo_id, cliente_id))
+    return StreamingResponse(partes, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _comprimir(request, resposta):
+    # o mesmo do compressao.instalar do Flask, para as rotas assíncronas
+    tipo = resposta.headers.get("content-type", "").partition(";")[0]
+    if not compressao.comprimivel(tipo, resposta.status_code) or "content-encoding" in resposta.headers:
+        return resposta
+    streaming = isinstance(resposta, StreamingResponse)
+    if not streaming and len(resposta.body) < compressao.MINIMO:
+        return resposta
+    resposta.headers.add_vary_header("Accept-Encoding")
+    codificacao = compressao.escolher(request.headers.get("accept-encoding"))
+    if codificacao is None:
+        return resposta
+    if streaming:
+        resposta.body_iterator = _partes_comprimidas(resposta.body_iterator, codificacao)
+    else:
+        resposta.body = compressao.comprimir(resposta.body, codificacao, resposta.headers.get("etag"))
+        resposta.headers["content-length"] = str(len(resposta.body))
+    resposta.headers["content-encoding"] = codificacao
+    return resposta
+
+
+async def _partes_comprimidas(partes, codificacao):
+    compressor = compressao.Compressor(codificacao)
+    async for dados in partes:
+        if dados:
+            yield compressor.parte(dados)
+    yield compressor.fim()
+
+
+def _comprimido(endpoint):
+    async def comprimido(request):
+        return _comprimir(request, await endpoint(request))
+    return comprimido
+
+
+def _rota(caminho, endpoint, **opcoes):
+    if compressao.ATIVO:
+        endpoint = _comprimido(endpoint)
+    # métricas com o mesmo rótulo da regra do Flask, para que as séries coincidam nos dois modos
+    if metricas.ATIVO:
+        rotulo = re.sub(r"\{(\w+)\}", r"<\1>", re.sub(r"\{(\w+):int\}", r"<int:\1>", caminho))
+        endpoint = metricas.medir_assincrono(rotulo, endpoint)
+    return Route(caminho, endpoint, **opcoes)
+
+
+# o app Flask é criado na partida, depois das migrações: o create_app() inicia
+# as threads da fila de tarefas, que precisam das tabelas
+flask_app = None
+
+
+def _flask(environ, start_response):
+    return flask_app(environ, start_response)
+
+
+@asynccontextmanager
+async def _ciclo_de_vida(_app):
+    global flask_app, engine, read_engine
+    init_db()
+    flask_app = create_app()
+    engine = _criar_engine(DATABASE_URL)
+    read_engine = _criar_engine(DATABASE_READ_URL, somente_leitura=True)
+    Sessao.configure(bind=engine)
+    SessaoLeitura.configure(bind=read_engine)
+    yield
+    await engine.dispose()
+    await read_engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        _rota("/listarUsuario", _listagem(serializacao.USUARIO, Usuario.id, "usuarios", "Erro ao obter clientes")),
+        _rota("/listarClientes", _listagem(serializacao.CLIENTE, Cliente.id_cliente, "clientes", "Erro ao obter clientes")),
+        _rota("/listarVeiculos", _listagem(serializacao.VEICULO, Veiculo.id_veiculo, "veiculos", "Erro ao obter veículos")),
+        _rota("/listarOrdemServicos", _listagem(
+            serializacao.ORDEM_SERVICO, OrdemServico.id_servico, "ordem_servico", "Erro ao obter ordens de serviço",
+            filtros_ordem_servico, arquivadas=True)),
+        _rota("/ordens_por_veiculo/{veiculo_id:int}", ordens_por_veiculo),
+        _rota("/BuscaClientes/id/{cliente_id:int}/servicos", servicos_do_cliente),
+        _rota("/veiculo_cliente/{cpf}", veiculo_cliente),
+        _rota("/adicionarOrdemServico", adicionar_ordem_servico, methods=["POST"]),
+        _rota("/editarServico/{id_servico:int}", editar_servico, methods=["PUT"]),
+        _rota("/eventos/ordens", eventos_ordens),
+        # tudo o que não tem versão assíncrona segue para o app Flask
+        Mount("/", app=WSGIMiddleware(_flask)),
+    ],
+    lifespan=_ciclo_de_vida,
+)
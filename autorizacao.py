@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+
+from flask import jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+from sqlalchemy import event, select
+
+from cache_versionado import versao
+from models import db_session, read_session, Usuario
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave, _AUSENTE)
+            if item is _AUSENTE:
+                return _AUSENTE
+            valor, expira_em = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return _AUSENTE
+            self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic() + self.ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+papeis = CacheTTL(
+    maximo=int(os.environ.get("AUTH_CACHE_TAMANHO", 4096)),
+    ttl=float(os.environ.get("AUTH_CACHE_TTL", 300)),
+)
+
+
+def papel_do_usuario(usuario_id):
+    # a versão da tabela muda em qualquer worker que grave usuários; as
+    # invalidações abaixo só alcançam o próprio processo
+    atual = versao("usuarios")
+    item = papeis.obter(usuario_id)
+    if item is _AUSENTE or item[1] != atual:
+        item = (read_session.execute(select(Usuario.papel).where(Usuario.id == usuario_id)).scalar(), atual)
+        papeis.guardar(usuario_id, item)
+    return item[0]
+
+
+def admin_required(fn):
+    @wraps(fn)
+    def wrapped(*args, **kwargs):
+        verify_jwt_in_request()
+        claims = get_jwt()
+        # a claim assinada descarta não-admins sem consulta; o cache confirma
+        # que o papel não foi retirado depois da emissão do token
+        if claims.get("role") == "admin" and papel_do_usuario(int(claims["sub"])) == "admin":
+            return fn(*args, **kwargs)
+        return jsonify({"msg": "acesso negado, privilegio de administrador"}), 403
+    return wrapped
+
+
+@event.listens_for(db_session, "after_flush")
+def _marcar_usuarios_alterados(session, _contexto):
+    alterados = session.info.setdefault("usuarios_alterados", set())
+    for objeto in chain(session.new, session.dirty, session.deleted):
+        if isinstance(objeto, Usuario) and objeto.id is not None:
+            alterados.add(objeto.id)
+            papeis.invalidar(objeto.id)
+
+
+@event.listens_for(db_session, "after_commit")
+def _invalidar_usuarios_alterados(session):
+    for usuario_id in session.info.pop("usuarios_alterados", ()):
+        papeis.invalidar(usuario_id)
+
+
+@event.listens_for(db_session, "after_soft_rollback")
+def _descartar_usuarios_alterados(session, _transacao):
+    for usuario_id in session.info.pop("usuarios_alterados", ()):
+        papeis.invalidar(usuario_id)
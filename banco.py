@@ -0,0 +1,117 @@
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+# o banco padrão fica ao lado do código, qualquer que seja o diretório de trabalho
+DATABASE_URL = os.environ.get(
+    "DATABASE_URL", "sqlite:///" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "mecanica.db")
+)
+DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL", DATABASE_URL)
+
+
+def _env_int(nome, padrao):
+    valor = os.environ.get(nome)
+    return int(valor) if valor else padrao
+
+
+POOL = {
+    "pool_size": _env_int("DB_POOL_SIZE", 10),
+    "max_overflow": _env_int("DB_MAX_OVERFLOW", 20),
+    "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+    "pool_recycle": _env_int("DB_POOL_RECYCLE", 3600),
+    "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "0") == "1",
+}
+
+# aplicados em toda conexão SQLite nova; journal_mode é persistente no arquivo
+PRAGMAS_SQLITE = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": _env_int("SQLITE_CACHE_SIZE", -64000),
+    "mmap_size": _env_int("SQLITE_MMAP_SIZE", 268435456),
+    "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT", 5000),
+    "temp_store": "MEMORY",
+}
+
+
+def _em_memoria(url):
+    return url.startswith("sqlite") and (url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url)
+
+
+def _arquivo_padrao(url):
+    # ordens antigas (arquivo.py) ficam num arquivo ao lado do banco principal
+    if not url.startswith("sqlite") or _em_memoria(url):
+        return ":memory:"
+    base, extensao = os.path.splitext(make_url(url).database)
+    return f"{base}_arquivo{extensao or '.db'}"
+
+
+ARQUIVO_DB = os.environ.get("ARQUIVO_DB") or _arquivo_padrao(DATABASE_URL)
+
+
+def configurar_sqlite(engine, somente_leitura=False):
+    @event.listens_for(engine, "connect")
+    def aplicar_pragmas(conexao_dbapi, _registro):
+        cursor = conexao_dbapi.cursor()
+        # toda conexão enxerga o arquivo como o schema "arquivo"
+        cursor.execute("ATTACH DATABASE ? AS arquivo", (ARQUIVO_DB,))
+        for nome, valor in PRAGMAS_SQLITE.items():
+            if somente_leitura and nome == "journal_mode":
+                continue
+            cursor.execute(f"PRAGMA {nome}={valor}")
+        # journal_mode sem schema já vale para os dois bancos; synchronous não
+        cursor.execute(f"PRAGMA arquivo.synchronous={PRAGMAS_SQLITE['synchronous']}")
+        if somente_leitura:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def criar_engine(url, somente_leitura=False):
+    opcoes = {} if _em_memoria(url) else dict(POOL)
+    engine = create_engine(url, **opcoes)
+    if engine.dialect.name == "sqlite":
+        configurar_sqlite(engine, somente_leitura)
+    return engine
+
+
+# as engines são criadas por iniciar(), não na importação: importar os módulos
+# não abre conexão nem pool, e cada worker do servidor.py cria as suas depois do fork
+engine = None
+read_engine = None
+_pid = None
+
+db_session = scoped_session(sessionmaker())
+# sessão das rotas GET: conexões separadas, que nunca disputam o lock de escrita
+read_session = scoped_session(sessionmaker())
+
+
+def iniciar():
+    """Cria as engines deste processo e liga as sessões a elas; chamadas repetidas não fazem nada.
+
+    Chamado pelo create_app() e pelo init_db(). Num processo filho, as engines
+    herdadas do pai são trocadas por novas.
+    """
+    global engine, read_engine, _pid
+    if _pid == os.getpid():
+        return
+    if engine is not None:
+        # conexões herdadas do processo pai continuam dele: o filho só
+        # esquece o pool, sem fechá-las
+        engine.dispose(close=False)
+        read_engine.dispose(close=False)
+        db_session.registry.clear()
+        read_session.registry.clear()
+    engine = criar_engine(DATABASE_URL)
+    if _em_memoria(DATABASE_READ_URL):
+        read_engine = engine
+    else:
+        read_engine = criar_engine(DATABASE_READ_URL, somente_leitura=True)
+    db_session.configure(bind=engine)
+    read_session.configure(bind=read_engine)
+    _pid = os.getpid()
+
+
+def remover_sessoes(_excecao=None):
+    db_session.remove()
+    read_session.remove()
@@ -0,0 +1,96 @@
+# Latência das rotas de ordens conforme o histórico cresce, com e sem arquivo.
+#
+#   python -m benchmarks.arquivo --anos 1 3 6 --ordens-por-ano 50000
+#
+# Para cada tamanho de histórico, num processo novo e banco temporário próprio:
+# mede as rotas com tudo na tabela quente, arquiva as ordens fechadas há mais
+# de --dias (arquivo.py) e mede de novo, com e sem include_archived=1. O cache
+# de respostas é invalidado a cada requisição. A saída é um JSON comparável
+# entre commits.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROTAS = {
+    "ordens_por_veiculo": "/ordens_por_veiculo/{veiculo}",
+    "servicos_do_cliente": "/BuscaClientes/id/{cliente}/servicos",
+    "resumo_cliente": "/resumo_cliente/{cpf}",
+    "pagina_ordens": "/listarOrdemServicos?limit=50&after={ordem}",
+}
+
+
+def _medir_rotas(cliente, requisicoes, sufixo=""):
+    import random
+    import statistics
+    import time
+    import cache_versionado
+
+    rnd = random.Random(7)
+    resultado = {}
+    for nome, modelo in ROTAS.items():
+        tempos = []
+        for _ in range(requisicoes):
+            caminho = modelo.format(veiculo=rnd.randint(1, 2000), cliente=rnd.randint(1, 1000),
+                                    cpf=f"{rnd.randint(1, 1000):011d}", ordem=rnd.randint(1, 1000))
+            caminho += ("&" if "?" in caminho else "?") + sufixo if sufixo else ""
+            cache_versionado.incrementar("ordem_servico")
+            inicio = time.perf_counter()
+            assert cliente.get(caminho).status_code == 200, caminho
+            tempos.append(time.perf_counter() - inicio)
+        resultado[nome] = round(statistics.median(tempos) * 1000, 3)
+    return resultado
+
+
+def _medir(anos, ordens_por_ano, dias, requisicoes):
+    from benchmarks.seed import popular
+
+    popular(clientes=1000, veiculos=2000, ordens=anos * ordens_por_ano, dias=anos * 365)
+    from sqlalchemy import select, func
+    from Api import create_app
+    from models import OrdemServico
+    import banco
+    import arquivo
+
+    cliente = create_app().test_client()
+    resultado = {"ordens": anos * ordens_por_ano, "sem_arquivo_ms": _medir_rotas(cliente, requisicoes)}
+    resultado["arquivadas"] = arquivo.arquivar(arquivo.limite(dias), pausa=0)
+    with banco.engine.connect() as conexao:
+        resultado["quentes"] = conexao.execute(select(func.count()).select_from(OrdemServico)).scalar()
+    resultado["com_arquivo_ms"] = _medir_rotas(cliente, requisicoes)
+    resultado["include_archived_ms"] = _medir_rotas(cliente, requisicoes, "include_archived=1")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--anos", type=int, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--ordens-por-ano", type=int, default=50000)
+    parser.add_argument("--dias", type=int, default=90, help="arquiva as fechadas há mais de N dias")
+    parser.add_argument("--requisicoes", type=int, default=200, help="por rota e cenário")
+    parser.add_argument("--medir", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        json.dump(_medir(args.medir, args.ordens_por_ano, args.dias, args.requisicoes), sys.stdout)
+        return
+
+    resultado = {"benchmark": "arquivo", "dias": args.dias, "historico": {}}
+    for anos in args.anos:
+        banco = os.path.join(tempfile.mkdtemp(), "bench.db")
+        ambiente = dict(os.environ, DATABASE_URL=f"sqlite:///{banco}", PYTHONWARNINGS="ignore", ADMISSAO="0")
+        saida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.arquivo", "--medir", str(anos), "--ordens-por-ano",
+             str(args.ordens_por_ano), "--dias", str(args.dias), "--requisicoes", str(args.requisicoes)],
+            cwd=RAIZ, env=ambiente, capture_output=True, text=True, check=True,
+        ).stdout
+        resultado["historico"][f"{anos}_anos"] = json.loads(saida.strip().splitlines()[-1])
+    json.dump(resultado, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
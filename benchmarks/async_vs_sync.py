@@ -0,0 +1,156 @@
+# Compara o servidor WSGI (Flask, uma thread por requisição) com o modo ASGI
+# (asgi.py) sob muitos clientes simultâneos.
+#
+#   python -m benchmarks.async_vs_sync --clientes 500 --requisicoes 4000
+#
+# Sobe cada servidor num subprocesso contra o mesmo banco temporário e
+# imprime um JSON com vazão e latências p50/p95/p99 de cada modo.
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _popular(url, clientes, veiculos, ordens):
+    os.environ["DATABASE_URL"] = url
+    from sqlalchemy import insert
+    from models import init_db, db_session, Cliente, Veiculo, OrdemServico, StatusOrdem
+
+    init_db()
+    db_session.execute(insert(Cliente), [
+        {"nome": f"Cliente {i}", "cpf": f"{i:011d}", "telefone": f"t{i}", "endereco": "Rua", "email": f"c{i}@x"}
+        for i in range(1, clientes + 1)
+    ])
+    db_session.execute(insert(Veiculo), [
+        {"cliente_id": random.randint(1, clientes), "marca": "VW", "modelo": "Gol", "placa": f"P{i:07d}",
+         "ano_fabricacao": 2010}
+        for i in range(1, veiculos + 1)
+    ])
+    db_session.execute(insert(OrdemServico), [
+        {"veiculo_id": random.randint(1, veiculos), "descricao_servico": "revisão", "status": "aberto",
+         "status_codigo": int(StatusOrdem.ABERTA), "valor_estimado": 100.0}
+        for _ in range(ordens)
+    ])
+    db_session.commit()
+    db_session.remove()
+
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))] * 1000, 2)
+
+
+async def _carga(base, clientes, requisicoes, veiculos, escritas):
+    latencias = []
+    erros = 0
+    fila = asyncio.Queue()
+    for _ in range(requisicoes):
+        fila.put_nowait(None)
+
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    async with httpx.AsyncClient(base_url=base, limits=limites, timeout=60) as http:
+        async def cliente():
+            nonlocal erros
+            while True:
+                try:
+                    fila.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                sorteio = random.random()
+                inicio = time.perf_counter()
+                try:
+                    if sorteio < escritas:
+                        r = await http.post("/adicionarOrdemServico", json={
+                            "veiculo_id": random.randint(1, veiculos), "descricao_servico": "bench",
+                            "status": "aberto", "valor_estimado": 10,
+                        })
+                    elif sorteio < 0.9:
+                        r = await http.get(f"/ordens_por_veiculo/{random.randint(1, veiculos)}")
+                    else:
+                        r = await http.get(f"/listarOrdemServicos?limit=100&after={random.randint(0, 1000)}")
+                    if r.status_code >= 400:
+                        erros += 1
+                except httpx.HTTPError:
+                    erros += 1
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente() for _ in range(clientes)))
+        duracao = time.perf_counter() - inicio
+
+    return {
+        "requisicoes": requisicoes,
+        "erros": erros,
+        "segundos": round(duracao, 3),
+        "req_por_segundo": round(requisicoes / duracao, 1),
+        "p50_ms": _percentil(latencias, 50),
+        "p95_ms": _percentil(latencias, 95),
+        "p99_ms": _percentil(latencias, 99),
+    }
+
+
+def _subir(comando, porta, env):
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.time() + 30
+    while time.time() < limite:
+        try:
+            httpx.get(f"http://127.0.0.1:{porta}/", timeout=1)
+            return processo
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f"servidor não respondeu: {' '.join(comando)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clientes", type=int, default=500)
+    parser.add_argument("--requisicoes", type=int, default=4000)
+    parser.add_argument("--veiculos", type=int, default=2000)
+    parser.add_argument("--ordens", type=int, default=50000)
+    parser.add_argument("--escritas", type=float, default=0.1, help="fração de POST /adicionarOrdemServico")
+    args = parser.parse_args()
+
+    random.seed(42)
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    _popular(url, args.veiculos // 2, args.veiculos, args.ordens)
+    env = dict(os.environ, DATABASE_URL=url, PYTHONPATH=RAIZ)
+
+    modos = {
+        "wsgi": lambda p: [sys.executable, "-m", "flask", "--app", "Api", "run", "--port", str(p), "--with-threads"],
+        "asgi": lambda p: [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(p), "--log-level", "warning"],
+    }
+    resultado = {"benchmark": "async_vs_sync", "clientes": args.clientes, "escritas": args.escritas}
+    for nome, comando in modos.items():
+        porta = _porta_livre()
+        processo = _subir(comando(porta), porta, env)
+        try:
+            resultado[nome] = asyncio.run(_carga(f"http://127.0.0.1:{porta}", args.clientes, args.requisicoes, args.veiculos, args.escritas))
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    json.dump(resultado, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# Teste de carga das rotas do Api.py, com latência e vazão por rota.
+#
+#   python -m benchmarks.seed --url sqlite:///bench.db --clientes 10000 --veiculos 20000 --ordens 200000
+#   DATABASE_URL=sqlite:///bench.db python -m benchmarks.carga --mix misto --concorrencia 16 --duracao 30
+#   python -m benchmarks.carga --alvo http://127.0.0.1:5000 --mix polling --saida polling.json
+#
+# Com --alvo cliente (padrão) as requisições passam pelo test client do Flask,
+# no mesmo processo; com uma URL vão por HTTP a um servidor já em execução,
+# que precisa usar o mesmo banco de DATABASE_URL (os ids sorteados vêm dele).
+# Sem banco configurado, um banco temporário pequeno é gerado com o seed.
+#
+# A saída é um JSON com p50/p95/p99 e vazão de cada rota e do total, mais o
+# commit atual, para comparar execuções.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.seed import SENHA_PADRAO, popular
+
+# nome da mistura -> {operação: peso}
+MISTURAS = {
+    "login": {"login": 1},
+    "polling": {"listar_ordens": 4, "ordens_por_veiculo": 4, "listar_clientes": 1, "listar_veiculos": 1},
+    "ordens": {"adicionar_ordem": 3, "editar_ordem": 1},
+    "misto": {
+        "login": 1, "listar_ordens": 6, "ordens_por_veiculo": 10, "listar_clientes": 3, "listar_veiculos": 3,
+        "dados_cliente": 4, "servicos_cliente": 3, "buscar": 2, "relatorio_receita": 1,
+        "adicionar_ordem": 4, "editar_ordem": 2,
+    },
+}
+
+
+class Dados:
+    # limites dos ids e amostras de chaves, lidos do banco de teste
+    def __init__(self):
+        from sqlalchemy import select, func
+        import banco
+        from models import read_session, Usuario, Cliente, Veiculo, OrdemServico
+
+        banco.iniciar()
+        self.clientes = read_session.scalar(select(func.max(Cliente.id_cliente))) or 0
+        self.veiculos = read_session.scalar(select(func.max(Veiculo.id_veiculo))) or 0
+        self.ordens = read_session.scalar(select(func.max(OrdemServico.id_servico))) or 0
+        self.emails = read_session.scalars(select(Usuario.email).limit(100)).all()
+        self.cpfs = read_session.scalars(
+            select(Cliente.cpf).order_by(func.random()).limit(1000)).all()
+        read_session.remove()
+        if not (self.clientes and self.veiculos and self.ordens and self.emails):
+            raise SystemExit("banco sem dados: rode antes python -m benchmarks.seed")
+
+
+def _operacoes(dados):
+    # cada operação devolve (rota, método, caminho, corpo json)
+    def login(rnd):
+        return "/login", "POST", "/login", {"email": rnd.choice(dados.emails), "senha": SENHA_PADRAO}
+
+    def listar_ordens(rnd):
+        return ("/listarOrdemServicos", "GET",
+                f"/listarOrdemServicos?limit=100&after={rnd.randint(0, dados.ordens)}", None)
+
+    def listar_clientes(rnd):
+        return "/listarClientes", "GET", f"/listarClientes?limit=100&after={rnd.randint(0, dados.clientes)}", None
+
+    def listar_veiculos(rnd):
+        return "/listarVeiculos", "GET", f"/listarVeiculos?limit=100&after={rnd.randint(0, dados.veiculos)}", None
+
+    def ordens_por_veiculo(rnd):
+        return ("/ordens_por_veiculo/<id>", "GET",
+                f"/ordens_por_veiculo/{rnd.randint(1, dados.veiculos)}", None)
+
+    def dados_cliente(rnd):
+        return "/dados_cliente/<cpf>", "GET", f"/dados_cliente/{rnd.choice(dados.cpfs)}", None
+
+    def servicos_cliente(rnd):
+        return ("/BuscaClientes/id/<id>/servicos", "GET",
+                f"/BuscaClientes/id/{rnd.randint(1, dados.clientes)}/servicos", None)
+
+    def buscar(rnd):
+        return "/buscar", "GET", f"/buscar?q={rnd.choice(dados.cpfs)[-5:]}", None
+
+    def relatorio_receita(rnd):
+        ano = rnd.choice((2024, 2025))
+        return ("/relatorios/receita", "GET",
+                f"/relatorios/receita?inicio={ano}-01-01&fim={ano}-12-31&agrupar=mes", None)
+
+    def adicionar_ordem(rnd):
+        return "/adicionarOrdemServico", "POST", "/adicionarOrdemServico", {
+            "veiculo_id": rnd.randint(1, dados.veiculos), "descricao_servico": "Teste de carga",
+            "status": "aberto", "valor_estimado": round(rnd.uniform(50, 2000), 2),
+        }
+
+    def editar_ordem(rnd):
+        return "/editarServico/<id>", "PUT", f"/editarServico/{rnd.randint(1, dados.ordens)}", {
+            "descricao_servico": "Teste de carga (editada)", "status": rnd.choice(("em andamento", "concluído")),
+            "valor_estimado": round(rnd.uniform(50, 2000), 2),
+        }
+
+    return {fn.__name__: fn for fn in (
+        login, listar_ordens, listar_clientes, listar_veiculos, ordens_por_veiculo, dados_cliente,
+        servicos_cliente, buscar, relatorio_receita, adicionar_ordem, editar_ordem,
+    )}
+
+
+def _mistura(texto):
+    if texto in MISTURAS:
+        return MISTURAS[texto]
+    # formato livre: "login=1,listar_ordens=5"
+    pesos = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        pesos[nome.strip()] = float(peso or 1)
+    return pesos
+
+
+def _requisitante(alvo):
+    if alvo == "cliente":
+        from Api import create_app
+
+        cliente = create_app().test_client()
+
+        def enviar(metodo, caminho, corpo, cabecalhos):
+            with cliente.open(caminho, method=metodo, json=corpo, headers=cabecalhos) as resposta:
+                return resposta.status_code, resposta.headers.get("ETag")
+        return enviar, lambda: None
+
+    import httpx
+
+    cliente = httpx.Client(base_url=alvo, timeout=60, limits=httpx.Limits(max_connections=None))
+
+    def enviar(metodo, caminho, corpo, cabecalhos):
+        resposta = cliente.request(metodo, caminho, json=corpo, headers=cabecalhos)
+        return resposta.status_code, resposta.headers.get("ETag")
+    return enviar, cliente.close
+
+
+def _percentis(latencias):
+    ordenadas = sorted(latencias)
+
+    def p(q):
+        return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * q / 100))] * 1000, 2)
+    return {"p50_ms": p(50), "p95_ms": p(95), "p99_ms": p(99), "max_ms": round(ordenadas[-1] * 1000, 2)}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def executar(alvo, mistura, concorrencia, duracao=None, requisicoes=None, etag=False, semente=42):
+    dados = Dados()
+    operacoes = _operacoes(dados)
+    desconhecidas = set(mistura) - set(operacoes)
+    if desconhecidas:
+        raise SystemExit(f"operações desconhecidas: {', '.join(sorted(desconhecidas))}")
+    nomes, pesos = list(mistura), list(mistura.values())
+
+    enviar, fechar = _requisitante(alvo)
+    latencias = defaultdict(list)
+    status = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    restantes = [requisicoes]
+    fim = time.perf_counter() + duracao if duracao else None
+
+    def proxima():
+        with lock:
+            if restantes[0] is not None:
+                if restantes[0] <= 0:
+                    return False
+                restantes[0] -= 1
+        return fim is None or time.perf_counter() < fim
+
+    def trabalhador(indice):
+        rnd = random.Random(semente + indice)
+        etags = {}
+        while proxima():
+            rota, metodo, caminho, corpo = operacoes[rnd.choices(nomes, pesos)[0]](rnd)
+            cabecalhos = {}
+            if etag and caminho in etags:
+                cabecalhos["If-None-Match"] = etags[caminho]
+            inicio = time.perf_counter()
+            try:
+                codigo, etag_resposta = enviar(metodo, caminho, corpo, cabecalhos)
+            except Exception as e:
+                codigo, etag_resposta = type(e).__name__, None
+            decorrido = time.perf_counter() - inicio
+            if etag_resposta:
+                etags[caminho] = etag_resposta
+            with lock:
+                latencias[rota].append(decorrido)
+                status[rota][str(codigo)] += 1
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        list(pool.map(trabalhador, range(concorrencia)))
+    total_segundos = time.perf_counter() - inicio
+    fechar()
+
+    rotas = {}
+    for rota in sorted(latencias):
+        rotas[rota] = {
+            "requisicoes": len(latencias[rota]),
+            "req_por_segundo": round(len(latencias[rota]) / total_segundos, 1),
+            "status": dict(status[rota]),
+            **_percentis(latencias[rota]),
+        }
+    todas = [l for valores in latencias.values() for l in valores]
+    return {
+        "benchmark": "carga",
+        "commit": _commit(),
+        "alvo": "cliente" if alvo == "cliente" else "http",
+        "mistura": mistura,
+        "concorrencia": concorrencia,
+        "etag": etag,
+        "segundos": round(total_segundos, 3),
+        "total": {
+            "requisicoes": len(todas),
+            "req_por_segundo": round(len(todas) / total_segundos, 1),
+            "erros": sum(n for s in status.values() for codigo, n in s.items()
+                         if not codigo.isdigit() or int(codigo) >= 500),
+            **(_percentis(todas) if todas else {}),
+        },
+        "rotas": rotas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alvo", default="cliente", help="'cliente' (test client do Flask) ou URL do servidor")
+    parser.add_argument("--mix", default="misto", help=f"{', '.join(MISTURAS)} ou 'operacao=peso,...'")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--duracao", type=float, help="segundos de carga (padrão: 10, se --requisicoes faltar)")
+    parser.add_argument("--requisicoes", type=int)
+    parser.add_argument("--etag", action="store_true", help="reenviar If-None-Match, como um cliente com cache")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo para o JSON (padrão: stdout)")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        if args.alvo != "cliente":
+            parser.error("com --alvo http defina DATABASE_URL com o banco usado pelo servidor")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        popular(clientes=2000, veiculos=4000, ordens=40000, semente=args.semente)
+    if args.duracao is None and args.requisicoes is None:
+        args.duracao = 10
+
+    resultado = executar(args.alvo, _mistura(args.mix), args.concorrencia, args.duracao, args.requisicoes,
+                         args.etag, args.semente)
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    else:
+        json.dump(resultado, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+    import senhas
+    senhas.encerrar()
+
+
+if __name__ == "__main__":
+    main()
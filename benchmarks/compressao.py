@@ -0,0 +1,66 @@
+# Bytes na rede e latência das listagens com fields= e compressão (compressao.py).
+#
+#   python -m benchmarks.compressao --ordens 50000
+#
+# Para cada rota, mede a página (limit) inteira e com os campos de um tablet da
+# oficina, sem compressão e com cada codificação disponível (brotli só se o
+# pacote estiver instalado). O cache de respostas é invalidado a cada
+# requisição, então a consulta e a compressão entram em toda medida. A saída é
+# um JSON comparável entre commits.
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROTAS = {
+    "listar_veiculos": ("/listarVeiculos", "veiculos", "placa,modelo"),
+    "listar_ordens": ("/listarOrdemServicos", "ordem_servico", "status,valor_estimado"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ordens", type=int, default=50000)
+    parser.add_argument("--limite", type=int, default=1000, help="linhas por página")
+    parser.add_argument("--requisicoes", type=int, default=50, help="por rota e cenário")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    os.environ.setdefault("ADMISSAO", "0")
+    os.environ.setdefault("TAREFAS_THREADS", "0")
+    from benchmarks.seed import popular
+    popular(clientes=max(1, args.ordens // 20), veiculos=max(1, args.ordens // 10), ordens=args.ordens)
+
+    from Api import create_app
+    import cache_versionado
+    import compressao
+
+    cliente = create_app().test_client()
+    resultado = {"benchmark": "compressao", "ordens": args.ordens, "limite": args.limite,
+                 "minimo": compressao.MINIMO, "rotas": {}}
+    for nome, (caminho, tabela, campos) in ROTAS.items():
+        cenarios = {}
+        for projecao in ("todos", campos):
+            url = f"{caminho}?limit={args.limite}" + ("" if projecao == "todos" else f"&fields={projecao}")
+            for codificacao in ("identity",) + compressao.CODIFICACOES:
+                tempos, tamanho = [], None
+                for _ in range(args.requisicoes):
+                    cache_versionado.incrementar(tabela)
+                    inicio = time.perf_counter()
+                    with cliente.get(url, headers={"Accept-Encoding": codificacao}) as resposta:
+                        corpo = resposta.get_data()
+                    tempos.append(time.perf_counter() - inicio)
+                    tamanho = len(corpo)
+                cenarios[f"{projecao}/{codificacao}"] = {
+                    "bytes": tamanho, "p50_ms": round(statistics.median(tempos) * 1000, 3),
+                }
+        resultado["rotas"][nome] = cenarios
+    json.dump(resultado, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Vazão de escritas concorrentes com e sem commit em grupo (gravacao.py).
+#
+#   python -m benchmarks.grupo_commit --escritas 2000 --concorrencia 16
+#
+# Cada modo roda num processo novo, sobre um banco temporário próprio:
+#   normal:  um commit por requisição, synchronous=NORMAL (padrão; não durável)
+#   full:    um commit por requisição, synchronous=FULL
+#   grupo:   GRUPO_COMMIT=1 (synchronous=FULL no escritor)
+# A admissão (admissao.py) fica desligada: mede-se só o caminho do commit.
+# A saída é um JSON comparável entre commits.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODOS = {
+    "normal": {},
+    "full": {"SQLITE_SYNCHRONOUS": "FULL"},
+    "grupo": {"GRUPO_COMMIT": "1"},
+}
+
+
+def _medir(escritas, concorrencia):
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from benchmarks.seed import popular
+
+    popular(clientes=100, veiculos=200, ordens=0)
+    from Api import create_app
+    import gravacao
+
+    app = create_app()
+
+    def escrever(i):
+        with app.test_client().post("/adicionarOrdemServico", json={
+            "veiculo_id": 1 + i % 200, "descricao_servico": f"bench {i}", "status": "Aberta", "valor_estimado": 100,
+        }) as resposta:
+            return resposta.status_code
+
+    escrever(0)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        status = list(pool.map(escrever, range(escritas)))
+    duracao = time.perf_counter() - inicio
+    resultado = {
+        "erros": sum(1 for s in status if s != 201),
+        "segundos": round(duracao, 3),
+        "escritas_por_segundo": round(escritas / duracao, 1),
+    }
+    if gravacao.ATIVO:
+        escritor = gravacao.escritor()
+        resultado["media_por_grupo"] = round(escritor.unidades / escritor.grupos, 1)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--escritas", type=int, default=2000)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--modo", choices=tuple(MODOS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        json.dump(_medir(args.escritas, args.concorrencia), sys.stdout)
+        return
+
+    resultado = {"benchmark": "grupo_commit", "escritas": args.escritas, "concorrencia": args.concorrencia}
+    for modo, variaveis in MODOS.items():
+        banco = os.path.join(tempfile.mkdtemp(), "bench.db")
+        ambiente = dict(os.environ, DATABASE_URL=f"sqlite:///{banco}", PYTHONWARNINGS="ignore", ADMISSAO="0",
+                        **variaveis)
+        saida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.grupo_commit", "--modo", modo,
+             "--escritas", str(args.escritas), "--concorrencia", str(args.concorrencia)],
+            cwd=RAIZ, env=ambiente, capture_output=True, text=True, check=True,
+        ).stdout
+        resultado[modo] = json.loads(saida.strip().splitlines()[-1])
+    json.dump(resultado, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
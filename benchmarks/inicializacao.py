@@ -0,0 +1,101 @@
+# Tempo de inicialização: import, create_app() e primeiras requisições.
+#
+#   python -m benchmarks.inicializacao --execucoes 5 --workers 2
+#
+# Cada execução roda num interpretador novo (nada em cache do processo). Mede
+# também o servidor.py: tempo até o primeiro 200 com os workers em pre-fork.
+# Usa um banco temporário; a saída é um JSON comparável entre commits.
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# roda no processo filho; imprime os tempos em milissegundos
+_MEDIR = """
+import json, time
+inicio = time.perf_counter()
+import Api
+importado = time.perf_counter()
+app = Api.create_app()
+criado = time.perf_counter()
+cliente = app.test_client()
+tempos = []
+for caminho in ("/ordens_por_veiculo/1", "/ordens_por_veiculo/2"):
+    antes = time.perf_counter()
+    assert cliente.get(caminho).status_code == 200
+    tempos.append(time.perf_counter() - antes)
+print(json.dumps({
+    "import_ms": (importado - inicio) * 1000,
+    "create_app_ms": (criado - importado) * 1000,
+    "primeira_requisicao_ms": tempos[0] * 1000,
+    "segunda_requisicao_ms": tempos[1] * 1000,
+}))
+"""
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _servidor(workers, ambiente, tempo_limite=30):
+    porta = _porta_livre()
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, os.path.join(RAIZ, "servidor.py"), "--host", "127.0.0.1", "--port", str(porta),
+         "--workers", str(workers)],
+        cwd=RAIZ, env=ambiente, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < tempo_limite:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{porta}/ordens_por_veiculo/1", timeout=1) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - inicio) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("servidor.py não respondeu")
+    finally:
+        processo.terminate()
+        processo.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--execucoes", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(pasta, 'bench.db')}")
+    from benchmarks.seed import popular
+    popular(clientes=100, veiculos=200, ordens=2000)
+
+    ambiente = dict(os.environ, PYTHONPATH=RAIZ, PYTHONWARNINGS="ignore")
+    medidas = []
+    for _ in range(args.execucoes):
+        saida = subprocess.run([sys.executable, "-c", _MEDIR], cwd=RAIZ, env=ambiente,
+                               capture_output=True, text=True, check=True).stdout
+        medidas.append(json.loads(saida.strip().splitlines()[-1]))
+    servidor = [_servidor(args.workers, ambiente) for _ in range(args.execucoes)]
+
+    resultado = {"benchmark": "inicializacao", "execucoes": args.execucoes}
+    for chave in medidas[0]:
+        resultado[chave] = round(statistics.median(m[chave] for m in medidas), 1)
+    resultado["servidor_workers"] = args.workers
+    resultado["servidor_primeiro_200_ms"] = round(statistics.median(servidor), 1)
+    json.dump(resultado, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
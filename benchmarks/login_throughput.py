@@ -0,0 +1,64 @@
+# Vazão de logins por núcleo com o pool de hash de senhas.
+#
+#   python -m benchmarks.login_throughput --logins 200 --concorrencia 32
+#
+# Usa um banco temporário; a saída é um JSON comparável entre commits.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(pasta, 'bench.db')}")
+
+    from Api import create_app
+    from models import init_db, Usuario
+    import senhas
+
+    init_db()
+    usuario = Usuario(nome="bench", cpf="00000000000", email="bench@bench", papel="admin")
+    usuario.set_password("senha")
+    usuario.save()
+
+    cliente = create_app().test_client()
+
+    def logar(_):
+        resposta = cliente.post("/login", json={"email": "bench@bench", "senha": "senha"})
+        return resposta.status_code
+
+    logar(0)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as pool:
+        status = list(pool.map(logar, range(args.logins)))
+    duracao = time.perf_counter() - inicio
+
+    nucleos = os.cpu_count() or 1
+    resultado = {
+        "benchmark": "login_throughput",
+        "metodo": senhas.METODO,
+        "trabalhadores": senhas.TRABALHADORES,
+        "nucleos": nucleos,
+        "logins": args.logins,
+        "concorrencia": args.concorrencia,
+        "erros": sum(1 for s in status if s != 200),
+        "segundos": round(duracao, 3),
+        "logins_por_segundo": round(args.logins / duracao, 1),
+        "logins_por_segundo_por_nucleo": round(args.logins / duracao / nucleos, 1),
+    }
+    senhas.encerrar()
+    json.dump(resultado, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# Gera dados sintéticos no esquema de models.py, em volumes realistas.
+#
+#   python -m benchmarks.seed --url sqlite:///bench.db --clientes 100000 --veiculos 200000 --ordens 2000000
+#
+# A geração é determinística pela --semente. Insere em lotes pelo Core e, no
+# fim, reconstrói os resumos de relatório e o índice de busca, que as inserções
+# em massa não atualizam.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+LOTE = 10000
+SENHA_PADRAO = "senha123"
+
+NOMES = ("Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+         "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Vitória", "William")
+SOBRENOMES = ("Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+              "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Araújo")
+RUAS = ("Rua das Flores", "Av. Brasil", "Rua XV de Novembro", "Av. Paulista", "Rua São João", "Rua Goiás")
+MODELOS = {
+    "Volkswagen": ("Gol", "Polo", "T-Cross", "Saveiro", "Virtus"),
+    "Fiat": ("Uno", "Argo", "Strada", "Mobi", "Toro"),
+    "Chevrolet": ("Onix", "Prisma", "S10", "Tracker", "Celta"),
+    "Ford": ("Ka", "Fiesta", "Ranger", "EcoSport"),
+    "Toyota": ("Corolla", "Hilux", "Etios", "Yaris"),
+    "Honda": ("Civic", "Fit", "HR-V", "City"),
+    "Hyundai": ("HB20", "Creta", "Tucson"),
+}
+SERVICOS = ("Troca de óleo", "Revisão completa", "Alinhamento e balanceamento", "Troca de pastilhas de freio",
+            "Substituição da embreagem", "Reparo no ar-condicionado", "Troca de correia dentada",
+            "Diagnóstico elétrico", "Troca de amortecedores", "Funilaria e pintura")
+# (status, peso, fechada)
+STATUS = (("aberto", 10, False), ("em andamento", 8, False), ("aguardando peças", 4, False),
+          ("concluído", 60, True), ("finalizado", 15, True), ("cancelado", 3, False))
+
+
+def _lotes(gerador, tamanho=LOTE):
+    lote = []
+    for item in gerador:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _clientes(rnd, quantidade):
+    for i in range(1, quantidade + 1):
+        nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+        yield {
+            "id_cliente": i,
+            "nome": nome,
+            "cpf": f"{i:011d}",
+            "telefone": f"(11) 9{rnd.randrange(10 ** 8):08d}",
+            "endereco": f"{rnd.choice(RUAS)}, {rnd.randint(1, 3000)}",
+            "email": f"cliente{i}@exemplo.com.br",
+            "ativo": rnd.random() > 0.05,
+        }
+
+
+def _placa(i):
+    letras = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return (letras[i // 676000 % 26] + letras[i // 26000 % 26] + letras[i // 1000 % 26]
+            + f"{i // 100 % 10}" + letras[i // 10 % 10] + f"{i % 10}")
+
+
+def _veiculos(rnd, quantidade, clientes):
+    for i in range(1, quantidade + 1):
+        marca = rnd.choice(tuple(MODELOS))
+        yield {
+            "id_veiculo": i,
+            # os primeiros veículos garantem que todo cliente tenha ao menos um
+            "cliente_id": i if i <= clientes else rnd.randint(1, clientes),
+            "marca": marca,
+            "modelo": rnd.choice(MODELOS[marca]),
+            "placa": _placa(i),
+            "ano_fabricacao": rnd.randint(1995, 2025),
+        }
+
+
+def _ordens(rnd, quantidade, veiculos, dias):
+    from models import codigo_status
+
+    fim = datetime(2025, 12, 31)
+    inicio = fim - timedelta(days=dias)
+    status, pesos = [s[0] for s in STATUS], [s[1] for s in STATUS]
+    fechadas = {s[0] for s in STATUS if s[2]}
+    codigos = {s: int(codigo_status(s)) for s in status}
+    for i in range(1, quantidade + 1):
+        abertura = inicio + timedelta(seconds=rnd.randrange(dias * 86400))
+        situacao = rnd.choices(status, pesos)[0]
+        yield {
+            "id_servico": i,
+            "veiculo_id": rnd.randint(1, veiculos),
+            "data_abertura": abertura,
+            "descricao_servico": rnd.choice(SERVICOS),
+            "status": situacao,
+            "status_codigo": codigos[situacao],
+            "valor_estimado": round(rnd.lognormvariate(6, 0.8), 2),
+            "data_fechamento": abertura + timedelta(hours=rnd.randint(1, 240)) if situacao in fechadas else None,
+        }
+
+
+def popular(clientes, veiculos, ordens, usuarios=10, dias=730, semente=42):
+    from sqlalchemy import insert
+    import banco
+    from models import init_db, Usuario, Cliente, Veiculo, OrdemServico
+    from senhas import gerar_hash
+    import busca
+    import relatorios
+
+    rnd = random.Random(semente)
+    init_db()
+    contagem = {}
+    # uma só senha para todos: gerar milhares de hashes caros não mede nada
+    senha = gerar_hash(SENHA_PADRAO)
+    with banco.engine.begin() as conexao:
+        conexao.execute(insert(Usuario), [
+            {"nome": f"Usuário {i}", "cpf": f"9{i:010d}", "email": f"usuario{i}@exemplo.com.br",
+             "password": senha, "papel": "admin" if i == 1 else "usuario"}
+            for i in range(1, usuarios + 1)
+        ])
+        contagem["usuarios"] = usuarios
+        for nome, modelo, gerador in (
+            ("clientes", Cliente, _clientes(rnd, clientes)),
+            ("veiculos", Veiculo, _veiculos(rnd, veiculos, clientes)),
+            ("ordens_servico", OrdemServico, _ordens(rnd, ordens, veiculos, dias)),
+        ):
+            inicio = time.perf_counter()
+            linhas = 0
+            for lote in _lotes(gerador):
+                conexao.execute(insert(modelo), lote)
+                linhas += len(lote)
+            contagem[nome] = {"linhas": linhas, "segundos": round(time.perf_counter() - inicio, 2)}
+            print(f"{nome}: {linhas} linhas", file=sys.stderr)
+
+        inicio = time.perf_counter()
+        relatorios.reconstruir(conexao)
+        busca.reconstruir(conexao)
+        contagem["derivados_segundos"] = round(time.perf_counter() - inicio, 2)
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="banco de destino (padrão: DATABASE_URL)")
+    parser.add_argument("--clientes", type=int, default=100000)
+    parser.add_argument("--veiculos", type=int, default=200000)
+    parser.add_argument("--ordens", type=int, default=2000000)
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--dias", type=int, default=730, help="período coberto pelas ordens de serviço")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.veiculos < args.clientes:
+        parser.error("--veiculos deve ser maior ou igual a --clientes")
+    if args.url:
+        os.environ["DATABASE_URL"] = args.url
+
+    inicio = time.perf_counter()
+    contagem = popular(args.clientes, args.veiculos, args.ordens, args.usuarios, args.dias, args.semente)
+    json.dump({"seed": contagem, "semente": args.semente, "segundos": round(time.perf_counter() - inicio, 2)},
+              sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
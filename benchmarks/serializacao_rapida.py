@@ -0,0 +1,115 @@
+# Paridade e ganho da serialização sem hidratação (serializacao.py).
+#
+#   python -m benchmarks.serializacao_rapida --ordens 100000
+#
+# Compara, byte a byte, o corpo gerado a partir das colunas com o do jsonify
+# sobre serialize() de cada objeto, em todos os modelos listados pela API e
+# com casos de borda (acentos, emoji, floats em notação exponencial). Sai com
+# código 1 se alguma saída divergir. Depois mede as duas formas sobre a tabela
+# de ordens de serviço inteira.
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def _casos_de_borda():
+    from sqlalchemy import insert
+    from models import db_session, Cliente, Veiculo, OrdemServico
+
+    cliente = db_session.execute(insert(Cliente).returning(Cliente.id_cliente), [{
+        "nome": "Zoë Ñandú \U0001F600 \x7f \"aspas\" \\ barra", "cpf": "99999999999", "telefone": "(11) 1",
+        "endereco": "Rua   Linha", "email": "borda@exemplo.com.br", "ativo": None,
+    }]).scalar()
+    veiculo = db_session.execute(insert(Veiculo).returning(Veiculo.id_veiculo), [{
+        "cliente_id": cliente, "marca": "Citroën", "modelo": "C4 Cactus", "placa": "ZZZ9Z99", "ano_fabricacao": 2020,
+    }]).scalar()
+    db_session.execute(insert(OrdemServico), [
+        {"veiculo_id": veiculo, "descricao_servico": descricao, "status": "aberto", "valor_estimado": valor}
+        for descricao, valor in (("grande", 1e17), ("pequeno", 1.5e-5), ("zero", 0.0), ("negativo", -0.0),
+                                 ("nulo", None), ("dízima", 0.1 + 0.2), ("limite", 9999999999999998.0))
+    ])
+    db_session.commit()
+
+
+def _cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ordens", type=int, default=100000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    from benchmarks.seed import popular
+    popular(clientes=max(1, args.ordens // 20), veiculos=max(1, args.ordens // 10), ordens=args.ordens)
+
+    from flask import jsonify
+    from sqlalchemy import select
+    from Api import create_app
+    from models import read_session
+    import serializacao
+
+    app = create_app()
+    with app.app_context():
+        def antigo():
+            objetos = read_session.execute(select(serializacao.OrdemServico)).scalars().all()
+            jsonify([o.serialize() for o in objetos]).get_data()
+            read_session.remove()
+
+        def novo():
+            serializacao.resposta(serializacao.ORDEM_SERVICO,
+                                  read_session.execute(serializacao.ORDEM_SERVICO.selecionar()).all()).get_data()
+            read_session.remove()
+
+        antigo_s = _cronometrar(antigo, args.repeticoes)
+        novo_s = _cronometrar(novo, args.repeticoes)
+
+        # os casos de borda ficam no fim de cada tabela: a lista sem as últimas
+        # linhas passa pelo orjson, a lista inteira cai no json da biblioteca padrão
+        _casos_de_borda()
+        divergencias = []
+        for serializador in (serializacao.USUARIO, serializacao.CLIENTE, serializacao.VEICULO,
+                             serializacao.ORDEM_SERVICO):
+            chave = getattr(serializador.modelo, serializador.campos[0])
+            objetos = read_session.execute(select(serializador.modelo).order_by(chave)).scalars().all()
+            linhas = read_session.execute(serializador.selecionar().order_by(chave)).all()
+            for nome, orjson in (("orjson", serializacao.orjson), ("json", None)):
+                serializacao.orjson, original = orjson, serializacao.orjson
+                try:
+                    for fim in (max(1, len(linhas) - 10), len(linhas)):
+                        if serializador.json(linhas[:fim]) != jsonify([o.serialize() for o in objetos[:fim]]).get_data():
+                            divergencias.append(f"{serializador.modelo.__name__} ({nome}): {fim} linhas")
+                    for linha, objeto in zip(linhas[-10:], objetos[-10:]):
+                        if serializador.json_objeto(linha) != jsonify(objeto.serialize()).get_data():
+                            divergencias.append(f"{serializador.modelo.__name__} ({nome}): objeto {linha[0]}")
+                finally:
+                    serializacao.orjson = original
+            read_session.remove()
+
+    json.dump({
+        "benchmark": "serializacao_rapida",
+        "linhas": args.ordens,
+        "orjson": serializacao.orjson is not None,
+        "paridade": not divergencias,
+        "divergencias": divergencias,
+        "serialize_jsonify_s": round(antigo_s, 3),
+        "colunas_s": round(novo_s, 3),
+        "aceleracao": round(antigo_s / novo_s, 2),
+    }, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+    sys.exit(1 if divergencias else 0)
+
+
+if __name__ == "__main__":
+    main()
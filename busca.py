@@ -0,0 +1,190 @@
+import re
+import sys
+import unicodedata
+
+from sqlalchemy import event, text, select
+
+import banco
+from models import db_session, read_session, Cliente, Veiculo
+
+# rowid = id * 2 + tipo, para atualizar e remover sem varrer o índice
+TIPOS = {"cliente": 0, "veiculo": 1}
+TAMANHO_LOTE = 2000
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+
+CRIAR_TABELA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS busca_fts "
+    "USING fts5(texto, tokenize = 'trigram')"
+)
+
+
+class BuscaInvalida(ValueError):
+    pass
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+def compactar(texto):
+    return re.sub(r"[^0-9a-z]", "", normalizar(texto))
+
+
+def texto_cliente(nome, email, telefone, cpf):
+    return " ".join((normalizar(nome), normalizar(email), compactar(telefone), compactar(cpf)))
+
+
+def texto_veiculo(placa, marca, modelo):
+    return " ".join((compactar(placa), normalizar(marca), normalizar(modelo)))
+
+
+def _rowid(tipo, ref_id):
+    return ref_id * 2 + TIPOS[tipo]
+
+
+def _gravar(conexao, tipo, itens):
+    # itens: [(ref_id, texto)]
+    if not itens:
+        return
+    conexao.execute(
+        text("DELETE FROM busca_fts WHERE rowid = :rowid"),
+        [{"rowid": _rowid(tipo, ref_id)} for ref_id, _ in itens],
+    )
+    conexao.execute(
+        text("INSERT INTO busca_fts (rowid, texto) VALUES (:rowid, :texto)"),
+        [{"rowid": _rowid(tipo, ref_id), "texto": texto} for ref_id, texto in itens],
+    )
+
+
+def remover(conexao, tipo, ids):
+    ids = list(ids)
+    if ids:
+        conexao.execute(
+            text("DELETE FROM busca_fts WHERE rowid = :rowid"),
+            [{"rowid": _rowid(tipo, ref_id)} for ref_id in ids],
+        )
+
+
+def _texto_do_objeto(objeto):
+    if isinstance(objeto, Cliente):
+        return "cliente", objeto.id_cliente, texto_cliente(objeto.nome, objeto.email, objeto.telefone, objeto.cpf)
+    return "veiculo", objeto.id_veiculo, texto_veiculo(objeto.placa, objeto.marca, objeto.modelo)
+
+
+@event.listens_for(db_session, "after_flush")
+def _sincronizar(session, _contexto):
+    gravar = {"cliente": [], "veiculo": []}
+    apagar = {"cliente": [], "veiculo": []}
+    for objeto in list(session.new) + [o for o in session.dirty if session.is_modified(o)]:
+        if isinstance(objeto, (Cliente, Veiculo)):
+            tipo, ref_id, texto = _texto_do_objeto(objeto)
+            gravar[tipo].append((ref_id, texto))
+    for objeto in session.deleted:
+        if isinstance(objeto, Cliente):
+            apagar["cliente"].append(objeto.id_cliente)
+        elif isinstance(objeto, Veiculo):
+            apagar["veiculo"].append(objeto.id_veiculo)
+
+    if not any(gravar.values()) and not any(apagar.values()):
+        return
+    conexao = session.connection()
+    for tipo in TIPOS:
+        _gravar(conexao, tipo, gravar[tipo])
+        remover(conexao, tipo, apagar[tipo])
+
+
+def indexar_clientes(session, linhas, ids):
+    _gravar(session.connection(), "cliente", [
+        (ref_id, texto_cliente(l["nome"], l["email"], l["telefone"], l["cpf"])) for l, ref_id in zip(linhas, ids)
+    ])
+
+
+def indexar_veiculos(session, linhas, ids):
+    _gravar(session.connection(), "veiculo", [
+        (ref_id, texto_veiculo(l["placa"], l["marca"], l["modelo"])) for l, ref_id in zip(linhas, ids)
+    ])
+
+
+def reconstruir(conexao):
+    conexao.execute(text(CRIAR_TABELA))
+    conexao.execute(text("DELETE FROM busca_fts"))
+    consultas = (
+        ("cliente", select(Cliente.id_cliente, Cliente.nome, Cliente.email, Cliente.telefone, Cliente.cpf), texto_cliente),
+        ("veiculo", select(Veiculo.id_veiculo, Veiculo.placa, Veiculo.marca, Veiculo.modelo), texto_veiculo),
+    )
+    for tipo, stmt, montar in consultas:
+        lote = []
+        resultado = conexao.execution_options(yield_per=TAMANHO_LOTE).execute(stmt)
+        for ref_id, *campos in resultado:
+            lote.append((ref_id, montar(*campos)))
+            if len(lote) >= TAMANHO_LOTE:
+                conexao.execute(
+                    text("INSERT INTO busca_fts (rowid, texto) VALUES (:rowid, :texto)"),
+                    [{"rowid": _rowid(tipo, i), "texto": t} for i, t in lote],
+                )
+                lote = []
+        if lote:
+            conexao.execute(
+                text("INSERT INTO busca_fts (rowid, texto) VALUES (:rowid, :texto)"),
+                [{"rowid": _rowid(tipo, i), "texto": t} for i, t in lote],
+            )
+
+
+def _expressao(consulta):
+    # cada termo vira uma busca por substring (trigramas), na forma normalizada e
+    # na compactada, para que "abc-1234" ache a placa "abc1234"
+    termos = []
+    for termo in normalizar(consulta).split():
+        variantes = {termo, re.sub(r"[^0-9a-z]", "", termo)}
+        variantes = [v for v in variantes if len(v) >= 3]
+        if variantes:
+            termos.append("(" + " OR ".join('"' + v.replace('"', '""') + '"' for v in sorted(variantes)) + ")")
+    if not termos:
+        raise BuscaInvalida("A busca precisa de ao menos um termo com 3 caracteres.")
+    return " AND ".join(termos)
+
+
+def buscar(consulta, limite=LIMITE_PADRAO, tipo=None):
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    sql = "SELECT rowid FROM busca_fts WHERE busca_fts MATCH :expressao"
+    parametros = {"expressao": _expressao(consulta), "limite": limite}
+    if tipo is not None:
+        if tipo not in TIPOS:
+            raise BuscaInvalida("Tipo deve ser 'cliente' ou 'veiculo'.")
+        sql += " AND rowid % 2 = :tipo"
+        parametros["tipo"] = TIPOS[tipo]
+    sql += " ORDER BY rank LIMIT :limite"
+
+    rowids = read_session.execute(text(sql), parametros).scalars().all()
+    ids_clientes = [r // 2 for r in rowids if r % 2 == TIPOS["cliente"]]
+    ids_veiculos = [r // 2 for r in rowids if r % 2 == TIPOS["veiculo"]]
+
+    clientes = {}
+    if ids_clientes:
+        clientes = {c.id_cliente: c for c in read_session.execute(
+            select(Cliente).where(Cliente.id_cliente.in_(ids_clientes))).scalars()}
+    veiculos = {}
+    if ids_veiculos:
+        veiculos = {v.id_veiculo: v for v in read_session.execute(
+            select(Veiculo).where(Veiculo.id_veiculo.in_(ids_veiculos))).scalars()}
+
+    resultados = []
+    for rowid in rowids:
+        ref_id = rowid // 2
+        if rowid % 2 == TIPOS["cliente"] and ref_id in clientes:
+            resultados.append({"tipo": "cliente", "id": ref_id, "dados": clientes[ref_id].serialize()})
+        elif rowid % 2 == TIPOS["veiculo"] and ref_id in veiculos:
+            resultados.append({"tipo": "veiculo", "id": ref_id, "dados": veiculos[ref_id].serialize()})
+    return resultados
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["reconstruir"]:
+        print("uso: python busca.py reconstruir")
+        sys.exit(2)
+    banco.iniciar()
+    with banco.engine.begin() as conexao:
+        reconstruir(conexao)
+    print("Índice de busca reconstruído")
@@ -0,0 +1,164 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from itertools import chain
+
+from flask import request, make_response, Response
+from sqlalchemy import event
+
+from models import db_session
+
+MAXIMO_BYTES = int(os.environ.get("CACHE_RESPOSTAS_BYTES", 64 * 1024 * 1024))
+MAXIMO_ITEM = int(os.environ.get("CACHE_RESPOSTAS_ITEM", 8 * 1024 * 1024))
+CABECALHOS_GUARDADOS = ("X-Next-Cursor", "Link")
+
+# muda a cada início do processo, para que ETags antigas não coincidam com
+# contadores que recomeçaram do zero
+_INSTANCIA = uuid.uuid4().hex[:8]
+
+_versoes = defaultdict(int)
+_lock_versoes = threading.Lock()
+
+
+class _VersoesCompartilhadas:
+    """Contadores em memória compartilhada, vistos por todos os workers do servidor.py."""
+
+    def __init__(self, tabelas):
+        self._indices = {tabela: i for i, tabela in enumerate(tabelas)}
+        self._valores = multiprocessing.RawArray("q", len(tabelas))
+        # tabelas fora do mapeamento (não deveria haver) ficam só neste processo
+        self._locais = defaultdict(int)
+
+    def __getitem__(self, tabela):
+        indice = self._indices.get(tabela)
+        return self._locais[tabela] if indice is None else self._valores[indice]
+
+    def __setitem__(self, tabela, valor):
+        indice = self._indices.get(tabela)
+        if indice is None:
+            self._locais[tabela] = valor
+        else:
+            self._valores[indice] = valor
+
+
+def compartilhar_versoes(tabelas):
+    """Chamado pelo processo principal antes do fork, para que uma escrita num
+    worker invalide o cache e as ETags de todos os outros."""
+    global _versoes, _lock_versoes
+    _versoes = _VersoesCompartilhadas(tabelas)
+    _lock_versoes = multiprocessing.Lock()
+
+
+def versao(tabela):
+    return _versoes[tabela]
+
+
+def incrementar(*tabelas):
+    with _lock_versoes:
+        for tabela in tabelas:
+            _versoes[tabela] += 1
+
+
+def _anotar(session, tabelas):
+    session.info.setdefault("tabelas_alteradas", set()).update(tabelas)
+
+
+@event.listens_for(db_session, "after_flush")
+def _tabelas_do_flush(session, _contexto):
+    _anotar(session, {
+        objeto.__table__.name
+        for objeto in chain(session.new, session.dirty, session.deleted)
+        if hasattr(objeto, "__table__")
+    })
+
+
+@event.listens_for(db_session, "do_orm_execute")
+def _tabelas_do_execute(estado):
+    # insert/update/delete em massa, como os da importação, não passam pelo flush
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabela = getattr(estado.statement, "table", None)
+        if tabela is not None:
+            _anotar(estado.session, {tabela.name})
+
+
+@event.listens_for(db_session, "after_commit")
+def _incrementar_versoes(session):
+    incrementar(*session.info.pop("tabelas_alteradas", ()))
+
+
+@event.listens_for(db_session, "after_soft_rollback")
+def _descartar_versoes(session, _transacao):
+    session.info.pop("tabelas_alteradas", None)
+
+
+class CacheRespostas:
+    def __init__(self, maximo_bytes):
+        self.maximo_bytes = maximo_bytes
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens.move_to_end(chave)
+            return item
+
+    def guardar(self, chave, corpo, cabecalhos):
+        if len(corpo) > MAXIMO_ITEM:
+            return
+        with self._lock:
+            anterior = self._itens.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior[0])
+            self._itens[chave] = (corpo, cabecalhos)
+            self.bytes += len(corpo)
+            while self.bytes > self.maximo_bytes:
+                _, (removido, _) = self._itens.popitem(last=False)
+                self.bytes -= len(removido)
+
+
+respostas = CacheRespostas(MAXIMO_BYTES)
+
+
+def assinatura(caminho_completo, tabelas):
+    # a versão é lida antes da consulta: se uma escrita terminar no meio,
+    # o corpo fica guardado sob a versão antiga e nunca é servido de novo
+    chave = (caminho_completo, tuple(versao(t) for t in tabelas))
+    etag = hashlib.blake2b(repr((_INSTANCIA, chave)).encode(), digest_size=12).hexdigest()
+    return chave, etag
+
+
+def versionado(*tabelas):
+    def decorador(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            chave, etag = assinatura(request.full_path, tabelas)
+
+            if request.if_none_match.contains_weak(etag):
+                resposta = Response(status=304)
+                resposta.set_etag(etag, weak=True)
+                return resposta
+
+            guardado = respostas.obter(chave)
+            if guardado is not None:
+                corpo, cabecalhos = guardado
+                resposta = Response(corpo, mimetype="application/json", headers=cabecalhos)
+                resposta.set_etag(etag, weak=True)
+                return resposta
+
+            resposta = make_response(fn(*args, **kwargs))
+            if resposta.status_code != 200:
+                return resposta
+            if not resposta.is_streamed:
+                cabecalhos = [(k, resposta.headers[k]) for k in CABECALHOS_GUARDADOS if k in resposta.headers]
+                respostas.guardar(chave, resposta.get_data(), cabecalhos)
+            resposta.set_etag(etag, weak=True)
+            return resposta
+        return wrapped
+    return decorador
@@ -0,0 +1,126 @@
+import os
+import zlib
+
+from flask import request
+from werkzeug.http import parse_accept_header
+
+from cache_versionado import CacheRespostas
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# compressão negociada pelo Accept-Encoding (brotli, se o pacote estiver
+# instalado, ou gzip). Corpos abaixo de MINIMO bytes cabem num pacote e saem
+# como estão: comprimir só gastaria CPU. Os níveis favorecem a velocidade; o
+# ganho de tamanho dos níveis altos é pequeno em JSON e CSV.
+ATIVO = os.environ.get("COMPRESSAO", "1") != "0"
+MINIMO = int(os.environ.get("COMPRESSAO_MINIMO", 1400))
+NIVEL_GZIP = int(os.environ.get("COMPRESSAO_NIVEL_GZIP", 6))
+QUALIDADE_BROTLI = int(os.environ.get("COMPRESSAO_QUALIDADE_BROTLI", 5))
+# corpos já comprimidos das respostas com ETag (versionadas): um acerto no
+# cache de respostas não paga a compressão de novo
+MAXIMO_BYTES = int(os.environ.get("COMPRESSAO_CACHE_MB", 16)) * 1024 * 1024
+
+TIPOS = {"application/json", "text/csv", "text/plain", "text/html"}
+CODIFICACOES = ("br", "gzip") if brotli is not None else ("gzip",)
+
+comprimidos = CacheRespostas(MAXIMO_BYTES)
+
+
+def escolher(accept_encoding):
+    """Codificação a usar para o cabeçalho Accept-Encoding do cliente; None para nenhuma."""
+    if not ATIVO or not accept_encoding:
+        return None
+    # empate na qualidade: vale a ordem de CODIFICACOES (brotli primeiro)
+    return parse_accept_header(accept_encoding).best_match(CODIFICACOES)
+
+
+def comprimivel(tipo, status):
+    # 204 e 304 não têm corpo; text/event-stream fica de fora (cada evento precisa sair na hora)
+    return ATIVO and tipo in TIPOS and 200 <= status and status not in (204, 304)
+
+
+def comprimir(corpo, codificacao, etag=None):
+    chave = (etag, codificacao)
+    if etag is not None:
+        guardado = comprimidos.obter(chave)
+        if guardado is not None:
+            return guardado[0]
+    if codificacao == "br":
+        resultado = brotli.compress(corpo, quality=QUALIDADE_BROTLI)
+    else:
+        resultado = _gzip(corpo)
+    if etag is not None:
+        comprimidos.guardar(chave, resultado, ())
+    return resultado
+
+
+def _gzip(corpo):
+    compressor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+    return compressor.compress(corpo) + compressor.flush()
+
+
+class Compressor:
+    """Compressão incremental para respostas em streaming.
+
+    Cada parte é descarregada por inteiro (sync flush): o cliente recebe os
+    lotes assim que são gerados, como sem compressão.
+    """
+
+    def __init__(self, codificacao):
+        if codificacao == "br":
+            self._brotli = brotli.Compressor(quality=QUALIDADE_BROTLI)
+        else:
+            self._brotli = None
+            self._gzip = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+
+    def parte(self, dados):
+        if self._brotli is not None:
+            return self._brotli.process(dados) + self._brotli.flush()
+        return self._gzip.compress(dados) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def fim(self):
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._gzip.flush()
+
+
+def _partes_comprimidas(partes, codificacao):
+    compressor = Compressor(codificacao)
+    try:
+        for dados in partes:
+            if dados:
+                yield compressor.parte(dados)
+        yield compressor.fim()
+    finally:
+        # o close() do gerador original ainda encerra a consulta do streaming
+        if hasattr(partes, "close"):
+            partes.close()
+
+
+# ---- integração com o Flask
+
+def instalar(app):
+    if not ATIVO:
+        return
+
+    @app.after_request
+    def _comprimir(resposta):
+        if (not comprimivel(resposta.mimetype, resposta.status_code)
+                or resposta.direct_passthrough or "Content-Encoding" in resposta.headers):
+            return resposta
+        if not resposta.is_streamed and resposta.calculate_content_length() < MINIMO:
+            return resposta
+        resposta.vary.add("Accept-Encoding")
+        codificacao = escolher(request.headers.get("Accept-Encoding"))
+        if codificacao is None:
+            return resposta
+        if resposta.is_streamed:
+            resposta.response = _partes_comprimidas(resposta.response, codificacao)
+            resposta.headers.pop("Content-Length", None)
+        else:
+            resposta.set_data(comprimir(resposta.get_data(), codificacao, resposta.headers.get("ETag")))
+        resposta.headers["Content-Encoding"] = codificacao
+        return resposta
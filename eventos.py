@@ -0,0 +1,244 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, select, insert, delete, func
+
+import serializacao
+from models import db_session, OrdemServico, Veiculo, EventoOrdem
+
+# eventos guardados no log; um Last-Event-ID mais antigo que isso recebe "reset"
+MAXIMO_EVENTOS = int(os.environ.get("EVENTOS_MAXIMO", 10000))
+# os commits de outros processos (workers do servidor.py ou do uvicorn) só
+# chegam aos assinantes pela consulta periódica ao log
+INTERVALO_CONSULTA = float(os.environ.get("EVENTOS_INTERVALO", 1))
+INTERVALO_PING = 15
+LOTE_LEITURA = 500
+# a poda roda quando a sequência cruza um múltiplo disto, não a cada commit
+_PODA = max(1, MAXIMO_EVENTOS // 10)
+
+_TABELA = EventoOrdem.__table__
+
+
+class Avisos:
+    """Acorda os assinantes deste processo logo depois de um commit com eventos.
+
+    O log fica no banco (tabela eventos_ordens), compartilhado por todos os
+    processos; os avisos só poupam os assinantes locais de esperar a próxima
+    consulta. Avisar pode acontecer em qualquer thread; os assinantes esperam
+    em loops asyncio (ASGI) ou em threads (WSGI). Cada loop tem um único
+    asyncio.Event trocado a cada aviso, então o custo de avisar não depende do
+    número de assinantes.
+    """
+
+    def __init__(self):
+        self.geracao = 0
+        self._lock = threading.Lock()
+        self._condicao = threading.Condition(self._lock)
+        self._sinais = {}
+
+    def avisar(self):
+        with self._lock:
+            self.geracao += 1
+            self._condicao.notify_all()
+            loops = list(self._sinais)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._acordar, loop)
+            except RuntimeError:
+                # loop já encerrado
+                with self._lock:
+                    self._sinais.pop(loop, None)
+
+    def _acordar(self, loop):
+        with self._lock:
+            sinal = self._sinais.pop(loop, None)
+        if sinal is not None:
+            sinal.set()
+
+    async def aguardar(self, geracao, tempo_limite):
+        """Espera um aviso posterior a `geracao` por até tempo_limite; True se veio."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.geracao != geracao:
+                return True
+            sinal = self._sinais.get(loop)
+            if sinal is None:
+                sinal = self._sinais[loop] = asyncio.Event()
+        try:
+            await asyncio.wait_for(sinal.wait(), tempo_limite)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def aguardar_thread(self, geracao, tempo_limite):
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self.geracao != geracao, tempo_limite)
+
+
+avisos = Avisos()
+
+
+# ---- gravação: na mesma transação da mudança, então só commits entram no log
+
+def _dados(tipo, ordem):
+    return {
+        "tipo": tipo,
+        "id_servico": ordem.id_servico,
+        "veiculo_id": ordem.veiculo_id,
+        "status": ordem.status,
+        "status_codigo": ordem.status_codigo,
+        "em": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+
+
+def _gravar(session, itens):
+    conexao = session.connection()
+    conexao.execute(insert(_TABELA), [{"dados": item} for item in itens])
+    # no SQLite há um escritor por vez: seq cresce na ordem dos commits
+    ultimo = conexao.execute(select(func.max(_TABELA.c.seq))).scalar()
+    if ultimo // _PODA != (ultimo - len(itens)) // _PODA:
+        conexao.execute(delete(_TABELA).where(_TABELA.c.seq <= ultimo - MAXIMO_EVENTOS))
+    session.info["eventos_novos"] = True
+
+
+@event.listens_for(db_session, "after_flush")
+def _coletar(session, _contexto):
+    itens = [_dados("criada", o) for o in session.new if isinstance(o, OrdemServico)]
+    itens += [_dados("alterada", o) for o in session.dirty
+              if isinstance(o, OrdemServico) and session.is_modified(o)]
+    itens += [_dados("removida", o) for o in session.deleted if isinstance(o, OrdemServico)]
+    if not itens:
+        return
+    # o cliente do veículo entra no evento para filtrar assinaturas por cliente
+    veiculos = {item["veiculo_id"] for item in itens if item["veiculo_id"] is not None}
+    clientes = dict(session.connection().execute(
+        select(Veiculo.id_veiculo, Veiculo.cliente_id).where(Veiculo.id_veiculo.in_(veiculos))
+    ).all()) if veiculos else {}
+    for item in itens:
+        item["cliente_id"] = clientes.get(item["veiculo_id"])
+    _gravar(session, itens)
+
+
+def registrar_remocoes(session, linhas, cliente_id):
+    # para remoções em lote pelo Core (tarefas.py), que não passam pelo flush
+    itens = [{**_dados("removida", linha), "cliente_id": cliente_id} for linha in linhas]
+    if itens:
+        _gravar(session, itens)
+
+
+@event.listens_for(db_session, "after_commit")
+def _avisar(session):
+    if session.info.pop("eventos_novos", False):
+        avisos.avisar()
+
+
+@event.listens_for(db_session, "after_soft_rollback")
+def _descartar(session, _transacao):
+    session.info.pop("eventos_novos", None)
+
+
+# ---- leitura: consultas usadas pelos dois modos (Flask e ASGI)
+
+def limites():
+    return select(func.coalesce(func.max(_TABELA.c.seq), 0), func.min(_TABELA.c.seq))
+
+
+def desde(seq):
+    return select(_TABELA.c.seq, _TABELA.c.dados).where(_TABELA.c.seq > seq).order_by(_TABELA.c.seq).limit(LOTE_LEITURA)
+
+
+def retomar(ultimo_id, atual, mais_antigo):
+    """(seq, reiniciar): de onde continuar a partir do Last-Event-ID do cliente."""
+    if not ultimo_id:
+        return atual, False
+    # ids de outro formato (de antes do log no banco) ou à frente do log
+    if not ultimo_id.isdigit() or int(ultimo_id) > atual:
+        return atual, True
+    seq = int(ultimo_id)
+    # eventos já podados do log: o cliente precisa recarregar o estado
+    if mais_antigo is not None and seq < mais_antigo - 1:
+        return atual, True
+    return seq, False
+
+
+def filtro(veiculo_id=None, cliente_id=None):
+    def interessa(dados):
+        return ((veiculo_id is None or dados["veiculo_id"] == veiculo_id)
+                and (cliente_id is None or dados["cliente_id"] == cliente_id))
+    return interessa
+
+
+def formatar(seq, nome, dados):
+    return f"id: {seq}\nevent: {nome}\ndata: ".encode() + serializacao.codificar(dados) + b"\n"
+
+
+INICIO = b"retry: 3000\n\n"
+PING = b": ping\n\n"
+
+
+def _partes(seq, linhas, interessa):
+    """(partes SSE, nova seq) das linhas lidas depois de seq."""
+    partes = []
+    # a poda passou à frente do assinante: parte do histórico se perdeu
+    if linhas and linhas[0][0] > seq + 1:
+        partes.append(formatar(linhas[-1][0], "reset", {}))
+        return partes, linhas[-1][0]
+    for seq, dados in linhas:
+        if interessa(dados):
+            partes.append(formatar(seq, "ordem", dados))
+    return partes, seq
+
+
+def transmitir(engine, ultimo_id, interessa):
+    """Eventos SSE para o modo WSGI, a partir do Last-Event-ID.
+
+    Cada consulta usa uma conexão nova: entre elas o assinante não segura
+    conexão nem transação (que no WAL congelaria a leitura num instantâneo).
+    """
+    with engine.connect() as conexao:
+        seq, reiniciar = retomar(ultimo_id, *conexao.execute(limites()).one())
+    yield INICIO
+    if reiniciar:
+        yield formatar(seq, "reset", {})
+    ultimo_envio = time.monotonic()
+    while True:
+        geracao = avisos.geracao
+        with engine.connect() as conexao:
+            linhas = conexao.execute(desde(seq)).all()
+        partes, seq = _partes(seq, linhas, interessa)
+        if partes:
+            yield b"".join(partes)
+            ultimo_envio = time.monotonic()
+        if len(linhas) == LOTE_LEITURA:
+            continue
+        avisos.aguardar_thread(geracao, INTERVALO_CONSULTA)
+        if time.monotonic() - ultimo_envio >= INTERVALO_PING:
+            yield PING
+            ultimo_envio = time.monotonic()
+
+
+async def transmitir_assincrono(engine, ultimo_id, interessa):
+    """O mesmo de transmitir(), para o modo ASGI, sobre uma engine assíncrona."""
+    async with engine.connect() as conexao:
+        seq, reiniciar = retomar(ultimo_id, *(await conexao.execute(limites())).one())
+    yield INICIO
+    if reiniciar:
+        yield formatar(seq, "reset", {})
+    ultimo_envio = time.monotonic()
+    while True:
+        geracao = avisos.geracao
+        async with engine.connect() as conexao:
+            linhas = (await conexao.execute(desde(seq))).all()
+        partes, seq = _partes(seq, linhas, interessa)
+        if partes:
+            yield b"".join(partes)
+            ultimo_envio = time.monotonic()
+        if len(linhas) == LOTE_LEITURA:
+            continue
+        await avisos.aguardar(geracao, INTERVALO_CONSULTA)
+        if time.monotonic() - ultimo_envio >= INTERVALO_PING:
+            yield PING
+            ultimo_envio = time.monotonic()
@@ -0,0 +1,164 @@
+import argparse
+import csv
+import io
+import sys
+import zlib
+
+from sqlalchemy import select, func
+
+import banco
+from banco import PRAGMAS_SQLITE
+from models import OrdemServico, Veiculo, Cliente
+from serializacao import DATAS_NO_SQL, codificar, float_simples
+
+TAMANHO_LOTE = 2000
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# ordens sem veículo ou cliente (removidos depois) continuam no histórico
+def _campos(ordem):
+    return (
+        ("id_servico", ordem.id_servico),
+        ("data_abertura", ordem.data_abertura),
+        ("data_fechamento", ordem.data_fechamento),
+        ("status", ordem.status),
+        ("status_codigo", ordem.status_codigo),
+        ("descricao_servico", ordem.descricao_servico),
+        ("valor_estimado", ordem.valor_estimado),
+        ("veiculo_id", ordem.veiculo_id),
+        ("placa", Veiculo.placa),
+        ("marca", Veiculo.marca),
+        ("modelo", Veiculo.modelo),
+        ("ano_fabricacao", Veiculo.ano_fabricacao),
+        ("cliente_id", Veiculo.cliente_id),
+        ("cliente_nome", Cliente.nome),
+        ("cliente_cpf", Cliente.cpf),
+        ("cliente_email", Cliente.email),
+        ("cliente_telefone", Cliente.telefone),
+    )
+
+
+NOMES = tuple(nome for nome, _ in _campos(OrdemServico))
+_DATAS = ("data_abertura", "data_fechamento")
+_VALOR = NOMES.index("valor_estimado")
+
+
+def consulta(filtros=(), por_data=False, ordem=OrdemServico):
+    # ordem: OrdemServico ou arquivo.ordens(True), com as arquivadas
+    colunas = []
+    for nome, coluna in _campos(ordem):
+        if nome in _DATAS and DATAS_NO_SQL:
+            coluna = func.strftime("%Y-%m-%dT%H:%M:%S", coluna)
+        colunas.append(coluna.label(nome))
+    stmt = (
+        select(*colunas)
+        .select_from(ordem)
+        .outerjoin(Veiculo, Veiculo.id_veiculo == ordem.veiculo_id)
+        .outerjoin(Cliente, Cliente.id_cliente == Veiculo.cliente_id)
+        .where(*filtros)
+    )
+    # a ordem segue um índice sempre que possível, para o SQLite não precisar ordenar
+    if por_data:
+        return stmt.order_by(ordem.data_abertura, ordem.id_servico)
+    return stmt.order_by(ordem.id_servico)
+
+
+def _datas_iso(linhas):
+    if DATAS_NO_SQL:
+        return linhas
+    indices = [NOMES.index(nome) for nome in _DATAS]
+    return [
+        [v.isoformat(timespec="seconds") if i in indices and v is not None else v for i, v in enumerate(linha)]
+        for linha in linhas
+    ]
+
+
+def _csv(lotes):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(NOMES)
+    for linhas in lotes:
+        escritor.writerows(_datas_iso(linhas))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(lotes):
+    for linhas in lotes:
+        yield b"".join(
+            codificar(dict(zip(NOMES, linha)), float_simples(linha[_VALOR]))
+            for linha in _datas_iso(linhas)
+        )
+
+
+def _gzip(blocos):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+def exportar(formato, filtros=(), por_data=False, gzip=False, ordem=OrdemServico):
+    """Gera os blocos (bytes) da exportação; a memória usada não cresce com o volume."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato deve ser um de: {', '.join(FORMATOS)}.")
+    stmt = consulta(filtros, por_data, ordem)
+
+    def lotes():
+        with banco.read_engine.connect() as conexao:
+            sqlite = conexao.dialect.name == "sqlite"
+            if sqlite:
+                # ordenações sem índice (ex.: filtro por status) vão para disco
+                conexao.exec_driver_sql("PRAGMA temp_store=FILE")
+            try:
+                resultado = conexao.execution_options(stream_results=True, yield_per=TAMANHO_LOTE).execute(stmt)
+                yield from resultado.partitions()
+            finally:
+                if sqlite:
+                    conexao.exec_driver_sql(f"PRAGMA temp_store={PRAGMAS_SQLITE['temp_store']}")
+
+    blocos = _csv(lotes()) if formato == "csv" else _ndjson(lotes())
+    return _gzip(blocos) if gzip else blocos
+
+
+def nome_arquivo(formato, gzip=False):
+    return f"ordens_servico.{FORMATOS[formato][1]}" + (".gz" if gzip else "")
+
+
+if __name__ == "__main__":
+    from Api import filtros_ordem_servico
+    from paginacao import ParametroInvalido
+    import arquivo
+
+    parser = argparse.ArgumentParser(description="Exporta ordens de serviço com veículo e cliente.")
+    parser.add_argument("--formato", choices=tuple(FORMATOS), default="csv")
+    parser.add_argument("--inicio", help="data de abertura inicial (AAAA-MM-DD)")
+    parser.add_argument("--fim", help="data de abertura final, inclusive (AAAA-MM-DD)")
+    parser.add_argument("--status", help="mesmos valores do filtro de /listarOrdemServicos")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--incluir-arquivadas", action="store_true", help="inclui as ordens do arquivo")
+    parser.add_argument("--saida", help="arquivo de destino (padrão: stdout)")
+    args = parser.parse_args()
+
+    banco.iniciar()
+    parametros = {k: v for k, v in vars(args).items() if k in ("inicio", "fim", "status") and v}
+    ordem = arquivo.ordens(args.incluir_arquivadas)
+    try:
+        filtros = filtros_ordem_servico(parametros, ordem)
+    except ParametroInvalido as e:
+        parser.error(str(e))
+
+    destino = open(args.saida, "wb") if args.saida else sys.stdout.buffer
+    try:
+        for bloco in exportar(args.formato, filtros, bool(args.inicio or args.fim), args.gzip, ordem):
+            destino.write(bloco)
+    finally:
+        if args.saida:
+            destino.close()
@@ -0,0 +1,178 @@
+import copy
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as TempoEsgotado
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm.attributes import set_committed_value
+
+from banco import DATABASE_URL, configurar_sqlite, db_session, _em_memoria
+
+# commit em grupo: desligado por padrão; com GRUPO_COMMIT=1 os save()/delete()
+# dos modelos passam pelo escritor único deste módulo
+ATIVO = os.environ.get("GRUPO_COMMIT", "0") == "1" and DATABASE_URL.startswith("sqlite") \
+    and not _em_memoria(DATABASE_URL)
+JANELA = float(os.environ.get("GRUPO_COMMIT_JANELA_MS", 2)) / 1000
+MAXIMO_GRUPO = int(os.environ.get("GRUPO_COMMIT_MAXIMO", 256))
+TEMPO_LIMITE = float(os.environ.get("GRUPO_COMMIT_TEMPO_LIMITE", 30))
+
+
+def _criar_engine():
+    # conexão só do escritor: synchronous=FULL (o commit confirmado está no
+    # disco) e BEGIN IMMEDIATE explícito, para que os SAVEPOINTs de cada
+    # chamador fiquem dentro da transação do grupo
+    engine = create_engine(DATABASE_URL, pool_size=1, max_overflow=0)
+    configurar_sqlite(engine)
+
+    @event.listens_for(engine, "connect")
+    def _conexao_do_escritor(conexao_dbapi, _registro):
+        conexao_dbapi.isolation_level = None
+        conexao_dbapi.execute("PRAGMA synchronous=FULL")
+
+    @event.listens_for(engine, "begin")
+    def _begin(conexao):
+        conexao.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
+
+
+class _Pedido:
+    __slots__ = ("unidade", "futuro")
+
+    def __init__(self, unidade):
+        self.unidade = unidade
+        self.futuro = Future()
+
+
+class Escritor:
+    """Thread única que grava as unidades recebidas em grupos, com um commit por grupo.
+
+    Cada unidade roda num SAVEPOINT próprio: a falha de uma não afeta as outras
+    do grupo. O chamador só recebe o resultado depois do commit do grupo.
+    """
+
+    def __init__(self, janela, maximo):
+        self.janela = janela
+        self.maximo = maximo
+        self.grupos = 0
+        self.unidades = 0
+        self._fila = queue.SimpleQueue()
+        self._engine = _criar_engine()
+        self._sessao = db_session.session_factory.class_(bind=self._engine, expire_on_commit=False)
+        self._thread = threading.Thread(target=self._executar, name="grupo-commit", daemon=True)
+        self._thread.start()
+
+    def enviar(self, unidade):
+        pedido = _Pedido(unidade)
+        self._fila.put(pedido)
+        try:
+            return pedido.futuro.result(TEMPO_LIMITE)
+        except TempoEsgotado:
+            # só desiste se a unidade ainda está na fila (o escritor a pula);
+            # já começada, ela pode ser gravada: espera o commit ou a falha
+            if pedido.futuro.cancel():
+                raise
+            return pedido.futuro.result()
+
+    def _coletar(self):
+        pedidos = [self._fila.get()]
+        prazo = time.monotonic() + self.janela
+        while len(pedidos) < self.maximo:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                pedidos.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return pedidos
+
+    def _executar(self):
+        while True:
+            self._gravar(self._coletar())
+
+    def _gravar(self, pedidos):
+        sessao = self._sessao
+        iniciados = []
+        resultados = []
+        try:
+            for pedido in pedidos:
+                # o chamador desistiu (tempo esgotado) antes de a unidade começar: fica de fora
+                if not pedido.futuro.set_running_or_notify_cancel():
+                    continue
+                iniciados.append(pedido)
+                # o que os ganchos anotaram até aqui (tabelas, eventos) não
+                # pode se perder se esta unidade for desfeita
+                anotacoes = {chave: copy.copy(valor) for chave, valor in sessao.info.items()}
+                ponto = sessao.begin_nested()
+                try:
+                    resultado = pedido.unidade(sessao)
+                    sessao.flush()
+                    ponto.commit()
+                    resultados.append((pedido, resultado, None))
+                except Exception as e:
+                    ponto.rollback()
+                    sessao.info.clear()
+                    sessao.info.update(anotacoes)
+                    resultados.append((pedido, None, e))
+            sessao.commit()
+        except Exception as e:
+            sessao.rollback()
+            resultados = [(pedido, None, e) for pedido in iniciados]
+        finally:
+            sessao.expunge_all()
+
+        self.grupos += 1
+        self.unidades += len(iniciados)
+        for pedido, resultado, erro in resultados:
+            if erro is None:
+                pedido.futuro.set_result(resultado)
+            else:
+                pedido.futuro.set_exception(erro)
+
+
+_escritor = None
+_pid = None
+_lock = threading.Lock()
+
+
+def escritor():
+    global _escritor, _pid
+    with _lock:
+        # a thread do escritor não sobrevive a um fork: cada worker tem a sua
+        if _escritor is None or _pid != os.getpid():
+            _escritor = Escritor(JANELA, MAXIMO_GRUPO)
+            _pid = os.getpid()
+        return _escritor
+
+
+def _em_grupo():
+    # o /batch já junta as operações numa transação própria
+    return ATIVO and not db_session().info.get("transacao_propria")
+
+
+def _copiar_estado(origem, destino):
+    # ids gerados e colunas gravadas voltam para o objeto do chamador, sem
+    # marcá-lo como alterado na sessão da requisição
+    for atributo in inspect(origem).mapper.column_attrs:
+        set_committed_value(destino, atributo.key, getattr(origem, atributo.key))
+
+
+def salvar(objeto):
+    if not _em_grupo():
+        db_session.add(objeto)
+        db_session.commit()
+        return
+    _copiar_estado(escritor().enviar(lambda sessao: sessao.merge(objeto)), objeto)
+
+
+def remover(objeto):
+    if not _em_grupo():
+        db_session.delete(objeto)
+        db_session.commit()
+        return
+    escritor().enviar(lambda sessao: sessao.delete(sessao.merge(objeto)))
+    if inspect(objeto).persistent:
+        db_session.expunge(objeto)
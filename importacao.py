@@ -0,0 +1,208 @@
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import select, insert
+
+from models import db_session, Cliente, Veiculo, OrdemServico, BRASILIA, StatusOrdem, codigo_status
+from relatorios import registrar_insercoes
+from busca import indexar_clientes, indexar_veiculos
+
+TAMANHO_BLOCO = 1000
+TAMANHO_CONSULTA = 500
+LIMITE_LINHAS = 100000
+
+
+class LoteInvalido(ValueError):
+    pass
+
+
+class LinhaInvalida(ValueError):
+    pass
+
+
+def ler_lote():
+    corpo = request.get_data(as_text=True)
+    if not corpo.strip():
+        raise LoteInvalido("Corpo da requisição vazio.")
+
+    if "ndjson" in (request.content_type or "") or not corpo.lstrip().startswith("["):
+        linhas = []
+        for texto in corpo.splitlines():
+            if not texto.strip():
+                continue
+            try:
+                linhas.append(json.loads(texto))
+            except ValueError:
+                linhas.append(None)
+    else:
+        try:
+            linhas = json.loads(corpo)
+        except ValueError:
+            raise LoteInvalido("JSON inválido.")
+        if not isinstance(linhas, list):
+            raise LoteInvalido("Esperado um array JSON ou NDJSON.")
+
+    if len(linhas) > LIMITE_LINHAS:
+        raise LoteInvalido(f"Lote excede o limite de {LIMITE_LINHAS} linhas.")
+    return linhas
+
+
+def _texto(dados, campo):
+    valor = dados.get(campo)
+    if valor is None or not str(valor).strip():
+        raise LinhaInvalida(f"Campo '{campo}' é obrigatório e não pode estar vazio.")
+    return str(valor).strip()
+
+
+def _inteiro(dados, campo):
+    valor = _texto(dados, campo)
+    try:
+        return int(valor)
+    except ValueError:
+        raise LinhaInvalida(f"Campo '{campo}' deve ser um número inteiro.")
+
+
+def _existentes(coluna, valores):
+    valores = list(valores)
+    encontrados = set()
+    for i in range(0, len(valores), TAMANHO_CONSULTA):
+        bloco = valores[i:i + TAMANHO_CONSULTA]
+        encontrados.update(db_session.execute(select(coluna).where(coluna.in_(bloco))).scalars())
+    return encontrados
+
+
+def _validar(linhas, montar):
+    resultados = [None] * len(linhas)
+    validas = []
+    for i, dados in enumerate(linhas):
+        try:
+            if not isinstance(dados, dict):
+                raise LinhaInvalida("Linha não é um objeto JSON.")
+            validas.append((i, montar(dados)))
+        except LinhaInvalida as e:
+            resultados[i] = {"linha": i, "status": "erro", "mensagem": str(e)}
+    return resultados, validas
+
+
+def _recusar_duplicados(resultados, validas, campos):
+    # campos: lista de (chave, conjunto já existente no banco, mensagem)
+    vistos = {chave: set() for chave, _, _ in campos}
+    restantes = []
+    for i, linha in validas:
+        for chave, existentes, mensagem in campos:
+            valor = linha[chave]
+            if valor in existentes or valor in vistos[chave]:
+                resultados[i] = {"linha": i, "status": "erro", "mensagem": mensagem}
+                break
+        else:
+            for chave, _, _ in campos:
+                vistos[chave].add(linha[chave])
+            restantes.append((i, linha))
+    return restantes
+
+
+def _inserir(modelo, chave, resultados, validas, apos_inserir=None):
+    stmt = insert(modelo).returning(chave, sort_by_parameter_order=True)
+    for inicio in range(0, len(validas), TAMANHO_BLOCO):
+        bloco = validas[inicio:inicio + TAMANHO_BLOCO]
+        try:
+            linhas = [linha for _, linha in bloco]
+            ids = db_session.execute(stmt, linhas).scalars().all()
+            if apos_inserir:
+                apos_inserir(db_session, linhas, ids)
+            db_session.commit()
+        except Exception as e:
+            db_session.rollback()
+            print(f"Erro ao importar bloco de {modelo.__tablename__}: {e}")
+            for i, _ in bloco:
+                resultados[i] = {"linha": i, "status": "erro", "mensagem": "Erro ao gravar o bloco"}
+            continue
+        for (i, _), id_criado in zip(bloco, ids):
+            resultados[i] = {"linha": i, "status": "criado", "id": id_criado}
+    return _resumo(resultados)
+
+
+def _resumo(resultados):
+    criados = sum(1 for r in resultados if r["status"] == "criado")
+    return {
+        "criados": criados,
+        "erros": len(resultados) - criados,
+        "resultados": resultados,
+    }
+
+
+def _montar_cliente(dados):
+    return {
+        "nome": _texto(dados, "nome"),
+        "cpf": _texto(dados, "cpf"),
+        "telefone": _texto(dados, "telefone"),
+        "endereco": _texto(dados, "endereco"),
+        "email": _texto(dados, "email"),
+    }
+
+
+def importar_clientes(linhas):
+    resultados, validas = _validar(linhas, _montar_cliente)
+    validas = _recusar_duplicados(resultados, validas, [
+        ("cpf", _existentes(Cliente.cpf, {l["cpf"] for _, l in validas}), "CPF já cadastrado"),
+        ("telefone", _existentes(Cliente.telefone, {l["telefone"] for _, l in validas}), "Telefone já cadastrado"),
+        ("email", _existentes(Cliente.email, {l["email"] for _, l in validas}), "E-mail já cadastrado"),
+    ])
+    return _inserir(Cliente, Cliente.id_cliente, resultados, validas, indexar_clientes)
+
+
+def _montar_veiculo(dados):
+    return {
+        "cliente_id": _inteiro(dados, "cliente_id"),
+        "marca": _texto(dados, "marca"),
+        "modelo": _texto(dados, "modelo"),
+        "placa": _texto(dados, "placa"),
+        "ano_fabricacao": _inteiro(dados, "ano_fabricacao"),
+    }
+
+
+def importar_veiculos(linhas):
+    resultados, validas = _validar(linhas, _montar_veiculo)
+    clientes = _existentes(Cliente.id_cliente, {l["cliente_id"] for _, l in validas})
+    restantes = []
+    for i, linha in validas:
+        if linha["cliente_id"] in clientes:
+            restantes.append((i, linha))
+        else:
+            resultados[i] = {"linha": i, "status": "erro", "mensagem": "Cliente não encontrado"}
+    validas = _recusar_duplicados(resultados, restantes, [
+        ("placa", _existentes(Veiculo.placa, {l["placa"] for _, l in restantes}), "Placa já cadastrada"),
+    ])
+    return _inserir(Veiculo, Veiculo.id_veiculo, resultados, validas, indexar_veiculos)
+
+
+def importar_ordens_servico(linhas):
+    agora_brasilia = datetime.now(BRASILIA).replace(tzinfo=None)
+
+    def montar(dados):
+        status = _texto(dados, "status")
+        codigo = codigo_status(status)
+        try:
+            valor_estimado = float(dados["valor_estimado"])
+        except (KeyError, TypeError, ValueError):
+            raise LinhaInvalida("Campo 'valor_estimado' deve ser numérico.")
+        return {
+            "veiculo_id": _inteiro(dados, "veiculo_id"),
+            "data_abertura": agora_brasilia,
+            "descricao_servico": _texto(dados, "descricao_servico"),
+            "status": status,
+            "status_codigo": int(codigo),
+            "valor_estimado": valor_estimado,
+            "data_fechamento": agora_brasilia if codigo == StatusOrdem.FINALIZADA else None,
+        }
+
+    resultados, validas = _validar(linhas, montar)
+    veiculos = _existentes(Veiculo.id_veiculo, {l["veiculo_id"] for _, l in validas})
+    restantes = []
+    for i, linha in validas:
+        if linha["veiculo_id"] in veiculos:
+            restantes.append((i, linha))
+        else:
+            resultados[i] = {"linha": i, "status": "erro", "mensagem": "Veículo não encontrado"}
+    return _inserir(OrdemServico, OrdemServico.id_servico, resultados, restantes, registrar_insercoes)
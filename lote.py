@@ -0,0 +1,132 @@
+import os
+import re
+
+from flask import current_app, request
+from werkzeug.exceptions import HTTPException
+
+from banco import db_session
+
+MAXIMO_OPERACOES = int(os.environ.get("LOTE_MAXIMO_OPERACOES", 50))
+
+# só rotas de escrita de cadastro; importações, login e o próprio /batch ficam de fora,
+# assim como a exclusão de clientes e veículos: ela vira uma tarefa (tarefas.py)
+# que roda depois do commit, fora da transação do lote
+ENDPOINTS = {
+    "adicionar_cliente", "editar_clientes", "alterar_status_cliente", "ocultar_cliente", "reativar_cliente",
+    "adicionar_veiculo", "editar_veiculos",
+    "adicionar_ordem_servico", "editar_servico", "deletar_servico",
+}
+
+# "$0.id_cliente": campo do corpo da resposta da operação 0
+_REFERENCIA = re.compile(r"\$(\d+)\.(\w+)")
+
+
+class OperacaoInvalida(Exception):
+    pass
+
+
+class _SessaoLote(db_session.session_factory.class_):
+    """Sessão instalada no db_session durante o lote.
+
+    As rotas chamam commit() ao fim de cada operação; aqui isso só faz o flush
+    (os ids já ficam disponíveis para as operações seguintes) e o commit de
+    verdade acontece uma vez, em confirmar(), depois da última operação.
+    """
+
+    def commit(self):
+        self.flush()
+
+    def confirmar(self):
+        super().commit()
+
+
+def _resolver(valor, resultados):
+    if isinstance(valor, dict):
+        return {chave: _resolver(v, resultados) for chave, v in valor.items()}
+    if isinstance(valor, list):
+        return [_resolver(v, resultados) for v in valor]
+    if not isinstance(valor, str) or "$" not in valor:
+        return valor
+
+    def buscar(match):
+        indice, campo = int(match.group(1)), match.group(2)
+        if indice >= len(resultados):
+            raise OperacaoInvalida(f"Referência '{match.group()}' aponta para uma operação posterior.")
+        corpo = resultados[indice]["corpo"]
+        if not isinstance(corpo, dict) or campo not in corpo:
+            raise OperacaoInvalida(f"Referência '{match.group()}': a operação {indice} não devolveu '{campo}'.")
+        return corpo[campo]
+
+    inteira = _REFERENCIA.fullmatch(valor)
+    if inteira:
+        # o valor todo é uma referência: mantém o tipo (ids continuam inteiros)
+        return buscar(inteira)
+    return _REFERENCIA.sub(lambda m: str(buscar(m)), valor)
+
+
+def _operacoes(dados):
+    operacoes = dados.get("operacoes") if isinstance(dados, dict) else None
+    if not isinstance(operacoes, list) or not operacoes:
+        raise OperacaoInvalida("Envie 'operacoes' como uma lista não vazia.")
+    if len(operacoes) > MAXIMO_OPERACOES:
+        raise OperacaoInvalida(f"No máximo {MAXIMO_OPERACOES} operações por lote.")
+    for i, operacao in enumerate(operacoes):
+        if not isinstance(operacao, dict) or not isinstance(operacao.get("rota"), str):
+            raise OperacaoInvalida(f"Operação {i}: informe 'rota'.")
+    return operacoes
+
+
+def _executar(adaptador, operacao, resultados, cabecalhos):
+    metodo = str(operacao.get("metodo", "POST")).upper()
+    rota = _resolver(operacao["rota"], resultados)
+    corpo = _resolver(operacao.get("corpo"), resultados)
+    try:
+        endpoint, argumentos = adaptador.match(rota, method=metodo)
+    except HTTPException as e:
+        raise OperacaoInvalida(f"{metodo} {rota}: rota inexistente ({e.code}).")
+    if endpoint.rpartition(".")[2] not in ENDPOINTS:
+        raise OperacaoInvalida(f"{metodo} {rota}: rota não permitida em lote.")
+
+    app = current_app._get_current_object()
+    with app.test_request_context(rota, method=metodo, json=corpo, headers=cabecalhos):
+        resposta = app.make_response(app.view_functions[endpoint](**argumentos))
+    return {"metodo": metodo, "rota": rota, "status": resposta.status_code,
+            "corpo": resposta.get_json(silent=True)}
+
+
+def executar(dados):
+    """Executa as operações em ordem numa única transação: (status, corpo da resposta).
+
+    Qualquer operação com status fora de 2xx desfaz o lote inteiro.
+    """
+    operacoes = _operacoes(dados)
+    adaptador = current_app.url_map.bind_to_environ(request.environ)
+    cabecalhos = {nome: valor for nome, valor in request.headers.items() if nome.lower() == "authorization"}
+
+    db_session.remove()
+    sessao = _SessaoLote(**db_session.session_factory.kw)
+    # save()/delete() dos modelos gravam nesta sessão, nunca no commit em grupo
+    sessao.info["transacao_propria"] = True
+    db_session.registry.set(sessao)
+    resultados = []
+    try:
+        for i, operacao in enumerate(operacoes):
+            try:
+                resultado = _executar(adaptador, operacao, resultados, cabecalhos)
+            except OperacaoInvalida as e:
+                raise OperacaoInvalida(f"Operação {i}: {e}")
+            resultados.append(resultado)
+            if not 200 <= resultado["status"] < 300:
+                sessao.rollback()
+                return resultado["status"], {
+                    "mensagem": f"Operação {i} falhou; nenhuma operação do lote foi gravada.",
+                    "falhou": i,
+                    "resultados": resultados,
+                }
+        sessao.confirmar()
+        return 200, {"resultados": resultados}
+    except BaseException:
+        sessao.rollback()
+        raise
+    finally:
+        db_session.remove()
@@ -0,0 +1,224 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from functools import wraps
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import Base
+
+ATIVO = os.environ.get("METRICAS", "1") != "0"
+# quantas execuções do mesmo SQL numa requisição caracterizam um N+1
+LIMIAR_N_MAIS_UM = int(os.environ.get("METRICAS_LIMIAR_N1", 10))
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+
+# coletor da requisição em andamento; None fora de requisições (scripts, jobs)
+_atual = ContextVar("metricas_requisicao", default=None)
+
+
+class Histograma:
+    __slots__ = ("limites", "contagens", "soma")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, contagem in zip(self.limites + ("+Inf",), self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}'
+        yield f"{nome}_sum{{{rotulos}}} {self.soma:.6f}"
+        yield f"{nome}_count{{{rotulos}}} {acumulado}"
+
+
+class Requisicao:
+    __slots__ = ("consultas", "segundos_sql", "linhas", "instrucoes")
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_sql = 0.0
+        self.linhas = 0
+        self.instrucoes = Counter()
+
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(lambda: Histograma(BUCKETS_SEGUNDOS))
+        self.consultas = defaultdict(lambda: Histograma(BUCKETS_CONSULTAS))
+        self.segundos_sql = defaultdict(float)
+        self.linhas = defaultdict(int)
+        self.n_mais_um = defaultdict(int)
+
+    def registrar(self, rota, metodo, status, duracao, coletor):
+        suspeita = None
+        if coletor.instrucoes:
+            instrucao, repeticoes = coletor.instrucoes.most_common(1)[0]
+            if repeticoes >= LIMIAR_N_MAIS_UM:
+                suspeita = instrucao, repeticoes
+        with self._lock:
+            self.latencias[(rota, metodo, str(status))].observar(duracao)
+            self.consultas[rota].observar(coletor.consultas)
+            self.segundos_sql[rota] += coletor.segundos_sql
+            self.linhas[rota] += coletor.linhas
+            if suspeita:
+                self.n_mais_um[rota] += 1
+        if suspeita:
+            instrucao, repeticoes = suspeita
+            print(f"Possível N+1 em {metodo} {rota}: {repeticoes}x {' '.join(instrucao.split())[:200]}",
+                  file=sys.stderr)
+
+    def exportar(self):
+        with self._lock:
+            latencias = {k: _copia(h) for k, h in self.latencias.items()}
+            consultas = {k: _copia(h) for k, h in self.consultas.items()}
+            segundos_sql = dict(self.segundos_sql)
+            linhas = dict(self.linhas)
+            n_mais_um = dict(self.n_mais_um)
+
+        saida = [
+            "# HELP http_requisicao_segundos Latência das requisições por rota, método e status.",
+            "# TYPE http_requisicao_segundos histogram",
+        ]
+        for (rota, metodo, status), histograma in sorted(latencias.items()):
+            saida.extend(histograma.linhas(
+                "http_requisicao_segundos", f'rota="{_escapar(rota)}",metodo="{metodo}",status="{status}"'))
+
+        saida += [
+            "# HELP sql_consultas_por_requisicao Instruções SQL executadas por requisição.",
+            "# TYPE sql_consultas_por_requisicao histogram",
+        ]
+        for rota, histograma in sorted(consultas.items()):
+            saida.extend(histograma.linhas("sql_consultas_por_requisicao", f'rota="{_escapar(rota)}"'))
+
+        for nome, ajuda, valores in (
+            ("sql_segundos_total", "Tempo gasto no banco.", segundos_sql),
+            ("orm_linhas_hidratadas_total", "Objetos do ORM carregados do banco.", linhas),
+            ("sql_n_mais_um_total", f"Requisições que repetiram o mesmo SQL {LIMIAR_N_MAIS_UM} vezes ou mais.",
+             n_mais_um),
+        ):
+            saida += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} counter"]
+            for rota, valor in sorted(valores.items()):
+                saida.append(f'{nome}{{rota="{_escapar(rota)}"}} {valor:.6f}'
+                             if isinstance(valor, float) else f'{nome}{{rota="{_escapar(rota)}"}} {valor}')
+        return "\n".join(saida) + "\n"
+
+
+def _copia(histograma):
+    copia = Histograma(histograma.limites)
+    copia.contagens = list(histograma.contagens)
+    copia.soma = histograma.soma
+    return copia
+
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registro = Registro()
+
+
+def iniciar():
+    return _atual.set(Requisicao())
+
+
+def finalizar(token, rota, metodo, status, duracao):
+    coletor = _atual.get()
+    try:
+        _atual.reset(token)
+    except ValueError:
+        # token de outro contexto (ex.: servidor que troca de contexto entre ganchos)
+        _atual.set(None)
+    if coletor is not None:
+        registro.registrar(rota, metodo, status, duracao, coletor)
+
+
+def exportar():
+    return registro.exportar()
+
+
+# ---- ganchos do SQLAlchemy: valem para todas as engines, inclusive as assíncronas
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _inicio_sql(conexao, _cursor, _instrucao, _parametros, _contexto, _executemany):
+    if _atual.get() is not None:
+        conexao.info["metricas_inicio"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _fim_sql(conexao, _cursor, instrucao, _parametros, _contexto, _executemany):
+    coletor = _atual.get()
+    if coletor is None:
+        return
+    inicio = conexao.info.pop("metricas_inicio", None)
+    coletor.consultas += 1
+    if inicio is not None:
+        coletor.segundos_sql += time.perf_counter() - inicio
+    coletor.instrucoes[instrucao] += 1
+
+
+@event.listens_for(Base, "load", propagate=True)
+def _objeto_carregado(_objeto, _contexto):
+    coletor = _atual.get()
+    if coletor is not None:
+        coletor.linhas += 1
+
+
+# ---- integração com o Flask
+
+def instrumentar(app):
+    if not ATIVO:
+        return
+
+    from flask import request
+
+    def _finalizar(status):
+        # no environ, e não no g: os contextos aninhados do /batch dividem o g e têm teardown próprio
+        inicio, token = request.environ.pop("metricas.inicio", (None, None))
+        if token is not None:
+            rota = request.url_rule.rule if request.url_rule else "desconhecida"
+            finalizar(token, rota, request.method, status, time.perf_counter() - inicio)
+
+    @app.before_request
+    def _antes():
+        request.environ["metricas.inicio"] = (time.perf_counter(), iniciar())
+
+    @app.after_request
+    def _depois(resposta):
+        _finalizar(resposta.status_code)
+        return resposta
+
+    @app.teardown_request
+    def _depois_de_erro(_excecao=None):
+        # a view levantou e o after_request não rodou: conta como 500 e libera o ContextVar
+        _finalizar(500)
+
+
+# ---- integração com as rotas assíncronas (asgi.py)
+
+def medir_assincrono(rota, endpoint):
+    @wraps(endpoint)
+    async def medido(request):
+        inicio, token = time.perf_counter(), iniciar()
+        status = 500
+        try:
+            resposta = await endpoint(request)
+            status = resposta.status_code
+            return resposta
+        finally:
+            finalizar(token, rota, request.method, status, time.perf_counter() - inicio)
+    return medido
@@ -0,0 +1,204 @@
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import text, select, or_
+
+def _adicionar_coluna(tabela, coluna, definicao, *depois):
+    def passo(conexao):
+        colunas = {linha[1] for linha in conexao.execute(text(f"PRAGMA table_info({tabela})"))}
+        if coluna not in colunas:
+            conexao.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}"))
+            for sql in depois:
+                conexao.execute(text(sql))
+    return passo
+
+
+def _reconstruir_resumos(conexao):
+    from relatorios import reconstruir
+    # os resumos agrupam por status_codigo: num banco que ainda não chegou à
+    # versão 5, o preenchimento da versão 3 fica para a 7
+    colunas = {linha[1] for linha in conexao.execute(text("PRAGMA table_info(ordem_servico)"))}
+    if "status_codigo" in colunas:
+        reconstruir(conexao)
+
+
+def _recriar_resumos(conexao):
+    # a chave dos resumos passou de status (texto) a status_codigo: as tabelas
+    # são recriadas pelo modelo e preenchidas de novo
+    from models import ResumoDiario, ResumoVeiculo
+    for modelo in (ResumoDiario, ResumoVeiculo):
+        modelo.__table__.drop(conexao, checkfirst=True)
+        modelo.__table__.create(conexao)
+    _reconstruir_resumos(conexao)
+
+
+def _reconstruir_busca(conexao):
+    from busca import reconstruir
+    reconstruir(conexao)
+
+
+def _preencher_status_codigo(conexao):
+    # um UPDATE por texto distinto (poucos), cada um pelo índice de status
+    from models import codigo_status
+    for (status,) in conexao.execute(text("SELECT DISTINCT status FROM ordem_servico")).all():
+        conexao.execute(
+            text("UPDATE ordem_servico SET status_codigo = :codigo WHERE status IS :status"),
+            {"codigo": int(codigo_status(status)), "status": status},
+        )
+
+
+def _ordens_autoincrement(conexao):
+    # o SQLite não muda uma tabela para AUTOINCREMENT: ela é recriada pelo
+    # modelo e as linhas copiadas; a sequência parte do maior id já usado,
+    # inclusive os do arquivo
+    from models import OrdemServico
+    import arquivo
+
+    if conexao.dialect.name != "sqlite":
+        return
+    ddl = conexao.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'ordem_servico'")).scalar()
+    if "AUTOINCREMENT" not in ddl.upper():
+        conexao.execute(text("ALTER TABLE ordem_servico RENAME TO ordem_servico_antiga"))
+        for (indice,) in conexao.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ordem_servico_antiga' AND sql IS NOT NULL"
+        )).all():
+            conexao.execute(text(f"DROP INDEX {indice}"))
+        OrdemServico.__table__.create(conexao)
+        colunas = ", ".join(OrdemServico.__table__.c.keys())
+        conexao.execute(text(f"INSERT INTO ordem_servico ({colunas}) SELECT {colunas} FROM ordem_servico_antiga"))
+        conexao.execute(text("DROP TABLE ordem_servico_antiga"))
+    arquivo.reservar_ids(conexao)
+
+
+# (versão, descrição, passos). Um passo é SQL ou uma função que recebe a conexão.
+# Migrações já publicadas não mudam: alterações de schema entram como versão nova.
+MIGRACOES = [
+    (1, "colunas de clientes ausentes em bancos antigos", [
+        _adicionar_coluna("clientes", "email", "VARCHAR(100)",
+                          "CREATE UNIQUE INDEX IF NOT EXISTS ix_clientes_email ON clientes (email)"),
+        _adicionar_coluna("clientes", "ativo", "BOOLEAN DEFAULT 1"),
+    ]),
+    (2, "índices das colunas de consulta frequente", [
+        "CREATE INDEX IF NOT EXISTS ix_veiculos_cliente_id ON veiculos (cliente_id)",
+        "CREATE INDEX IF NOT EXISTS ix_ordem_servico_veiculo_id ON ordem_servico (veiculo_id)",
+        "CREATE INDEX IF NOT EXISTS ix_ordem_servico_status ON ordem_servico (status)",
+        "CREATE INDEX IF NOT EXISTS ix_ordem_servico_data_abertura ON ordem_servico (data_abertura)",
+        "CREATE INDEX IF NOT EXISTS ix_clientes_telefone ON clientes (telefone)",
+    ]),
+    # as tabelas resumo_* são criadas pelo create_all; aqui só o preenchimento inicial
+    (3, "preenchimento dos resumos diário e por veículo", [
+        _reconstruir_resumos,
+    ]),
+    (4, "índice FTS5 (trigramas) de busca de clientes e veículos", [
+        _reconstruir_busca,
+    ]),
+    (5, "código canônico do status das ordens de serviço", [
+        _adicionar_coluna("ordem_servico", "status_codigo", "INTEGER"),
+        "CREATE INDEX IF NOT EXISTS ix_ordem_servico_status_codigo ON ordem_servico (status_codigo)",
+        _preencher_status_codigo,
+    ]),
+    (6, "ordens de serviço com AUTOINCREMENT (ids do arquivo não se repetem)", [
+        _ordens_autoincrement,
+    ]),
+    (7, "resumos agrupados pelo código canônico do status", [
+        _recriar_resumos,
+    ]),
+]
+
+
+def versao_atual(conexao):
+    conexao.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_versao ("
+        "versao INTEGER PRIMARY KEY, descricao VARCHAR(200) NOT NULL, aplicada_em DATETIME NOT NULL)"
+    ))
+    return conexao.execute(text("SELECT MAX(versao) FROM schema_versao")).scalar() or 0
+
+
+def migrar(engine):
+    with engine.begin() as conexao:
+        atual = versao_atual(conexao)
+
+    aplicadas = []
+    for versao, descricao, passos in MIGRACOES:
+        if versao <= atual:
+            continue
+        with engine.begin() as conexao:
+            # a versão é registrada antes dos passos: ela pega o lock de escrita,
+            # e um worker que sobe junto (uvicorn --workers) espera e pula a migração
+            if not conexao.execute(
+                text("INSERT OR IGNORE INTO schema_versao (versao, descricao, aplicada_em) VALUES (:v, :d, :t)"),
+                {"v": versao, "d": descricao, "t": datetime.utcnow()},
+            ).rowcount:
+                continue
+            for passo in passos:
+                if callable(passo):
+                    passo(conexao)
+                else:
+                    conexao.execute(text(passo))
+        print(f"Migração {versao} aplicada: {descricao}", file=sys.stderr)
+        aplicadas.append(versao)
+    return aplicadas
+
+
+def consultas_criticas():
+    from models import Cliente, Veiculo, OrdemServico, STATUS_EM_ABERTO
+    import arquivo
+
+    arquivadas = arquivo.ordens(True)
+    return {
+        "dados_cliente/veiculo_cliente": select(Veiculo).where(Veiculo.cliente_id == 1),
+        "ordens_por_veiculo": select(OrdemServico).where(OrdemServico.veiculo_id == 1),
+        "servicos_do_cliente": select(OrdemServico).join(Veiculo).where(Veiculo.cliente_id == 1),
+        "ordens_por_status": select(OrdemServico).where(OrdemServico.status == "aberto"),
+        "ordens_em_aberto": select(OrdemServico)
+        .where(OrdemServico.status_codigo.in_([int(c) for c in STATUS_EM_ABERTO]), OrdemServico.id_servico > 0)
+        .order_by(OrdemServico.id_servico).limit(100),
+        "ordens_por_periodo": select(OrdemServico).where(
+            OrdemServico.data_abertura >= datetime(2024, 1, 1),
+            OrdemServico.data_abertura < datetime(2024, 2, 1),
+        ),
+        # com include_archived o filtro tem de chegar aos dois lados do UNION ALL
+        "ordens_por_veiculo (arquivadas)": select(arquivadas).where(arquivadas.veiculo_id == 1)
+        .order_by(arquivadas.id_servico),
+        "servicos_do_cliente (arquivadas)": select(arquivadas).where(
+            arquivadas.veiculo_id.in_(select(Veiculo.id_veiculo).where(Veiculo.cliente_id == 1))
+        ).order_by(arquivadas.veiculo_id, arquivadas.id_servico),
+        "unicidade_cliente": select(Cliente.cpf, Cliente.telefone, Cliente.email).where(
+            or_(Cliente.cpf == "0", Cliente.telefone == "0", Cliente.email == "0")
+        ),
+    }
+
+
+def plano_com_varredura(conexao, stmt):
+    # o plano de stmt se alguma tabela é varrida inteira; None se só usa índices
+    sql = str(stmt.compile(dialect=conexao.dialect, compile_kwargs={"literal_binds": True}))
+    plano = [linha[-1] for linha in conexao.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    if any(re.match(r"SCAN [\w.]+$", linha) for linha in plano):
+        return plano
+    return None
+
+
+def verificar_planos(engine):
+    # devolve {rota: [linhas do plano]} das consultas que caem em varredura completa
+    falhas = {}
+    with engine.connect() as conexao:
+        for nome, stmt in consultas_criticas().items():
+            plano = plano_com_varredura(conexao, stmt)
+            if plano is not None:
+                falhas[nome] = plano
+    return falhas
+
+
+if __name__ == "__main__":
+    import banco
+    from models import init_db
+
+    init_db()
+    if "--verificar" in sys.argv:
+        falhas = verificar_planos(banco.engine)
+        for nome, plano in falhas.items():
+            print(f"{nome}: varredura completa -> {plano}")
+        if falhas:
+            sys.exit(1)
+        print("Todos os planos usam índice.")
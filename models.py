@@ -1,15 +1,56 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Float, DateTime, Enum, func, Boolean
-from sqlalchemy.orm import relationship, sessionmaker, scoped_session
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Date, DateTime, Enum, func, Boolean, JSON
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.ext.declarative import declarative_base
-from werkzeug.security import generate_password_hash, check_password_hash
+from senhas import gerar_hash, verificar_senha
 from datetime import datetime
+import enum
+import unicodedata
+from pytz import timezone
+import banco
+from banco import db_session, read_session
+import gravacao
+from migracoes import migrar
 ##
-engine = create_engine('sqlite:///mecanica.db')
-db_session = scoped_session(sessionmaker(bind=engine))
 
 Base = declarative_base()
 Base.query = db_session.query_property()
 
+BRASILIA = timezone('America/Sao_Paulo')
+STATUS_FINALIZADOS = ("concluído", "finalizado", "terminado")
+FORMATO_DATA = "%d-%m-%Y %H:%M"
+
+
+class StatusOrdem(enum.IntEnum):
+    ABERTA = 1
+    EM_ANDAMENTO = 2
+    AGUARDANDO_PECAS = 3
+    FINALIZADA = 4
+    CANCELADA = 5
+    OUTRO = 9
+
+
+STATUS_EM_ABERTO = (StatusOrdem.ABERTA, StatusOrdem.EM_ANDAMENTO, StatusOrdem.AGUARDANDO_PECAS)
+
+
+def _chave_status(status):
+    texto = unicodedata.normalize("NFKD", str(status or ""))
+    return " ".join("".join(c for c in texto if not unicodedata.combining(c)).lower().split())
+
+
+# textos livres já usados no campo status -> código canônico
+STATUS_CODIGOS = {
+    "aberto": StatusOrdem.ABERTA, "aberta": StatusOrdem.ABERTA,
+    "em andamento": StatusOrdem.EM_ANDAMENTO, "andamento": StatusOrdem.EM_ANDAMENTO,
+    "aguardando pecas": StatusOrdem.AGUARDANDO_PECAS, "aguardando": StatusOrdem.AGUARDANDO_PECAS,
+    "cancelado": StatusOrdem.CANCELADA, "cancelada": StatusOrdem.CANCELADA,
+    **{_chave_status(s): StatusOrdem.FINALIZADA for s in STATUS_FINALIZADOS},
+    "concluida": StatusOrdem.FINALIZADA, "finalizada": StatusOrdem.FINALIZADA, "terminada": StatusOrdem.FINALIZADA,
+}
+
+
+def codigo_status(status, padrao=StatusOrdem.OUTRO):
+    return STATUS_CODIGOS.get(_chave_status(status), padrao)
+
 
 class Usuario(Base):
     __tablename__ = 'usuarios'
@@ -22,10 +63,10 @@ class Usuario(Base):
 
 
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = gerar_hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return verificar_senha(self.password, password)
 
     def __repr__(self):
         return f'<Usuario(id={self.id}, nome={self.nome}, email={self.email}, cpf={self.cpf}, papel={self.papel})>'
@@ -40,12 +81,10 @@ class Usuario(Base):
         }
 
     def save(self):
-        db_session.add(self)
-        db_session.commit()
+        gravacao.salvar(self)
 
     def delete(self):
-        db_session.delete(self)
-        db_session.commit()
+        gravacao.remover(self)
 
 
 
@@ -54,7 +93,7 @@ class Cliente(Base):
     id_cliente = Column(Integer, primary_key=True)
     nome = Column(String(100), nullable=False)
     cpf = Column(String(11), unique=True, nullable=False)
-    telefone = Column(String(20), nullable=False)
+    telefone = Column(String(20), nullable=False, index=True)
     endereco = Column(String(200), nullable=False)
     email = Column(String(100), nullable=False, unique=True)
     ativo = Column(Boolean, default=True)
@@ -76,18 +115,16 @@ class Cliente(Base):
         }
 
     def save(self):
-        db_session.add(self)
-        db_session.commit()
+        gravacao.salvar(self)
 
     def delete(self):
-        db_session.delete(self)
-        db_session.commit()
+        gravacao.remover(self)
 
 
 class Veiculo(Base):
     __tablename__ = 'veiculos'
     id_veiculo = Column(Integer, primary_key=True)
-    cliente_id = Column(Integer, ForeignKey('clientes.id_cliente'), nullable=False)
+    cliente_id = Column(Integer, ForeignKey('clientes.id_cliente'), nullable=False, index=True)
     marca = Column(String(50), nullable=False)
     modelo = Column(String(50), nullable=False)
     placa = Column(String(10), unique=True, nullable=False)
@@ -109,48 +146,138 @@ class Veiculo(Base):
         }
 
     def save(self):
-        db_session.add(self)
-        db_session.commit()
+        gravacao.salvar(self)
 
     def delete(self):
-        db_session.delete(self)
-        db_session.commit()
+        gravacao.remover(self)
 
 class OrdemServico(Base):
     __tablename__ = 'ordem_servico'
+    # ids nunca reaproveitados: os das ordens arquivadas (arquivo.py) continuam valendo
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id_servico = Column(Integer, primary_key=True)
-    veiculo_id = Column(Integer, ForeignKey('veiculos.id_veiculo'))
-    data_abertura = Column(DateTime, default=datetime.utcnow)
+    veiculo_id = Column(Integer, ForeignKey('veiculos.id_veiculo'), index=True)
+    data_abertura = Column(DateTime, default=datetime.utcnow, index=True)
     descricao_servico = Column(String(200))
-    status = Column(String(50))
+    status = Column(String(50), index=True)
+    status_codigo = Column(Integer, index=True)
     valor_estimado = Column(Float)
     data_fechamento = Column(DateTime, nullable=True)
 
     veiculo = relationship("Veiculo", back_populates="ordens_servico")
 
+    @validates("status")
+    def _atualizar_status_codigo(self, _chave, status):
+        self.status_codigo = int(codigo_status(status))
+        return status
+
+    @property
+    def finalizada(self):
+        return self.status_codigo == StatusOrdem.FINALIZADA
+
     def serialize(self):
         return {
             "id_servico": self.id_servico,
             "veiculo_id": self.veiculo_id,
-            "data_abertura": self.data_abertura.strftime("%d-%m-%Y %H:%M") if self.data_abertura else None,
+            "data_abertura": self.data_abertura.strftime(FORMATO_DATA) if self.data_abertura else None,
             "descricao_servico": self.descricao_servico,
             "status": self.status,
             "valor_estimado": self.valor_estimado,
-            "data_fechamento": self.data_fechamento.strftime("%d-%m-%Y %H:%M") if self.data_fechamento else None
+            "data_fechamento": self.data_fechamento.strftime(FORMATO_DATA) if self.data_fechamento else None
 
         }
 
     def save(self):
-        db_session.add(self)
-        db_session.commit()
+        gravacao.salvar(self)
 
     def delete(self):
-        db_session.delete(self)
-        db_session.commit()
+        gravacao.remover(self)
+
+class ResumoDiario(Base):
+    __tablename__ = 'resumo_diario'
+
+    dia = Column(Date, primary_key=True)
+    # agrupado pelo código canônico (StatusOrdem), o mesmo do filtro ?status=
+    status_codigo = Column(Integer, primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    valor_total = Column(Float, nullable=False, default=0)
+    fechadas = Column(Integer, nullable=False, default=0)
+    valor_fechadas = Column(Float, nullable=False, default=0)
+    segundos_atendimento = Column(Float, nullable=False, default=0)
+
+
+class ResumoVeiculo(Base):
+    __tablename__ = 'resumo_veiculo'
+
+    veiculo_id = Column(Integer, primary_key=True)
+    status_codigo = Column(Integer, primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    valor_total = Column(Float, nullable=False, default=0)
+    fechadas = Column(Integer, nullable=False, default=0)
+    valor_fechadas = Column(Float, nullable=False, default=0)
+    segundos_atendimento = Column(Float, nullable=False, default=0)
+
+
+class EventoOrdem(Base):
+    """Log das mudanças nas ordens de serviço (eventos.py), lido por /eventos/ordens."""
+    __tablename__ = 'eventos_ordens'
+    # seq nunca se repete, nem depois da poda: é o Last-Event-ID dos assinantes
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    dados = Column(JSON, nullable=False)
+
+
+class Tarefa(Base):
+    """Tarefa da fila em segundo plano (tarefas.py)."""
+    __tablename__ = 'tarefas'
+
+    id_tarefa = Column(Integer, primary_key=True)
+    tipo = Column(String(50), nullable=False)
+    parametros = Column(JSON, nullable=False, default=dict)
+    # pendente -> executando -> concluida | falhou | cancelada
+    estado = Column(String(20), nullable=False, default="pendente", index=True)
+    progresso = Column(Integer, nullable=False, default=0)
+    total = Column(Integer)
+    cancelar = Column(Boolean, nullable=False, default=False)
+    resultado = Column(JSON)
+    erro = Column(String)
+    # pid do processo que a executa, para devolver à fila se ele morrer
+    dono = Column(Integer)
+    criada_em = Column(DateTime, default=datetime.utcnow)
+    iniciada_em = Column(DateTime)
+    concluida_em = Column(DateTime)
+
+    def serialize(self):
+        return {
+            "id_tarefa": self.id_tarefa,
+            "tipo": self.tipo,
+            "parametros": self.parametros,
+            "estado": self.estado,
+            "progresso": self.progresso,
+            "total": self.total,
+            "cancelar": self.cancelar,
+            "resultado": self.resultado,
+            "erro": self.erro,
+            "criada_em": self.criada_em.strftime(FORMATO_DATA) if self.criada_em else None,
+            "iniciada_em": self.iniciada_em.strftime(FORMATO_DATA) if self.iniciada_em else None,
+            "concluida_em": self.concluida_em.strftime(FORMATO_DATA) if self.concluida_em else None,
+        }
+
+    def save(self):
+        gravacao.salvar(self)
+
 
 def init_db():
-    Base.metadata.create_all(engine)
+    import arquivo
+
+    banco.iniciar()
+    Base.metadata.create_all(banco.engine)
+    # antes das migrações: a reconstrução dos resumos também lê o arquivo
+    with banco.engine.begin() as conexao:
+        arquivo.garantir_esquema(conexao)
+    migrar(banco.engine)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,105 @@
+from urllib.parse import urlencode
+
+from flask import request, Response, stream_with_context
+
+from serializacao import resposta
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+TAMANHO_LOTE = 500
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+def ler_inteiro(args, nome, minimo):
+    valor = args.get(nome)
+    if valor is None or valor == "":
+        return None
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"Parâmetro '{nome}' deve ser um número inteiro.")
+    if numero < minimo:
+        raise ParametroInvalido(f"Parâmetro '{nome}' deve ser maior ou igual a {minimo}.")
+    return numero
+
+
+def ler_parametros(args):
+    limite = ler_inteiro(args, "limit", 1)
+    cursor = ler_inteiro(args, "after", 0)
+    stream = args.get("stream", "").lower() in ("1", "true", "sim")
+    return limite, cursor, stream
+
+
+def ler_campos(args, serializador):
+    """Serializador restrito a fields= (ex.: fields=placa,modelo); sem o parâmetro, o próprio."""
+    valor = args.get("fields")
+    if not valor:
+        return serializador
+    campos = [campo.strip() for campo in valor.split(",") if campo.strip()]
+    desconhecidos = [campo for campo in campos if campo not in serializador.campos]
+    if desconhecidos:
+        raise ParametroInvalido(
+            f"Campos desconhecidos em 'fields': {', '.join(desconhecidos)}. "
+            f"Disponíveis: {', '.join(serializador.campos)}."
+        )
+    return serializador.projetar(campos)
+
+
+def _link_proxima(limite, cursor):
+    args = request.args.to_dict()
+    args["limit"] = str(limite)
+    args["after"] = str(cursor)
+    return f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+
+
+def _stream_json(session, stmt, serializador):
+    def gerar():
+        resultado = session.execute(stmt.execution_options(yield_per=TAMANHO_LOTE))
+        try:
+            yield b"["
+            primeiro = True
+            for linhas in resultado.partitions():
+                # cada lote vira um array JSON; sem os colchetes, os lotes se emendam
+                corpo = serializador.json(linhas)[1:-2]
+                if corpo:
+                    yield corpo if primeiro else b"," + corpo
+                    primeiro = False
+            yield b"]\n"
+        except Exception as e:
+            print(f"Erro durante o streaming: {e}")
+            raise
+        finally:
+            resultado.close()
+
+    return Response(stream_with_context(gerar()), mimetype="application/json")
+
+
+def listar(session, stmt, chave, serializador):
+    # stmt seleciona as colunas do serializador; sem limit, a página tem
+    # LIMITE_PADRAO linhas e X-Next-Cursor/Link apontam a seguinte. Só o
+    # stream=1 devolve a tabela inteira, em lotes e sem juntar tudo na memória
+    limite, cursor, stream = ler_parametros(request.args)
+
+    if cursor is not None:
+        stmt = stmt.where(chave > cursor)
+    stmt = stmt.order_by(chave)
+
+    if stream:
+        if limite is not None:
+            stmt = stmt.limit(limite)
+        return _stream_json(session, stmt, serializador)
+
+    limite = min(limite or LIMITE_PADRAO, LIMITE_MAXIMO)
+    linhas = session.execute(stmt.limit(limite + 1)).all()
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    resp = resposta(serializador, linhas)
+    if tem_mais:
+        proximo = linhas[-1][serializador.indice(chave.key)]
+        resp.headers["X-Next-Cursor"] = str(proximo)
+        resp.headers["Link"] = _link_proxima(limite, proximo)
+    return resp, 200
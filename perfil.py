@@ -0,0 +1,227 @@
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+
+from flask import request
+
+# perfis de requisições reais, sob demanda. Desligado (PERFIL=0), nenhum gancho
+# é instalado. Ligado, é perfilada uma fração PERFIL_AMOSTRA das requisições e
+# toda requisição de admin que mande o cabeçalho X-Profile
+# ("pstats" ou "colapsado"; outro valor usa o formato padrão).
+ATIVO = os.environ.get("PERFIL", "0") == "1"
+AMOSTRA = float(os.environ.get("PERFIL_AMOSTRA", 0))
+FORMATO = os.environ.get("PERFIL_FORMATO", "pstats")
+DIRETORIO = os.environ.get("PERFIL_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "perfis")
+MAXIMO_ARQUIVOS = int(os.environ.get("PERFIL_MAXIMO", 200))
+INTERVALO_AMOSTRAGEM = float(os.environ.get("PERFIL_INTERVALO_MS", 5)) / 1000
+CABECALHO = "X-Profile"
+
+# pstats: cProfile (todas as chamadas, com custo por chamada); colapsado: pilhas
+# amostradas, uma linha "a;b;c contagem" por pilha, no formato do flamegraph.pl
+EXTENSOES = {"pstats": ".prof", "colapsado": ".folded"}
+_NOME = re.compile(r"^[\w.-]+$")
+_sequencia = count(1)
+
+
+class Amostrador:
+    """Thread que lê a pilha das threads registradas a cada `intervalo` segundos.
+
+    Só roda enquanto há alguma requisição sendo perfilada.
+    """
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self._alvos = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def iniciar(self, ident):
+        with self._lock:
+            self._alvos[ident] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="perfil-amostrador", daemon=True)
+                self._thread.start()
+
+    def parar(self, ident):
+        with self._lock:
+            return self._alvos.pop(ident, Counter())
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                if not self._alvos:
+                    self._thread = None
+                    return
+                quadros = sys._current_frames()
+                for ident, pilhas in self._alvos.items():
+                    quadro = quadros.get(ident)
+                    if quadro is not None:
+                        pilhas[_pilha(quadro)] += 1
+
+
+def _pilha(quadro):
+    partes = []
+    while quadro is not None:
+        codigo = quadro.f_code
+        modulo = os.path.splitext(os.path.basename(codigo.co_filename))[0]
+        partes.append(f"{modulo}:{getattr(codigo, 'co_qualname', codigo.co_name)}")
+        quadro = quadro.f_back
+    return ";".join(reversed(partes))
+
+
+amostrador = Amostrador(INTERVALO_AMOSTRAGEM)
+
+
+class Coleta:
+    """Perfil de uma requisição em andamento."""
+
+    def __init__(self, formato, motivo):
+        self.formato = formato
+        self.motivo = motivo
+        self.inicio = time.perf_counter()
+        self._perfil = None
+        if formato == "pstats":
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+        else:
+            self._thread = threading.get_ident()
+            amostrador.iniciar(self._thread)
+
+    def encerrar(self):
+        duracao = time.perf_counter() - self.inicio
+        if self._perfil is not None:
+            self._perfil.disable()
+            return duracao, self._perfil
+        return duracao, amostrador.parar(self._thread)
+
+
+def _gravar(coleta, dados, metadados):
+    os.makedirs(DIRETORIO, exist_ok=True)
+    rota = re.sub(r"[^\w]+", "_", metadados["rota"]).strip("_") or "raiz"
+    nome = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(_sequencia)}-{rota}"[:150]
+    caminho = os.path.join(DIRETORIO, nome + EXTENSOES[coleta.formato])
+    if coleta.formato == "pstats":
+        dados.dump_stats(caminho)
+    else:
+        with open(caminho, "w") as arquivo:
+            arquivo.writelines(f"{pilha} {n}\n" for pilha, n in dados.most_common())
+    with open(os.path.join(DIRETORIO, nome + ".json"), "w") as arquivo:
+        json.dump({"id": nome, "arquivo": os.path.basename(caminho), **metadados}, arquivo)
+    _podar()
+    return nome
+
+
+def _podar():
+    metadados = sorted(
+        (entrada for entrada in os.scandir(DIRETORIO) if entrada.name.endswith(".json")),
+        key=lambda entrada: entrada.stat().st_mtime,
+    )
+    for entrada in metadados[:max(0, len(metadados) - MAXIMO_ARQUIVOS)]:
+        nome = entrada.name[:-len(".json")]
+        for extensao in (".json", *EXTENSOES.values()):
+            try:
+                os.remove(os.path.join(DIRETORIO, nome + extensao))
+            except FileNotFoundError:
+                pass
+
+
+def listar(limite=50):
+    """Metadados dos perfis mais recentes primeiro."""
+    if not os.path.isdir(DIRETORIO):
+        return []
+    entradas = sorted(
+        (entrada for entrada in os.scandir(DIRETORIO) if entrada.name.endswith(".json")),
+        key=lambda entrada: entrada.stat().st_mtime, reverse=True,
+    )
+    perfis = []
+    for entrada in entradas[:limite]:
+        try:
+            with open(entrada.path) as arquivo:
+                perfis.append(json.load(arquivo))
+        except (OSError, ValueError):
+            continue
+    return perfis
+
+
+def arquivo(perfil_id):
+    """Nome do arquivo do perfil dentro de DIRETORIO, ou None se não existir."""
+    if not _NOME.match(perfil_id):
+        return None
+    for extensao in EXTENSOES.values():
+        if os.path.isfile(os.path.join(DIRETORIO, perfil_id + extensao)):
+            return perfil_id + extensao
+    return None
+
+
+# ---- integração com o Flask
+
+def _admin():
+    from flask_jwt_extended import verify_jwt_in_request, get_jwt
+    from autorizacao import papel_do_usuario
+
+    try:
+        if verify_jwt_in_request(optional=True) is None:
+            return False
+        claims = get_jwt()
+        return claims.get("role") == "admin" and papel_do_usuario(int(claims["sub"])) == "admin"
+    except Exception:
+        return False
+
+
+def instalar(app):
+    if not ATIVO:
+        return
+
+    @app.before_request
+    def _iniciar():
+        pedido = request.headers.get(CABECALHO)
+        if pedido and _admin():
+            motivo, formato = "cabecalho", pedido if pedido in EXTENSOES else FORMATO
+        elif AMOSTRA and random.random() < AMOSTRA:
+            motivo, formato = "amostra", FORMATO
+        else:
+            return None
+        try:
+            coleta = Coleta(formato, motivo)
+        except ValueError:
+            # outro profiler já ativo nesta thread (ex.: cProfile de fora)
+            return None
+        # no environ, e não no g: as operações do /batch abrem contextos de requisição aninhados
+        request.environ["perfil.coleta"] = coleta
+        return None
+
+    @app.after_request
+    def _gravar_perfil(resposta):
+        coleta = request.environ.pop("perfil.coleta", None)
+        if coleta is None:
+            return resposta
+        duracao, dados = coleta.encerrar()
+        try:
+            resposta.headers["X-Profile-Id"] = _gravar(coleta, dados, {
+                "rota": request.url_rule.rule if request.url_rule else "desconhecida",
+                "metodo": request.method,
+                "caminho": request.full_path.rstrip("?"),
+                "status": resposta.status_code,
+                "duracao_ms": round(duracao * 1000, 3),
+                "formato": coleta.formato,
+                "motivo": coleta.motivo,
+                "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "pid": os.getpid(),
+            })
+        except OSError as e:
+            print(f"Erro ao gravar perfil: {e}", file=sys.stderr)
+        return resposta
+
+    @app.teardown_request
+    def _descartar_em_erro(_excecao=None):
+        coleta = request.environ.pop("perfil.coleta", None)
+        if coleta is not None:
+            coleta.encerrar()
@@ -0,0 +1,252 @@
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import event, inspect, select, delete, func, case
+from sqlalchemy.dialects.sqlite import insert
+
+import arquivo
+import banco
+from models import db_session, read_session, OrdemServico, ResumoDiario, ResumoVeiculo, StatusOrdem
+
+MEDIDAS = ("quantidade", "valor_total", "fechadas", "valor_fechadas", "segundos_atendimento")
+CAMPOS = ("veiculo_id", "data_abertura", "data_fechamento", "status_codigo", "valor_estimado")
+
+
+def normalizar_status(status_codigo):
+    # textos livres já viraram código em models.codigo_status; sem código, OUTRO
+    return int(status_codigo) if status_codigo is not None else int(StatusOrdem.OUTRO)
+
+
+def nome_status(status_codigo):
+    return StatusOrdem(status_codigo).name.lower()
+
+
+def _contribuicao(veiculo_id, data_abertura, data_fechamento, status_codigo, valor_estimado, sinal=1):
+    valor = valor_estimado or 0
+    fechada = data_fechamento is not None
+    segundos = 0
+    if fechada and data_abertura is not None:
+        segundos = (data_fechamento - data_abertura).total_seconds()
+    medidas = (
+        sinal,
+        sinal * valor,
+        sinal if fechada else 0,
+        sinal * valor if fechada else 0,
+        sinal * segundos,
+    )
+    status_codigo = normalizar_status(status_codigo)
+    dia = data_abertura.date() if data_abertura is not None else None
+    return (dia, status_codigo), (veiculo_id, status_codigo), medidas
+
+
+class Deltas:
+    def __init__(self):
+        self.diario = defaultdict(lambda: [0] * len(MEDIDAS))
+        self.veiculo = defaultdict(lambda: [0] * len(MEDIDAS))
+
+    def somar(self, *valores, sinal=1):
+        chave_dia, chave_veiculo, medidas = _contribuicao(*valores, sinal=sinal)
+        for destino, chave in ((self.diario, chave_dia), (self.veiculo, chave_veiculo)):
+            if None in chave:
+                continue
+            acumulado = destino[chave]
+            for i, medida in enumerate(medidas):
+                acumulado[i] += medida
+
+    def aplicar(self, conexao):
+        for modelo, deltas, chaves in (
+            (ResumoDiario, self.diario, ("dia", "status_codigo")),
+            (ResumoVeiculo, self.veiculo, ("veiculo_id", "status_codigo")),
+        ):
+            linhas = [
+                dict(zip(chaves, chave), **dict(zip(MEDIDAS, medidas)))
+                for chave, medidas in deltas.items()
+                if any(medidas)
+            ]
+            if not linhas:
+                continue
+            stmt = insert(modelo)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=chaves,
+                set_={m: getattr(modelo, m) + getattr(stmt.excluded, m) for m in MEDIDAS},
+            )
+            conexao.execute(stmt, linhas)
+
+
+def _valores_anteriores(ordem):
+    estado = inspect(ordem)
+    valores = []
+    for campo in CAMPOS:
+        historico = estado.attrs[campo].history
+        if historico.deleted:
+            valores.append(historico.deleted[0])
+        elif historico.unchanged:
+            valores.append(historico.unchanged[0])
+        else:
+            valores.append(getattr(ordem, campo))
+    return valores
+
+
+def _valores(ordem):
+    return [getattr(ordem, campo) for campo in CAMPOS]
+
+
+@event.listens_for(db_session, "before_flush")
+def _registrar_alteracoes(session, _contexto, _instancias):
+    # remoções e edições são lidas antes do flush, enquanto o estado antigo existe
+    deltas = session.info.setdefault("resumo_deltas", Deltas())
+    for ordem in session.deleted:
+        if isinstance(ordem, OrdemServico) and inspect(ordem).persistent:
+            deltas.somar(*_valores_anteriores(ordem), sinal=-1)
+    for ordem in session.dirty:
+        if isinstance(ordem, OrdemServico) and session.is_modified(ordem):
+            deltas.somar(*_valores_anteriores(ordem), sinal=-1)
+            deltas.somar(*_valores(ordem))
+
+
+@event.listens_for(db_session, "after_flush")
+def _atualizar_resumos(session, _contexto):
+    deltas = session.info.pop("resumo_deltas", None) or Deltas()
+    for ordem in session.new:
+        if isinstance(ordem, OrdemServico):
+            deltas.somar(*_valores(ordem))
+    deltas.aplicar(session.connection())
+
+
+@event.listens_for(db_session, "after_soft_rollback")
+def _descartar_deltas(session, _transacao):
+    session.info.pop("resumo_deltas", None)
+
+
+def registrar_insercoes(session, linhas, _ids=None):
+    # para inserções feitas em lote pelo Core, que não passam pelo flush do ORM
+    deltas = Deltas()
+    for linha in linhas:
+        deltas.somar(*(linha.get(campo) for campo in CAMPOS))
+    deltas.aplicar(session.connection())
+
+
+def registrar_remocoes(session, linhas):
+    deltas = Deltas()
+    for linha in linhas:
+        deltas.somar(*(linha[campo] for campo in CAMPOS), sinal=-1)
+    deltas.aplicar(session.connection())
+
+
+def reconstruir(conexao):
+    # os resumos cobrem todo o histórico, inclusive as ordens já arquivadas
+    ordem = arquivo.uniao(*CAMPOS).c
+    fechada = ordem.data_fechamento.isnot(None)
+    segundos = (func.julianday(ordem.data_fechamento) - func.julianday(ordem.data_abertura)) * 86400
+    medidas = (
+        func.count(),
+        func.coalesce(func.sum(ordem.valor_estimado), 0),
+        func.sum(case((fechada, 1), else_=0)),
+        func.coalesce(func.sum(case((fechada, ordem.valor_estimado), else_=0)), 0),
+        func.coalesce(func.sum(case((fechada, segundos), else_=0)), 0),
+    )
+    status_codigo = func.coalesce(ordem.status_codigo, int(StatusOrdem.OUTRO))
+    for modelo, chave, colunas in (
+        (ResumoDiario, func.date(ordem.data_abertura), ("dia", "status_codigo")),
+        (ResumoVeiculo, ordem.veiculo_id, ("veiculo_id", "status_codigo")),
+    ):
+        linhas = []
+        for linha in conexao.execute(
+            select(chave, status_codigo, *medidas)
+            .where(chave.isnot(None))
+            .group_by(chave, status_codigo)
+        ):
+            valor_chave = date.fromisoformat(linha[0]) if modelo is ResumoDiario else linha[0]
+            linhas.append(dict(zip(colunas, (valor_chave, linha[1])), **dict(zip(MEDIDAS, linha[2:]))))
+
+        conexao.execute(delete(modelo))
+        if linhas:
+            conexao.execute(insert(modelo), linhas)
+
+
+def _data(texto):
+    return date.fromisoformat(texto) if texto else None
+
+
+def _filtrar_periodo(stmt, inicio, fim):
+    if inicio:
+        stmt = stmt.where(ResumoDiario.dia >= inicio)
+    if fim:
+        stmt = stmt.where(ResumoDiario.dia <= fim)
+    return stmt
+
+
+def _medidas(valores):
+    fechadas = valores["fechadas"] or 0
+    return {
+        "quantidade": valores["quantidade"],
+        "valor_total": round(valores["valor_total"], 2),
+        "fechadas": fechadas,
+        "valor_fechadas": round(valores["valor_fechadas"], 2),
+        "atendimento_medio_horas": round(valores["segundos_atendimento"] / fechadas / 3600, 2) if fechadas else None,
+    }
+
+
+def _somas(modelo):
+    return [func.sum(getattr(modelo, m)).label(m) for m in MEDIDAS]
+
+
+def receita(inicio=None, fim=None, agrupar="dia"):
+    stmt = _filtrar_periodo(
+        select(ResumoDiario.dia, *_somas(ResumoDiario)).group_by(ResumoDiario.dia).order_by(ResumoDiario.dia),
+        inicio, fim,
+    )
+    periodos = {}
+    for linha in read_session.execute(stmt):
+        periodo = linha.dia.strftime("%Y-%m") if agrupar == "mes" else linha.dia.isoformat()
+        total = periodos.setdefault(periodo, dict.fromkeys(MEDIDAS, 0))
+        for m in MEDIDAS:
+            total[m] += linha._mapping[m] or 0
+    return [{"periodo": periodo, **_medidas(total)} for periodo, total in periodos.items() if total["quantidade"]]
+
+
+def _status(status_codigo):
+    return {"status": nome_status(status_codigo), "status_codigo": status_codigo}
+
+
+def por_status(inicio=None, fim=None):
+    stmt = _filtrar_periodo(
+        select(ResumoDiario.status_codigo, *_somas(ResumoDiario))
+        .group_by(ResumoDiario.status_codigo).order_by(ResumoDiario.status_codigo),
+        inicio, fim,
+    )
+    return [
+        {**_status(linha.status_codigo), **_medidas(linha._mapping)}
+        for linha in read_session.execute(stmt) if linha.quantidade
+    ]
+
+
+def por_veiculo(veiculo_id):
+    stmt = (
+        select(ResumoVeiculo)
+        .where(ResumoVeiculo.veiculo_id == veiculo_id, ResumoVeiculo.quantidade > 0)
+        .order_by(ResumoVeiculo.status_codigo)
+    )
+    return [
+        {**_status(linha.status_codigo), **_medidas(vars(linha))}
+        for linha in read_session.execute(stmt).scalars()
+    ]
+
+
+def ler_periodo(args):
+    try:
+        return _data(args.get("inicio")), _data(args.get("fim"))
+    except ValueError:
+        raise ValueError("Datas devem estar no formato AAAA-MM-DD.")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["reconstruir"]:
+        print("uso: python relatorios.py reconstruir")
+        sys.exit(2)
+    inicio = datetime.now()
+    banco.iniciar()
+    with banco.engine.begin() as conexao:
+        reconstruir(conexao)
+    print(f"Resumos reconstruídos em {(datetime.now() - inicio).total_seconds():.1f}s")
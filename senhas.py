@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TempoEsgotado
+from functools import lru_cache
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# padrão do werkzeug (scrypt): trocar o método força o rehash de todos os usuários no próximo login
+METODO = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+TAMANHO_SAL = int(os.environ.get("PASSWORD_SALT_LENGTH", 16))
+# 0 desliga o pool e calcula o hash na própria thread da requisição
+TRABALHADORES = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+FILA_MAXIMA = int(os.environ.get("PASSWORD_HASH_QUEUE", max(TRABALHADORES, 1) * 8))
+TEMPO_LIMITE = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 10))
+
+
+class FilaDeHashCheia(RuntimeError):
+    pass
+
+
+_pool = None
+_pid = None
+_lock = threading.Lock()
+_vagas = threading.BoundedSemaphore(FILA_MAXIMA)
+
+
+def _executor():
+    global _pool, _pid
+    with _lock:
+        # um processo filho de fork não pode reaproveitar o pool do pai
+        if _pool is None or _pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=TRABALHADORES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pid = os.getpid()
+        return _pool
+
+
+def _executar(funcao, *args):
+    if TRABALHADORES == 0:
+        return funcao(*args)
+    if not _vagas.acquire(timeout=TEMPO_LIMITE):
+        raise FilaDeHashCheia("Fila de hash de senhas cheia.")
+    try:
+        futuro = _executor().submit(funcao, *args)
+        try:
+            return futuro.result(timeout=TEMPO_LIMITE)
+        except TempoEsgotado:
+            # mesma resposta da fila cheia (503): o pool não está dando conta
+            futuro.cancel()
+            raise FilaDeHashCheia("Tempo esgotado aguardando o hash de senha.")
+    finally:
+        _vagas.release()
+
+
+def gerar_hash(senha):
+    return _executar(generate_password_hash, senha, METODO, TAMANHO_SAL)
+
+
+def verificar_senha(senha_hash, senha):
+    return _executar(check_password_hash, senha_hash, senha)
+
+
+@lru_cache(maxsize=None)
+def _parametros_atuais():
+    # o werkzeug completa o método (ex.: "scrypt" -> "scrypt:32768:8:1")
+    metodo, sal, _ = generate_password_hash("", METODO, TAMANHO_SAL).split("$", 2)
+    return metodo, len(sal)
+
+
+def precisa_rehash(senha_hash):
+    partes = senha_hash.split("$", 2)
+    if len(partes) != 3:
+        return True
+    return (partes[0], len(partes[1])) != _parametros_atuais()
+
+
+def encerrar():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,142 @@
+import json
+import re
+
+from flask import current_app, jsonify, Response
+from sqlalchemy import select, func, null, DateTime, Float
+from sqlalchemy.engine import make_url
+
+from banco import DATABASE_READ_URL
+from models import Usuario, Cliente, Veiculo, OrdemServico, FORMATO_DATA
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# o SQLite formata as datas na própria consulta, no mesmo formato do strftime
+DATAS_NO_SQL = make_url(DATABASE_READ_URL).get_backend_name() == "sqlite"
+
+_FORA_DO_ASCII = re.compile(rb"[\x7f-\xff]")
+_ESCAPAR = re.compile("[^\x00-\x7e]")
+
+
+def _unicode(match):
+    # mesmo escape do json.dumps com ensure_ascii, inclusive o par substituto
+    codigo = ord(match.group())
+    if codigo < 0x10000:
+        return f"\\u{codigo:04x}"
+    codigo -= 0x10000
+    return f"\\u{0xd800 | (codigo >> 10):04x}\\u{0xdc00 | (codigo & 0x3ff):04x}"
+
+
+def codificar(dados, floats_simples=False):
+    """Bytes iguais aos do jsonify fora do modo debug (chaves ordenadas, ASCII, "\\n" no fim).
+
+    O orjson só é usado com floats_simples: ele escreve 1e16 e 1e-05 de outro
+    jeito e troca NaN por null, então quem chama garante que não há floats assim.
+    """
+    if orjson is not None and floats_simples:
+        try:
+            corpo = orjson.dumps(dados, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        except orjson.JSONEncodeError:
+            pass
+        else:
+            if _FORA_DO_ASCII.search(corpo):
+                corpo = _ESCAPAR.sub(_unicode, corpo.decode()).encode()
+            return corpo
+    return (json.dumps(dados, sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+
+def float_simples(valor):
+    # faixa em que repr(float) não usa notação exponencial; NaN e infinito ficam fora
+    return valor is None or valor == 0 or 1e-4 <= abs(valor) < 1e16
+
+
+class Serializador:
+    """Lista de linhas -> JSON idêntico ao serialize() do modelo, sem hidratar objetos."""
+
+    def __init__(self, modelo, campos, nulos=()):
+        self.modelo = modelo
+        self.campos = campos + nulos
+        self._proprios = campos
+        self._nulos = nulos
+        colunas = [getattr(modelo, campo) for campo in campos]
+        self._datas = [i for i, c in enumerate(colunas) if isinstance(c.type, DateTime)]
+        self._floats = [i for i, c in enumerate(colunas) if isinstance(c.type, Float)]
+        self._projecoes = {}
+
+    def colunas(self, entidade=None):
+        # entidade: o modelo ou um aliased dele (ex.: ordens com as arquivadas)
+        entidade = entidade or self.modelo
+        colunas = []
+        for i, campo in enumerate(self._proprios):
+            coluna = getattr(entidade, campo)
+            if i in self._datas and DATAS_NO_SQL:
+                coluna = func.strftime(FORMATO_DATA, coluna)
+            colunas.append(coluna.label(campo))
+        return colunas + [null().label(campo) for campo in self._nulos]
+
+    def selecionar(self, entidade=None):
+        return select(*self.colunas(entidade))
+
+    def projetar(self, campos):
+        """Serializador só com `campos`, que também só seleciona essas colunas.
+
+        A chave (o primeiro campo) sempre vem: a paginação e as rotas de busca dependem dela.
+        """
+        pedidos = frozenset(campos) | {self.campos[0]}
+        projecao = self._projecoes.get(pedidos)
+        if projecao is None:
+            projecao = self._projecoes[pedidos] = Serializador(
+                self.modelo,
+                tuple(campo for campo in self._proprios if campo in pedidos),
+                nulos=tuple(campo for campo in self._nulos if campo in pedidos),
+            )
+        return projecao
+
+    def indice(self, campo):
+        return self.campos.index(campo)
+
+    def dicionarios(self, linhas):
+        campos = self.campos
+        if self._datas and not DATAS_NO_SQL:
+            datas = self._datas
+            linhas = [
+                [v.strftime(FORMATO_DATA) if i in datas and v is not None else v for i, v in enumerate(linha)]
+                for linha in linhas
+            ]
+        return [dict(zip(campos, linha)) for linha in linhas]
+
+    def json(self, linhas):
+        floats_simples = all(float_simples(linha[i]) for i in self._floats for linha in linhas)
+        return codificar(self.dicionarios(linhas), floats_simples)
+
+    def json_objeto(self, linha):
+        return codificar(self.dicionarios([linha])[0], all(float_simples(linha[i]) for i in self._floats))
+
+
+USUARIO = Serializador(Usuario, ("id", "nome", "cpf", "email", "papel"))
+# motivo_inativo só existe no objeto em memória, nunca vem do banco
+CLIENTE = Serializador(Cliente, ("id_cliente", "nome", "cpf", "telefone", "endereco", "email", "ativo"),
+                       nulos=("motivo_inativo",))
+VEICULO = Serializador(Veiculo, ("id_veiculo", "cliente_id", "marca", "modelo", "placa", "ano_fabricacao"))
+ORDEM_SERVICO = Serializador(OrdemServico, ("id_servico", "veiculo_id", "data_abertura", "descricao_servico",
+                                            "status", "valor_estimado", "data_fechamento"))
+
+
+def _compacto():
+    provedor = current_app.json
+    return provedor.compact if provedor.compact is not None else not current_app.debug
+
+
+def resposta(serializador, linhas):
+    # no modo debug o jsonify indenta a saída; ali a velocidade não importa
+    if not _compacto():
+        return jsonify(serializador.dicionarios(linhas))
+    return Response(serializador.json(linhas), mimetype="application/json")
+
+
+def resposta_objeto(serializador, linha):
+    if not _compacto():
+        return jsonify(serializador.dicionarios([linha])[0])
+    return Response(serializador.json_objeto(linha), mimetype="application/json")
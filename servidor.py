@@ -0,0 +1,139 @@
+# Servidor de produção em modo pre-fork.
+#
+#   python servidor.py --host 0.0.0.0 --port 5000 --workers 0
+#
+# O processo principal aplica as migrações, abre o socket e faz o fork de N
+# workers (0 = um por núcleo disponível). Cada worker monta o seu app com
+# create_app() e abre as próprias conexões com o banco; um worker que morre é
+# substituído. Com --arquivar-dias, um processo a mais move as ordens fechadas
+# antigas para o arquivo (arquivo.py). SIGTERM/SIGINT encerram todos.
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+# reinícios seguidos mais rápidos que isso indicam um worker que não sobe
+INTERVALO_MINIMO_REINICIO = 1.0
+
+
+def _nucleos():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _worker(soquete, threads):
+    from werkzeug.serving import make_server
+    from Api import create_app
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    host, porta = soquete.getsockname()[:2]
+    servidor = make_server(host, porta, create_app(), threaded=threads > 1, fd=soquete.fileno())
+    if threads > 1:
+        # o ThreadingMixIn não limita threads; a admissão (admissao.py) já limita por classe
+        servidor.daemon_threads = True
+    servidor.serve_forever()
+
+
+def _arquivador(dias):
+    import arquivo
+    import banco
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    banco.iniciar()
+    arquivo.executar_continuamente(dias)
+
+
+def _iniciar(alvo):
+    pid = os.fork()
+    if pid == 0:
+        codigo = 0
+        try:
+            alvo()
+        except SystemExit as e:
+            codigo = e.code or 0
+        except BaseException as e:
+            print(f"worker {os.getpid()}: {e!r}", file=sys.stderr)
+            codigo = 1
+        finally:
+            os._exit(codigo)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve o Api.py com workers em pre-fork.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=0, help="0 = um por núcleo")
+    parser.add_argument("--threads", type=int, default=8, help="1 = sem threads por worker")
+    parser.add_argument("--arquivar-dias", type=int, default=int(os.environ.get("ARQUIVO_DIAS", 0)),
+                        help="arquiva as ordens fechadas há mais de N dias (0 = não arquiva)")
+    args = parser.parse_args()
+    workers = args.workers or _nucleos()
+
+    # o código é importado uma vez aqui e compartilhado (copy-on-write) com os
+    # workers; app e conexões são criados em cada worker, depois do fork
+    import Api  # noqa: F401
+    from sqlalchemy.orm import configure_mappers
+    import banco
+    from models import init_db, Base
+    import cache_versionado
+
+    configure_mappers()
+
+    # só o processo principal migra; nenhum worker disputa o DDL
+    init_db()
+    banco.engine.dispose()
+    banco.read_engine.dispose()
+    cache_versionado.compartilhar_versoes(sorted(Base.metadata.tables))
+
+    soquete = socket.create_server((args.host, args.port), backlog=1024)
+    soquete.set_inheritable(True)
+
+    filhos = {}
+    encerrando = False
+
+    def encerrar(_sinal, _quadro):
+        nonlocal encerrando
+        encerrando = True
+        for pid in list(filhos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    alvos = [lambda: _worker(soquete, args.threads)] * workers
+    if args.arquivar_dias:
+        alvos.append(lambda: _arquivador(args.arquivar_dias))
+    for alvo in alvos:
+        filhos[_iniciar(alvo)] = (time.monotonic(), alvo)
+    print(f"servindo em http://{args.host}:{args.port} com {workers} workers", file=sys.stderr)
+
+    while filhos:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        filho = filhos.pop(pid, None)
+        if filho is None or encerrando:
+            continue
+        iniciado, alvo = filho
+        print(f"processo {pid} saiu (status {status}); iniciando outro", file=sys.stderr)
+        espera = INTERVALO_MINIMO_REINICIO - (time.monotonic() - iniciado)
+        if espera > 0:
+            time.sleep(espera)
+        if not encerrando:
+            filhos[_iniciar(alvo)] = (time.monotonic(), alvo)
+    soquete.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import inspect
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import select, update, delete, func
+
+import arquivo
+import banco
+import busca
+import cache_versionado
+import eventos
+import relatorios
+from banco import db_session
+from models import Tarefa, Cliente, Veiculo, OrdemServico
+
+# fila persistida na tabela tarefas; cada processo que monta o app roda
+# THREADS trabalhadores (0 = só enfileira; outro processo executa, ex.:
+# `python tarefas.py`). Uma tarefa é reservada com um UPDATE condicional, então
+# vários processos podem consumir a mesma fila.
+THREADS = int(os.environ.get("TAREFAS_THREADS", 2))
+INTERVALO = float(os.environ.get("TAREFAS_INTERVALO", 1))
+TAMANHO_LOTE = int(os.environ.get("TAREFAS_LOTE", 2000))
+# entre lotes, para as escritas das requisições não esperarem atrás da cascata
+PAUSA = float(os.environ.get("TAREFAS_PAUSA_MS", 20)) / 1000
+ATIVAS = ("pendente", "executando")
+FINAIS = ("concluida", "falhou", "cancelada")
+
+_TABELA = Tarefa.__table__
+_CAMPOS_ORDEM = ("id_servico", "status") + relatorios.CAMPOS
+
+
+class Cancelada(Exception):
+    pass
+
+
+class Execucao:
+    """O que uma tarefa em execução vê da própria linha na fila."""
+
+    def __init__(self, id_tarefa, progresso=0):
+        self.id_tarefa = id_tarefa
+        # o já feito antes de uma queda do processo que a executava
+        self.progresso = progresso
+
+    def verificar(self):
+        # chamado entre lotes: o cancelamento nunca interrompe uma transação
+        with banco.engine.connect() as conexao:
+            if conexao.execute(select(_TABELA.c.cancelar).where(_TABELA.c.id_tarefa == self.id_tarefa)).scalar():
+                raise Cancelada()
+
+    def avancar(self, conexao, progresso, total=None):
+        # na mesma transação do lote: o progresso gravado é sempre o que foi confirmado
+        valores = {"progresso": progresso}
+        if total is not None:
+            valores["total"] = total
+        conexao.execute(update(_TABELA).where(_TABELA.c.id_tarefa == self.id_tarefa).values(**valores))
+
+
+# ---- tipos de tarefa
+
+def _ordens(tabela, veiculos, limite=None):
+    stmt = select(*(tabela.c[campo] for campo in _CAMPOS_ORDEM)).where(tabela.c.veiculo_id.in_(veiculos))
+    return stmt.limit(limite) if limite else stmt
+
+
+def _remover_ordens(sessao, tabela, linhas, cliente_id):
+    relatorios.registrar_remocoes(sessao, [linha._mapping for linha in linhas])
+    eventos.registrar_remocoes(sessao, linhas, cliente_id)
+    sessao.execute(delete(tabela).where(tabela.c.id_servico.in_([linha.id_servico for linha in linhas])))
+
+
+def _cascata(execucao, veiculos, cliente_id, remover_cliente):
+    """Remove as ordens (quentes e arquivadas) e os veículos de `veiculos`, em lotes.
+
+    Cada lote é uma transação com os resumos, os eventos e o progresso. A
+    última também apaga os veículos (e o cliente) junto com as ordens que
+    tenham entrado durante a cascata, para não sobrar nenhuma órfã.
+    """
+    tabelas = [OrdemServico.__table__] + ([arquivo.ORDENS] if arquivo.ATIVO else [])
+    with banco.engine.connect() as conexao:
+        total = sum(
+            conexao.execute(select(func.count()).where(tabela.c.veiculo_id.in_(veiculos))).scalar()
+            for tabela in tabelas
+        )
+    feitas = execucao.progresso
+    total += feitas
+    for tabela in tabelas:
+        while True:
+            execucao.verificar()
+            with db_session.session_factory() as sessao:
+                linhas = sessao.execute(_ordens(tabela, veiculos, TAMANHO_LOTE)).all()
+                if not linhas:
+                    break
+                _remover_ordens(sessao, tabela, linhas, cliente_id)
+                feitas += len(linhas)
+                execucao.avancar(sessao, feitas, max(total, feitas))
+                sessao.commit()
+            time.sleep(PAUSA)
+
+    execucao.verificar()
+    with db_session.session_factory() as sessao:
+        for tabela in tabelas:
+            linhas = sessao.execute(_ordens(tabela, veiculos)).all()
+            if linhas:
+                _remover_ordens(sessao, tabela, linhas, cliente_id)
+                feitas += len(linhas)
+        ids = sessao.execute(veiculos).scalars().all()
+        busca.remover(sessao.connection(), "veiculo", ids)
+        sessao.execute(delete(Veiculo).where(Veiculo.id_veiculo.in_(ids)))
+        if remover_cliente:
+            busca.remover(sessao.connection(), "cliente", [cliente_id])
+            sessao.execute(delete(Cliente).where(Cliente.id_cliente == cliente_id))
+        execucao.avancar(sessao, feitas, feitas)
+        sessao.commit()
+    return {"ordens": feitas, "veiculos": len(ids)}
+
+
+def remover_cliente(execucao, cliente_id):
+    veiculos = select(Veiculo.id_veiculo).where(Veiculo.cliente_id == cliente_id)
+    return _cascata(execucao, veiculos, cliente_id, remover_cliente=True)
+
+
+def remover_veiculo(execucao, veiculo_id):
+    with banco.engine.connect() as conexao:
+        cliente_id = conexao.execute(select(Veiculo.cliente_id).where(Veiculo.id_veiculo == veiculo_id)).scalar()
+    veiculos = select(Veiculo.id_veiculo).where(Veiculo.id_veiculo == veiculo_id)
+    return _cascata(execucao, veiculos, cliente_id, remover_cliente=False)
+
+
+def reconstruir_resumos(execucao):
+    with banco.engine.begin() as conexao:
+        execucao.avancar(conexao, 0, 1)
+        relatorios.reconstruir(conexao)
+        execucao.avancar(conexao, 1)
+    # os relatórios são versionados pela tabela de ordens
+    cache_versionado.incrementar("ordem_servico")
+
+
+def reconstruir_busca(execucao):
+    with banco.engine.begin() as conexao:
+        execucao.avancar(conexao, 0, 1)
+        busca.reconstruir(conexao)
+        execucao.avancar(conexao, 1)
+    cache_versionado.incrementar("clientes", "veiculos")
+
+
+def arquivar(execucao, dias):
+    if not isinstance(dias, int) or dias < 0:
+        raise ValueError("'dias' deve ser um inteiro não negativo.")
+    return {"arquivadas": arquivo.arquivar(arquivo.limite(dias))}
+
+
+TIPOS = {
+    "remover_cliente": remover_cliente,
+    "remover_veiculo": remover_veiculo,
+    "reconstruir_resumos": reconstruir_resumos,
+    "reconstruir_busca": reconstruir_busca,
+    "arquivar": arquivar,
+}
+# as remoções entram pelas rotas de exclusão, que conferem se o registro existe
+MANUTENCAO = ("reconstruir_resumos", "reconstruir_busca", "arquivar")
+
+
+class ParametrosInvalidos(Exception):
+    pass
+
+
+def validar(tipo, parametros):
+    if tipo not in TIPOS:
+        raise ParametrosInvalidos(f"Tipo de tarefa desconhecido: '{tipo}'.")
+    if not isinstance(parametros, dict):
+        raise ParametrosInvalidos("'parametros' deve ser um objeto.")
+    try:
+        inspect.signature(TIPOS[tipo]).bind(None, **parametros)
+    except TypeError as e:
+        raise ParametrosInvalidos(f"Parâmetros inválidos para '{tipo}': {e}.")
+
+
+# ---- fila
+
+def enfileirar(tipo, parametros=None):
+    """Grava a tarefa (ou devolve a igual ainda ativa) e acorda os trabalhadores deste processo."""
+    parametros = parametros or {}
+    validar(tipo, parametros)
+    for tarefa in db_session.execute(
+        select(Tarefa).where(Tarefa.tipo == tipo, Tarefa.estado.in_(ATIVAS))
+    ).scalars():
+        if tarefa.parametros == parametros:
+            return tarefa
+    tarefa = Tarefa(tipo=tipo, parametros=parametros, estado="pendente", progresso=0, cancelar=False)
+    tarefa.save()
+    if _trabalhadores is not None:
+        _trabalhadores.acordar()
+    return tarefa
+
+
+def cancelar(id_tarefa):
+    """Estado da tarefa depois do pedido; None se ela não existe.
+
+    Pendente é cancelada na hora; em execução, para no fim do lote corrente.
+    """
+    with banco.engine.begin() as conexao:
+        conexao.execute(
+            update(_TABELA).where(_TABELA.c.id_tarefa == id_tarefa, _TABELA.c.estado == "pendente")
+            .values(estado="cancelada", cancelar=True, concluida_em=datetime.utcnow())
+        )
+        conexao.execute(
+            update(_TABELA).where(_TABELA.c.id_tarefa == id_tarefa, _TABELA.c.estado == "executando")
+            .values(cancelar=True)
+        )
+        return conexao.execute(select(_TABELA.c.estado).where(_TABELA.c.id_tarefa == id_tarefa)).scalar()
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def recuperar():
+    # tarefas de processos que morreram no meio voltam para a fila; todas são
+    # retomáveis (lotes já confirmados não se repetem)
+    with banco.engine.connect() as conexao:
+        orfas = [
+            id_tarefa for id_tarefa, dono in conexao.execute(
+                select(_TABELA.c.id_tarefa, _TABELA.c.dono).where(_TABELA.c.estado == "executando")
+            )
+            if dono is None or (dono != os.getpid() and not _vivo(dono))
+        ]
+    if orfas:
+        with banco.engine.begin() as conexao:
+            conexao.execute(
+                update(_TABELA).where(_TABELA.c.id_tarefa.in_(orfas), _TABELA.c.estado == "executando")
+                .values(estado="pendente", dono=None)
+            )
+        print(f"tarefas: {len(orfas)} tarefas de processos encerrados devolvidas à fila", file=sys.stderr)
+
+
+def _reservar():
+    # a leitura vem antes: sem tarefa pendente, nenhum lock de escrita é pedido
+    with banco.engine.connect() as conexao:
+        candidata = conexao.execute(
+            select(_TABELA.c.id_tarefa).where(_TABELA.c.estado == "pendente").order_by(_TABELA.c.id_tarefa).limit(1)
+        ).scalar()
+    if candidata is None:
+        return None
+    with banco.engine.begin() as conexao:
+        return conexao.execute(
+            update(_TABELA).where(_TABELA.c.id_tarefa == candidata, _TABELA.c.estado == "pendente")
+            .values(estado="executando", dono=os.getpid(), iniciada_em=datetime.utcnow())
+            .returning(_TABELA.c.id_tarefa, _TABELA.c.tipo, _TABELA.c.parametros, _TABELA.c.progresso)
+        ).first()
+
+
+def executar(id_tarefa, tipo, parametros, progresso=0):
+    resultado, erro = None, None
+    try:
+        resultado = TIPOS[tipo](Execucao(id_tarefa, progresso), **parametros)
+        estado = "concluida"
+    except Cancelada:
+        estado = "cancelada"
+    except Exception as e:
+        estado, erro = "falhou", str(e)
+        print(f"tarefas: tarefa {id_tarefa} ({tipo}) falhou: {e}", file=sys.stderr)
+    with banco.engine.begin() as conexao:
+        conexao.execute(update(_TABELA).where(_TABELA.c.id_tarefa == id_tarefa).values(
+            estado=estado, resultado=resultado, erro=erro, concluida_em=datetime.utcnow(),
+        ))
+    return estado
+
+
+class Trabalhadores:
+    """Threads que consomem a fila; sem tarefas, consultam a cada `intervalo` segundos."""
+
+    def __init__(self, quantidade, intervalo):
+        self.intervalo = intervalo
+        self._acordar = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._executar, name=f"tarefas-{i}", daemon=True) for i in range(quantidade)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def acordar(self):
+        self._acordar.set()
+
+    def _executar(self):
+        while True:
+            try:
+                tarefa = _reservar()
+                if tarefa is None:
+                    recuperar()
+            except Exception as e:
+                print(f"tarefas: erro ao consultar a fila: {e}", file=sys.stderr)
+                tarefa = None
+            if tarefa is None:
+                self._acordar.wait(self.intervalo)
+                self._acordar.clear()
+                continue
+            executar(*tarefa)
+
+
+_trabalhadores = None
+_pid = None
+_lock = threading.Lock()
+
+
+def iniciar(quantidade=THREADS):
+    global _trabalhadores, _pid
+    with _lock:
+        # threads não sobrevivem a um fork: cada worker do servidor.py inicia as suas
+        if quantidade and (_trabalhadores is None or _pid != os.getpid()):
+            _trabalhadores = Trabalhadores(quantidade, INTERVALO)
+            _pid = os.getpid()
+
+
+if __name__ == "__main__":
+    import argparse
+    from models import init_db
+
+    parser = argparse.ArgumentParser(description="Executa as tarefas da fila neste processo.")
+    parser.add_argument("--enfileirar", choices=MANUTENCAO, help="enfileira uma tarefa de manutenção e sai")
+    parser.add_argument("--dias", type=int, default=arquivo.DIAS or 365, help="para --enfileirar arquivar")
+    args = parser.parse_args()
+
+    init_db()
+    if args.enfileirar:
+        tarefa = enfileirar(args.enfileirar, {"dias": args.dias} if args.enfileirar == "arquivar" else {})
+        print(f"tarefa {tarefa.id_tarefa} ({tarefa.estado})")
+        db_session.remove()
+    else:
+        # esvazia a fila e continua esperando por novas
+        recuperar()
+        while True:
+            tarefa = _reservar()
+            if tarefa is None:
+                time.sleep(INTERVALO)
+                continue
+            print(f"tarefa {tarefa[0]} ({tarefa[1]}): {executar(*tarefa)}", file=sys.stderr)
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+# o banco e as opções são lidos na importação dos módulos: definidos antes de tudo
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'testes.db')}"
+os.environ.setdefault("ADMISSAO", "0")
+os.environ.setdefault("TAREFAS_THREADS", "0")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    from Api import create_app
+    from models import init_db
+
+    init_db()
+    return create_app()
+
+
+@pytest.fixture(scope="session")
+def tokens(app):
+    # cabeçalhos de um administrador e de um usuário comum, como os do /login
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import insert
+    from models import db_session, Usuario
+
+    papeis = ("admin", "atendente")
+    ids = db_session.execute(insert(Usuario).returning(Usuario.id), [{
+        "nome": papel, "email": f"{papel}@testes.com.br", "cpf": f"9000000000{i}", "password": "-", "papel": papel,
+    } for i, papel in enumerate(papeis)]).scalars().all()
+    db_session.commit()
+    db_session.remove()
+    with app.app_context():
+        return {
+            papel: {"Authorization": "Bearer " + create_access_token(identity=str(id_), additional_claims={"role": papel})}
+            for id_, papel in zip(ids, papeis)
+        }
@@ -0,0 +1,75 @@
+import pytest
+from flask import Flask, Response
+
+import admissao
+
+
+@pytest.fixture
+def app_admissao(monkeypatch):
+    # os testes rodam com ADMISSAO=0: um app próprio, com uma vaga só por classe
+    monkeypatch.setattr(admissao, "ATIVO", True)
+    monkeypatch.setattr(admissao, "PORTOES", {
+        nome: admissao.Portao(nome, 1, 0, 0) for nome in ("pesada", "leve", "escrita", "assinatura")
+    })
+    app = Flask(__name__)
+    admissao.instalar(app)
+
+    @app.route("/falha")
+    def falha():
+        raise RuntimeError("falha na view")
+
+    @app.route("/ok")
+    def ok():
+        return "ok"
+
+    @app.route("/streaming")
+    def streaming():
+        return Response(iter([b"a", b"b"]))
+
+    @app.route("/streaming-com-falha")
+    def streaming_com_falha():
+        def partes():
+            yield b"a"
+            raise RuntimeError("falha no meio do corpo")
+        return Response(partes())
+
+    return app
+
+
+def test_view_que_levanta_devolve_a_vaga(app_admissao):
+    cliente = app_admissao.test_client()
+    # a resposta de erro do Flask chega como streaming: a vaga volta no close(),
+    # que o servidor WSGI sempre chama
+    with cliente.get("/falha") as resposta:
+        assert resposta.status_code == 500
+    assert admissao.PORTOES["leve"].ativas == 0
+    # com uma vaga só, a próxima requisição seria recusada com 503 se ela tivesse ficado presa
+    with cliente.get("/ok") as resposta:
+        assert resposta.status_code == 200
+
+
+def test_excecao_propagada_tambem_devolve_a_vaga(app_admissao):
+    app_admissao.testing = True
+    with pytest.raises(RuntimeError):
+        app_admissao.test_client().get("/falha")
+    assert admissao.PORTOES["leve"].ativas == 0
+
+
+def test_streaming_segura_a_vaga_ate_o_fechamento(app_admissao):
+    cliente = app_admissao.test_client()
+    resposta = cliente.get("/streaming", buffered=False)
+    assert admissao.PORTOES["leve"].ativas == 1
+    with cliente.get("/ok") as recusada:
+        assert recusada.status_code == 503
+    resposta.close()
+    assert admissao.PORTOES["leve"].ativas == 0
+    with cliente.get("/ok") as resposta:
+        assert resposta.status_code == 200
+
+
+def test_falha_no_meio_do_streaming_devolve_a_vaga(app_admissao):
+    resposta = app_admissao.test_client().get("/streaming-com-falha", buffered=False)
+    with pytest.raises(RuntimeError):
+        b"".join(resposta.response)
+    resposta.close()
+    assert admissao.PORTOES["leve"].ativas == 0
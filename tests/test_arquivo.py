@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select, delete
+from sqlalchemy.exc import IntegrityError
+
+import arquivo
+import banco
+from models import db_session, Cliente, Veiculo, OrdemServico
+
+# só as ordens destes testes fecharam antes disto; sem data_abertura, ficam
+# fora dos resumos que os outros testes comparam com a tabela quente
+ANTIGAS = datetime(2000, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def veiculo(app):
+    cliente = db_session.execute(insert(Cliente).returning(Cliente.id_cliente), [{
+        "nome": "Arquivo", "cpf": "80000000001", "telefone": "(11) 8", "endereco": "Rua Oito",
+        "email": "arquivo@exemplo.com.br",
+    }]).scalar()
+    veiculo = db_session.execute(insert(Veiculo).returning(Veiculo.id_veiculo), [{
+        "cliente_id": cliente, "marca": "VW", "modelo": "Gol", "placa": "ARQ8A88", "ano_fabricacao": 1995,
+    }]).scalar()
+    db_session.commit()
+    yield veiculo
+    db_session.remove()
+    # os resumos cobrem o arquivo: as ordens arquivadas aqui não ficam para os outros testes
+    with banco.engine.begin() as conexao:
+        conexao.execute(delete(arquivo.ORDENS).where(arquivo.ORDENS.c.veiculo_id == veiculo))
+
+
+def _antigas(veiculo, quantidade):
+    ids = db_session.execute(insert(OrdemServico).returning(OrdemServico.id_servico), [{
+        "veiculo_id": veiculo, "descricao_servico": "antiga", "status": "finalizado", "valor_estimado": 10.0,
+        "data_abertura": None, "data_fechamento": datetime(1990, 1, 1),
+    } for _ in range(quantidade)]).scalars().all()
+    db_session.commit()
+    db_session.remove()
+    return ids
+
+
+def _ids(conexao, tabela, ids):
+    return set(conexao.execute(select(tabela.c.id_servico).where(tabela.c.id_servico.in_(ids))).scalars())
+
+
+def test_id_arquivado_nao_volta_para_ordem_nova(veiculo):
+    maior, = _antigas(veiculo, 1)
+    assert arquivo.arquivar(ANTIGAS, pausa=0) == 1
+    with banco.engine.connect() as conexao:
+        assert _ids(conexao, arquivo.ORDENS, [maior]) == {maior}
+        assert _ids(conexao, arquivo._QUENTE, [maior]) == set()
+
+    nova = OrdemServico(veiculo_id=veiculo, descricao_servico="nova", status="aberto", valor_estimado=10.0)
+    db_session.add(nova)
+    db_session.commit()
+    assert nova.id_servico > maior
+    db_session.remove()
+
+
+def test_lote_com_falha_nao_altera_nenhum_dos_bancos(veiculo):
+    ids = _antigas(veiculo, 2)
+    # o segundo id já está no arquivo: o INSERT do lote falha
+    with banco.engine.begin() as conexao:
+        arquivo.garantir_esquema(conexao)
+        conexao.execute(insert(arquivo.ORDENS), [{"id_servico": ids[1], "veiculo_id": veiculo, "status": "x"}])
+    try:
+        with pytest.raises(IntegrityError):
+            arquivo.arquivar(ANTIGAS, lote=10, pausa=0)
+        with banco.engine.connect() as conexao:
+            assert _ids(conexao, arquivo._QUENTE, ids) == set(ids)
+            assert conexao.execute(
+                select(arquivo.ORDENS.c.status).where(arquivo.ORDENS.c.id_servico.in_(ids))
+            ).scalars().all() == ["x"]
+    finally:
+        with banco.engine.begin() as conexao:
+            conexao.execute(delete(arquivo._QUENTE).where(arquivo._QUENTE.c.id_servico.in_(ids)))
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import insert
+
+from models import db_session, Cliente, Veiculo, OrdemServico
+
+
+@pytest.fixture(scope="module")
+def ordem(app):
+    cliente = db_session.execute(insert(Cliente).returning(Cliente.id_cliente), [{
+        "nome": "Cache", "cpf": "12000000001", "telefone": "(11) 5", "endereco": "Rua Cinco",
+        "email": "cache@exemplo.com.br",
+    }]).scalar()
+    veiculo = db_session.execute(insert(Veiculo).returning(Veiculo.id_veiculo), [{
+        "cliente_id": cliente, "marca": "Chevrolet", "modelo": "Onix", "placa": "CCH1A22", "ano_fabricacao": 2018,
+    }]).scalar()
+    nova = OrdemServico(veiculo_id=veiculo, descricao_servico="freios", status="aberto", valor_estimado=200.0)
+    db_session.add(nova)
+    db_session.commit()
+    yield nova.id_servico, cliente
+    db_session.remove()
+
+
+def test_edicao_troca_a_etag_e_a_antiga_recebe_200(app, ordem):
+    id_servico, cliente = ordem
+    cliente_http = app.test_client()
+    rota = f"/BuscaClientes/id/{cliente}/servicos"
+
+    primeira = cliente_http.get(rota)
+    assert primeira.status_code == 200 and primeira.headers["ETag"].startswith("W/")
+    antiga = primeira.headers["ETag"]
+    assert cliente_http.get(rota, headers={"If-None-Match": antiga}).status_code == 304
+
+    resposta = cliente_http.put(f"/editarServico/{id_servico}", json={
+        "descricao_servico": "freios", "status": "em andamento", "valor_estimado": 200.0,
+    })
+    assert resposta.status_code == 200
+
+    depois = cliente_http.get(rota, headers={"If-None-Match": antiga})
+    assert depois.status_code == 200
+    assert depois.headers["ETag"] != antiga
+    assert [servico["status"] for servico in depois.get_json()] == ["em andamento"]
+    assert cliente_http.get(rota, headers={"If-None-Match": depois.headers["ETag"]}).status_code == 304
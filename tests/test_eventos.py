@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import insert, select, func
+
+import banco
+import eventos
+from models import db_session, Cliente, Veiculo, OrdemServico, EventoOrdem
+
+
+@pytest.fixture(scope="module")
+def ordem(app):
+    cliente = db_session.execute(insert(Cliente).returning(Cliente.id_cliente), [{
+        "nome": "Eventos", "cpf": "60000000001", "telefone": "(11) 6", "endereco": "Rua Seis",
+        "email": "eventos@exemplo.com.br",
+    }]).scalar()
+    veiculo = db_session.execute(insert(Veiculo).returning(Veiculo.id_veiculo), [{
+        "cliente_id": cliente, "marca": "Honda", "modelo": "Fit", "placa": "EVT6A66", "ano_fabricacao": 2012,
+    }]).scalar()
+    nova = OrdemServico(veiculo_id=veiculo, descricao_servico="alinhamento", status="aberto", valor_estimado=90.0)
+    db_session.add(nova)
+    db_session.commit()
+    yield nova.id_servico, veiculo, cliente
+    db_session.remove()
+
+
+def _eventos(partes):
+    # cada parte pode trazer vários eventos SSE; devolve (id, nome, dados)
+    for bloco in b"".join(partes).decode().split("\n\n"):
+        campos = dict(linha.split(": ", 1) for linha in bloco.splitlines() if ": " in linha and not linha.startswith(":"))
+        if "event" in campos:
+            yield campos["id"], campos["event"], json.loads(campos["data"])
+
+
+def _editar(id_servico, status):
+    db_session.get(OrdemServico, id_servico).status = status
+    db_session.commit()
+    db_session.remove()
+
+
+def test_edicao_confirmada_chega_ao_assinante(app, ordem):
+    id_servico, veiculo, cliente = ordem
+    resposta = app.test_client().get(f"/eventos/ordens?cliente_id={cliente}", buffered=False)
+    assert resposta.mimetype == "text/event-stream"
+    partes = iter(resposta.response)
+    assert next(partes) == eventos.INICIO
+
+    _editar(id_servico, "em andamento")
+    (seq, nome, dados), = _eventos([next(partes)])
+    resposta.close()
+    assert nome == "ordem"
+    assert dados["tipo"] == "alterada" and dados["id_servico"] == id_servico
+    assert dados["veiculo_id"] == veiculo and dados["cliente_id"] == cliente
+    assert dados["status"] == "em andamento"
+    # o log fica no banco: outro processo lê o mesmo evento pelo seq
+    with banco.engine.connect() as conexao:
+        assert conexao.execute(select(EventoOrdem.dados).where(EventoOrdem.seq == int(seq))).scalar() == dados
+
+
+def test_last_event_id_retoma_de_onde_parou(app, ordem):
+    id_servico = ordem[0]
+    with banco.engine.connect() as conexao:
+        antes = conexao.execute(select(func.max(EventoOrdem.seq))).scalar()
+    _editar(id_servico, "aguardando peças")
+    _editar(id_servico, "concluído")
+
+    resposta = app.test_client().get("/eventos/ordens", headers={"Last-Event-ID": str(antes)}, buffered=False)
+    partes = iter(resposta.response)
+    recebidos = list(_eventos([next(partes), next(partes)]))
+    resposta.close()
+    assert [dados["status"] for _, _, dados in recebidos] == ["aguardando peças", "concluído"]
+    assert [int(seq) for seq, _, _ in recebidos] == [antes + 1, antes + 2]
+
+
+@pytest.mark.parametrize("ultimo", ["abc123:5", "999999999"])
+def test_last_event_id_desconhecido_pede_reset(app, ordem, ultimo):
+    resposta = app.test_client().get("/eventos/ordens", headers={"Last-Event-ID": ultimo}, buffered=False)
+    partes = iter(resposta.response)
+    next(partes)
+    (_, nome, _), = _eventos([next(partes)])
+    resposta.close()
+    assert nome == "reset"
+
+
+def test_evento_de_transacao_desfeita_nao_entra_no_log(app, ordem):
+    with banco.engine.connect() as conexao:
+        antes = conexao.execute(select(func.max(EventoOrdem.seq))).scalar()
+    db_session.get(OrdemServico, ordem[0]).status = "cancelado"
+    db_session.flush()
+    db_session.rollback()
+    db_session.remove()
+    with banco.engine.connect() as conexao:
+        assert conexao.execute(select(func.max(EventoOrdem.seq))).scalar() == antes
+
+
+def test_commit_de_outro_processo_chega_ao_assinante(app, ordem, monkeypatch):
+    # outro worker: processo separado, sem acesso aos avisos deste; o evento chega pela consulta ao log
+    monkeypatch.setattr(eventos, "INTERVALO_CONSULTA", 0.05)
+    resposta = app.test_client().get(f"/eventos/ordens?veiculo_id={ordem[1]}", buffered=False)
+    partes = iter(resposta.response)
+    next(partes)
+    codigo = (
+        "import Api\n"
+        "Api.create_app()\n"
+        "from models import db_session, OrdemServico\n"
+        f"db_session.get(OrdemServico, {ordem[0]}).status = 'finalizado'\n"
+        "db_session.commit()\n"
+    )
+    subprocess.run([sys.executable, "-c", codigo], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+    (_, nome, dados), = _eventos([next(partes)])
+    resposta.close()
+    assert nome == "ordem" and dados["status"] == "finalizado"
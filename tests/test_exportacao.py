@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.mark.parametrize("papel, status", [(None, 401), ("atendente", 403)])
+def test_exportacao_exige_administrador(app, tokens, papel, status):
+    resposta = app.test_client().get("/exportarOrdensServico", headers=tokens.get(papel, {}))
+    assert resposta.status_code == status
+
+
+def test_administrador_exporta(app, tokens):
+    resposta = app.test_client().get("/exportarOrdensServico?formato=ndjson", headers=tokens["admin"])
+    assert resposta.status_code == 200
+    assert "attachment" in resposta.headers["Content-Disposition"]
+    resposta.close()
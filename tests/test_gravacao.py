@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import select
+
+import gravacao
+from models import read_session, Cliente
+
+
+@pytest.fixture
+def escritor(app):
+    # janela larga: as unidades enviadas juntas caem no mesmo grupo
+    return gravacao.Escritor(janela=0.2, maximo=64)
+
+
+def _cliente(sufixo):
+    return Cliente(nome="Grupo", cpf=f"7000000{sufixo:04d}", telefone=f"(11) 7{sufixo}",
+                   endereco="Rua Sete", email=f"grupo{sufixo}@exemplo.com.br")
+
+
+def _cpfs(*sufixos):
+    cpfs = [f"7000000{sufixo:04d}" for sufixo in sufixos]
+    encontrados = set(read_session.execute(select(Cliente.cpf).where(Cliente.cpf.in_(cpfs))).scalars())
+    read_session.remove()
+    return encontrados
+
+
+def _enviar_juntos(escritor, unidades):
+    with ThreadPoolExecutor(len(unidades)) as executor:
+        futuros = [executor.submit(escritor.enviar, unidade) for unidade in unidades]
+    resultados = []
+    for futuro in futuros:
+        try:
+            resultados.append(futuro.result())
+        except Exception as e:
+            resultados.append(e)
+    return resultados
+
+
+def test_grupo_devolve_o_resultado_de_cada_unidade(escritor):
+    resultados = _enviar_juntos(escritor, [lambda sessao, i=i: sessao.merge(_cliente(i)) for i in range(5)])
+    assert escritor.unidades == 5 and escritor.grupos < 5
+    assert all(isinstance(r.id_cliente, int) for r in resultados)
+    assert len({r.id_cliente for r in resultados}) == 5
+    assert len(_cpfs(*range(5))) == 5
+
+
+def test_falha_de_uma_unidade_nao_desfaz_as_outras(escritor):
+    def falhar(sessao):
+        sessao.add(_cliente(11))
+        sessao.flush()
+        raise ValueError("unidade inválida")
+
+    resultados = _enviar_juntos(escritor, [
+        lambda sessao: sessao.merge(_cliente(10)),
+        falhar,
+        lambda sessao: sessao.merge(_cliente(12)),
+    ])
+    assert isinstance(resultados[1], ValueError)
+    assert escritor.grupos == 1
+    assert _cpfs(10, 11, 12) == {_cliente(10).cpf, _cliente(12).cpf}
+
+
+def test_unidade_abandonada_por_tempo_esgotado_nao_e_gravada(app, monkeypatch):
+    # sem janela: a unidade que segura o escritor fica sozinha no primeiro grupo
+    escritor = gravacao.Escritor(janela=0, maximo=64)
+    comecou, liberar = threading.Event(), threading.Event()
+    ocupado = threading.Thread(target=escritor.enviar, args=(lambda sessao: comecou.set() or liberar.wait(5),))
+    ocupado.start()
+    assert comecou.wait(5)
+    monkeypatch.setattr(gravacao, "TEMPO_LIMITE", 0.1)
+    try:
+        with pytest.raises(gravacao.TempoEsgotado):
+            escritor.enviar(lambda sessao: sessao.merge(_cliente(20)))
+    finally:
+        liberar.set()
+        ocupado.join()
+    # o próximo grupo do escritor passa pela unidade abandonada sem gravá-la
+    monkeypatch.setattr(gravacao, "TEMPO_LIMITE", 5)
+    escritor.enviar(lambda sessao: sessao.merge(_cliente(21)))
+    assert _cpfs(20, 21) == {_cliente(21).cpf}
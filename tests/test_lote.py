@@ -0,0 +1,55 @@
+from sqlalchemy import select, func
+
+from models import read_session, Cliente, Veiculo, OrdemServico
+
+
+def _cliente(sufixo):
+    return {"nome": "Lote", "cpf": f"5000000000{sufixo}", "telefone": f"(11) 5{sufixo}",
+            "endereco": "Rua Cinco", "email": f"lote{sufixo}@exemplo.com.br"}
+
+
+def _contar(modelo, *condicoes):
+    total = read_session.execute(select(func.count()).select_from(modelo).where(*condicoes)).scalar()
+    read_session.remove()
+    return total
+
+
+def test_referencias_usam_a_resposta_das_operacoes_anteriores(app):
+    resposta = app.test_client().post("/batch", json={"operacoes": [
+        {"rota": "/adicionarClientes", "corpo": _cliente(1)},
+        {"rota": "/adicionarVeiculo", "corpo": {
+            "cliente_id": "$0.id_cliente", "marca": "Ford", "modelo": "Ka",
+            "placa": "LOT1A11", "ano_fabricacao": 2015,
+        }},
+        {"rota": "/adicionarOrdemServico", "corpo": {
+            "veiculo_id": "$1.id_veiculo", "descricao_servico": "troca de óleo do $1.id_veiculo",
+            "status": "aberto", "valor_estimado": 80.0,
+        }},
+    ]})
+    assert resposta.status_code == 200, resposta.get_json()
+    resultados = resposta.get_json()["resultados"]
+    cliente_id = resultados[0]["corpo"]["id_cliente"]
+    veiculo_id = resultados[1]["corpo"]["id_veiculo"]
+    assert _contar(Veiculo, Veiculo.id_veiculo == veiculo_id, Veiculo.cliente_id == cliente_id) == 1
+    assert _contar(OrdemServico, OrdemServico.veiculo_id == veiculo_id,
+                   OrdemServico.descricao_servico == f"troca de óleo do {veiculo_id}") == 1
+
+
+def test_operacao_com_falha_desfaz_o_lote_inteiro(app):
+    resposta = app.test_client().post("/batch", json={"operacoes": [
+        {"rota": "/adicionarClientes", "corpo": _cliente(2)},
+        {"rota": "/adicionarVeiculo", "corpo": {"cliente_id": "$0.id_cliente", "marca": "Ford"}},
+    ]})
+    assert resposta.status_code == 400
+    assert resposta.get_json()["falhou"] == 1
+    assert _contar(Cliente, Cliente.cpf == _cliente(2)["cpf"]) == 0
+
+
+def test_referencia_a_operacao_posterior_e_recusada(app):
+    resposta = app.test_client().post("/batch", json={"operacoes": [
+        {"rota": "/adicionarVeiculo", "corpo": {"cliente_id": "$1.id_cliente"}},
+        {"rota": "/adicionarClientes", "corpo": _cliente(3)},
+    ]})
+    assert resposta.status_code == 400
+    assert "operação posterior" in resposta.get_json()["mensagem"]
+    assert _contar(Cliente, Cliente.cpf == _cliente(3)["cpf"]) == 0
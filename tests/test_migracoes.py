@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import select, text
+
+import banco
+import migracoes
+from models import OrdemServico
+
+
+@pytest.mark.parametrize("nome", list(migracoes.consultas_criticas()))
+def test_consultas_criticas_usam_indice(app, nome):
+    with banco.engine.connect() as conexao:
+        assert migracoes.plano_com_varredura(conexao, migracoes.consultas_criticas()[nome]) is None
+
+
+def test_varredura_completa_e_detectada(app):
+    # sem isto o teste acima passaria mesmo com a verificação quebrada
+    with banco.engine.connect() as conexao:
+        assert migracoes.plano_com_varredura(
+            conexao, select(OrdemServico).where(OrdemServico.descricao_servico == "x")
+        ) is not None
+
+
+def test_banco_migrado_esta_na_ultima_versao(app):
+    with banco.engine.connect() as conexao:
+        assert migracoes.versao_atual(conexao) == migracoes.MIGRACOES[-1][0]
+        ddl = conexao.execute(text("SELECT sql FROM sqlite_master WHERE name = 'ordem_servico'")).scalar()
+    assert "AUTOINCREMENT" in ddl
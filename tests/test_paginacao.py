@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import insert, select
+
+import paginacao
+from models import db_session, Cliente, Veiculo
+
+
+@pytest.fixture(scope="module")
+def ids(app):
+    cliente = db_session.execute(insert(Cliente).returning(Cliente.id_cliente), [{
+        "nome": "Paginação", "cpf": "40000000001", "telefone": "(11) 4", "endereco": "Rua Quatro",
+        "email": "paginacao@exemplo.com.br",
+    }]).scalar()
+    db_session.execute(insert(Veiculo), [
+        {"cliente_id": cliente, "marca": "VW", "modelo": "Gol", "placa": f"PAG{i:04d}", "ano_fabricacao": 2000 + i}
+        for i in range(7)
+    ])
+    db_session.commit()
+    ids = db_session.execute(select(Veiculo.id_veiculo).order_by(Veiculo.id_veiculo)).scalars().all()
+    db_session.remove()
+    return ids
+
+
+@pytest.fixture
+def cliente(app, monkeypatch):
+    monkeypatch.setattr(paginacao, "LIMITE_PADRAO", 3)
+    return app.test_client()
+
+
+def test_sem_limit_devolve_a_pagina_padrao(ids, cliente):
+    resposta = cliente.get("/listarVeiculos")
+    assert resposta.status_code == 200
+    assert [v["id_veiculo"] for v in resposta.get_json()] == ids[:3]
+    assert resposta.headers["X-Next-Cursor"] == str(ids[2])
+    assert "limit=3" in resposta.headers["Link"] and f"after={ids[2]}" in resposta.headers["Link"]
+
+
+def test_cursor_percorre_a_tabela_inteira(ids, cliente):
+    vistos, url = [], "/listarVeiculos?fields=placa"
+    while url:
+        resposta = cliente.get(url)
+        vistos += [v["id_veiculo"] for v in resposta.get_json()]
+        cursor = resposta.headers.get("X-Next-Cursor")
+        url = f"/listarVeiculos?fields=placa&after={cursor}" if cursor else None
+    assert vistos == ids
+
+
+def test_stream_devolve_a_tabela_inteira(ids, cliente):
+    resposta = cliente.get("/listarVeiculos?stream=1")
+    assert [v["id_veiculo"] for v in resposta.get_json()] == ids
+    assert "X-Next-Cursor" not in resposta.headers
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select, func
+
+import banco
+import relatorios
+from models import db_session, Cliente, Veiculo, OrdemServico, StatusOrdem
+
+
+@pytest.fixture(scope="module")
+def veiculo(app):
+    cliente = db_session.execute(insert(Cliente).returning(Cliente.id_cliente), [{
+        "nome": "Relatório", "cpf": "30000000001", "telefone": "(11) 3", "endereco": "Rua Três",
+        "email": "relatorio@exemplo.com.br",
+    }]).scalar()
+    veiculo = db_session.execute(insert(Veiculo).returning(Veiculo.id_veiculo), [{
+        "cliente_id": cliente, "marca": "Fiat", "modelo": "Uno", "placa": "REL3A33", "ano_fabricacao": 2010,
+    }]).scalar()
+    abertura, fechamento = datetime(2024, 5, 1, 8, 0), datetime(2024, 5, 1, 10, 0)
+    for status in ("concluído", "Finalizado", " finalizada ", "aberto", "Em andamento"):
+        finalizada = "final" in status.lower() or "conclu" in status.lower()
+        db_session.add(OrdemServico(
+            veiculo_id=veiculo, descricao_servico="revisão", status=status, valor_estimado=100.0,
+            data_abertura=abertura, data_fechamento=fechamento if finalizada else None,
+        ))
+    db_session.commit()
+    yield veiculo
+    db_session.remove()
+
+
+def _por_status(linhas):
+    return {linha["status"]: linha["quantidade"] for linha in linhas}
+
+
+def test_variantes_do_status_caem_no_mesmo_grupo(veiculo):
+    linhas = relatorios.por_veiculo(veiculo)
+    assert _por_status(linhas) == {"aberta": 1, "em_andamento": 1, "finalizada": 3}
+    finalizadas = next(linha for linha in linhas if linha["status"] == "finalizada")
+    assert finalizadas["status_codigo"] == StatusOrdem.FINALIZADA
+    assert finalizadas["fechadas"] == 3 and finalizadas["atendimento_medio_horas"] == 2.0
+
+
+def test_edicao_do_status_move_a_ordem_de_grupo(veiculo):
+    ordem = OrdemServico.query.filter_by(veiculo_id=veiculo, status="Finalizado").one()
+    ordem.status = "cancelado"
+    ordem.data_fechamento = None
+    db_session.commit()
+    assert _por_status(relatorios.por_veiculo(veiculo)) == {
+        "aberta": 1, "em_andamento": 1, "finalizada": 2, "cancelada": 1,
+    }
+
+
+def test_reconstrucao_agrupa_como_o_filtro_de_status(veiculo):
+    antes = relatorios.por_veiculo(veiculo)
+    with banco.engine.begin() as conexao:
+        relatorios.reconstruir(conexao)
+    assert relatorios.por_veiculo(veiculo) == antes
+
+    # o mesmo agrupamento do ?status= (status_codigo), em todo o banco
+    codigo = func.coalesce(OrdemServico.status_codigo, int(StatusOrdem.OUTRO))
+    contagens = dict(db_session.execute(
+        select(codigo, func.count()).where(OrdemServico.data_abertura.isnot(None)).group_by(codigo)
+    ).all())
+    db_session.remove()
+    assert {linha["status_codigo"]: linha["quantidade"] for linha in relatorios.por_status()} == contagens
@@ -0,0 +1,93 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask import jsonify
+from sqlalchemy import insert, select
+
+import serializacao
+from models import db_session, read_session, Usuario, Cliente, Veiculo, OrdemServico
+
+SERIALIZADORES = [serializacao.USUARIO, serializacao.CLIENTE, serializacao.VEICULO, serializacao.ORDEM_SERVICO]
+TEXTO = "Zoë Ñandú \U0001F600 \x7f \"aspas\" \\ barra"
+
+
+@pytest.fixture(scope="module")
+def dados(app):
+    db_session.execute(insert(Usuario), [
+        {"nome": TEXTO, "cpf": "10000000001", "email": "zoe@exemplo.com.br", "password": "x", "papel": None},
+        {"nome": "Ana", "cpf": "10000000002", "email": "ana@exemplo.com.br", "password": "x", "papel": "admin"},
+    ])
+    cliente = db_session.execute(insert(Cliente).returning(Cliente.id_cliente), [{
+        "nome": TEXTO, "cpf": "20000000001", "telefone": "(11) 1", "endereco": "Rua   Linha",
+        "email": "borda@exemplo.com.br", "ativo": None,
+    }]).scalar()
+    veiculo = db_session.execute(insert(Veiculo).returning(Veiculo.id_veiculo), [{
+        "cliente_id": cliente, "marca": "Citroën", "modelo": "C4 Cactus", "placa": "ZZZ9Z99", "ano_fabricacao": 2020,
+    }]).scalar()
+    db_session.execute(insert(OrdemServico), [
+        {"veiculo_id": veiculo, "descricao_servico": descricao, "status": status, "valor_estimado": valor,
+         "data_abertura": abertura, "data_fechamento": fechamento}
+        for descricao, status, valor, abertura, fechamento in (
+            (TEXTO, "concluído", Decimal("1234.50"), datetime(2024, 2, 29, 23, 59, 59, 999999),
+             datetime(2024, 3, 1, 0, 0)),
+            ("decimal longo", "aberto", Decimal("0.1") + Decimal("0.2"), datetime(2024, 1, 1), None),
+            ("grande", "aberto", 1e17, datetime(2024, 1, 2), None),
+            ("pequeno", "aberto", 1.5e-5, datetime(2024, 1, 3), None),
+            ("zero", "aberto", -0.0, datetime(2024, 1, 4), None),
+            ("dízima", "aberto", 0.1 + 0.2, datetime(2024, 1, 5), None),
+            (None, None, None, None, None),
+        )
+    ])
+    db_session.commit()
+    yield
+    db_session.remove()
+
+
+def _objetos_e_linhas(serializador):
+    chave = getattr(serializador.modelo, serializador.campos[0])
+    objetos = read_session.execute(select(serializador.modelo).order_by(chave)).scalars().all()
+    linhas = read_session.execute(serializador.selecionar().order_by(chave)).all()
+    read_session.remove()
+    return objetos, linhas
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codificador(request, monkeypatch):
+    if request.param == "orjson" and serializacao.orjson is None:
+        pytest.skip("orjson não instalado")
+    if request.param == "json":
+        monkeypatch.setattr(serializacao, "orjson", None)
+
+
+@pytest.mark.parametrize("serializador", SERIALIZADORES, ids=lambda s: s.modelo.__name__)
+def test_lista_igual_ao_jsonify_do_serialize(app, dados, codificador, serializador):
+    with app.app_context():
+        objetos, linhas = _objetos_e_linhas(serializador)
+        assert linhas
+        # sem os casos com floats em notação exponencial (caminho do orjson) e com eles (json)
+        for fim in (1, len(linhas)):
+            assert serializador.json(linhas[:fim]) == jsonify([o.serialize() for o in objetos[:fim]]).get_data()
+
+
+@pytest.mark.parametrize("serializador", SERIALIZADORES, ids=lambda s: s.modelo.__name__)
+def test_objeto_igual_ao_jsonify_do_serialize(app, dados, codificador, serializador):
+    with app.app_context():
+        objetos, linhas = _objetos_e_linhas(serializador)
+        for objeto, linha in zip(objetos, linhas):
+            assert serializador.json_objeto(linha) == jsonify(objeto.serialize()).get_data()
+
+
+@pytest.mark.parametrize("serializador", SERIALIZADORES, ids=lambda s: s.modelo.__name__)
+def test_projecao_mantem_so_os_campos_pedidos_e_a_chave(app, dados, serializador):
+    campos = serializador.campos[-2:]
+    projecao = serializador.projetar(campos)
+    with app.app_context():
+        objetos, _ = _objetos_e_linhas(serializador)
+        linhas = read_session.execute(
+            projecao.selecionar().order_by(getattr(serializador.modelo, serializador.campos[0]))
+        ).all()
+        read_session.remove()
+        esperado = [{k: v for k, v in o.serialize().items() if k in campos or k == serializador.campos[0]}
+                    for o in objetos]
+        assert projecao.json(linhas) == jsonify(esperado).get_data()
@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import insert, select, func
+
+import tarefas
+from models import db_session, read_session, Cliente, Veiculo, OrdemServico
+
+
+@pytest.fixture(autouse=True)
+def sem_pausa(monkeypatch):
+    monkeypatch.setattr(tarefas, "PAUSA", 0)
+
+
+def _cliente_com_ordens(sufixo, veiculos=2, ordens=3):
+    cliente = db_session.execute(insert(Cliente).returning(Cliente.id_cliente), [{
+        "nome": "Tarefas", "cpf": f"9100000{sufixo:04d}", "telefone": "(11) 9", "endereco": "Rua Nove",
+        "email": f"tarefas{sufixo}@exemplo.com.br",
+    }]).scalar()
+    ids = db_session.execute(insert(Veiculo).returning(Veiculo.id_veiculo), [{
+        "cliente_id": cliente, "marca": "Ford", "modelo": "Ka", "placa": f"TRF{sufixo}{i}", "ano_fabricacao": 2015,
+    } for i in range(veiculos)]).scalars().all()
+    for veiculo in ids:
+        for _ in range(ordens):
+            db_session.add(OrdemServico(veiculo_id=veiculo, descricao_servico="troca de óleo", status="aberto",
+                                        valor_estimado=50.0))
+    db_session.commit()
+    db_session.remove()
+    return cliente, ids
+
+
+def _contar(modelo, *condicoes):
+    total = read_session.scalar(select(func.count()).select_from(modelo).where(*condicoes))
+    read_session.remove()
+    return total
+
+
+def _executar_fila():
+    # sem trabalhadores nos testes (TAREFAS_THREADS=0): a fila roda aqui
+    estados = []
+    while (tarefa := tarefas._reservar()) is not None:
+        estados.append(tarefas.executar(*tarefa))
+    return estados
+
+
+def test_exclusao_de_cliente_conclui_a_cascata(app, tokens, monkeypatch):
+    # lotes pequenos: a cascata passa por várias transações
+    monkeypatch.setattr(tarefas, "TAMANHO_LOTE", 2)
+    cliente, veiculos = _cliente_com_ordens(1)
+    resposta = app.test_client().delete(f"/deletarCliente/{cliente}")
+    assert resposta.status_code == 202
+    id_tarefa = resposta.get_json()["id_tarefa"]
+    assert resposta.headers["Location"] == f"/tarefas/{id_tarefa}"
+
+    assert _executar_fila() == ["concluida"]
+    tarefa = app.test_client().get(f"/tarefas/{id_tarefa}", headers=tokens["admin"]).get_json()
+    assert tarefa["estado"] == "concluida"
+    assert tarefa["resultado"] == {"ordens": 6, "veiculos": 2}
+    assert tarefa["progresso"] == tarefa["total"] == 6
+    assert _contar(Cliente, Cliente.id_cliente == cliente) == 0
+    assert _contar(Veiculo, Veiculo.cliente_id == cliente) == 0
+    assert _contar(OrdemServico, OrdemServico.veiculo_id.in_(veiculos)) == 0
+
+
+def test_cancelamento_de_tarefa_pendente(app, tokens):
+    _, (veiculo,) = _cliente_com_ordens(2, veiculos=1)
+    id_tarefa = app.test_client().delete(f"/deletarVeiculos/{veiculo}").get_json()["id_tarefa"]
+
+    resposta = app.test_client().post(f"/tarefas/{id_tarefa}/cancelar", headers=tokens["admin"])
+    assert resposta.status_code == 200
+    assert _executar_fila() == []
+    assert _contar(OrdemServico, OrdemServico.veiculo_id == veiculo) == 3
+    assert app.test_client().get(f"/tarefas/{id_tarefa}", headers=tokens["admin"]).get_json()["estado"] == "cancelada"
+
+
+def test_cancelamento_de_tarefa_em_execucao_para_antes_do_proximo_lote(app, tokens):
+    _, (veiculo,) = _cliente_com_ordens(3, veiculos=1)
+    id_tarefa = tarefas.enfileirar("remover_veiculo", {"veiculo_id": veiculo}).id_tarefa
+    db_session.remove()
+    reservada = tarefas._reservar()
+    assert reservada.id_tarefa == id_tarefa
+
+    resposta = app.test_client().post(f"/tarefas/{id_tarefa}/cancelar", headers=tokens["admin"])
+    assert resposta.status_code == 202
+    assert tarefas.executar(*reservada) == "cancelada"
+    assert app.test_client().get(f"/tarefas/{id_tarefa}", headers=tokens["admin"]).get_json()["estado"] == "cancelada"
+    assert _contar(Veiculo, Veiculo.id_veiculo == veiculo) == 1
+
+
+@pytest.mark.parametrize("rota, metodo", [
+    ("/tarefas/{}", "get"), ("/tarefas/{}/cancelar", "post"), ("/tarefas", "get"),
+])
+def test_tarefas_exigem_administrador(app, tokens, rota, metodo):
+    id_tarefa = tarefas.enfileirar("reconstruir_busca").id_tarefa
+    db_session.remove()
+    cliente = app.test_client()
+    resposta = getattr(cliente, metodo)(rota.format(id_tarefa), headers=tokens["atendente"])
+    assert resposta.status_code == 403
+    assert resposta.get_json() == {"msg": "acesso negado, privilegio de administrador"}
+    assert getattr(cliente, metodo)(rota.format(id_tarefa)).status_code == 401
+    assert tarefas.cancelar(id_tarefa) == "cancelada"